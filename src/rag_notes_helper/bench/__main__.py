@@ -0,0 +1,57 @@
+import argparse
+from pathlib import Path
+
+from rag_notes_helper.bench.bench_runner import (
+    compare_results,
+    run_benchmarks,
+    save_results,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python -m rag_notes_helper.bench",
+        description="Offline ingest / index / retrieval / streaming benchmarks",
+    )
+    parser.add_argument("--files", type=int, default=200, help="synthetic notes")
+    parser.add_argument("--file-size", type=int, default=4_000, help="avg chars per note")
+    parser.add_argument("--md", type=float, default=0.6, help="share of .md notes")
+    parser.add_argument("--py", type=float, default=0.3, help="share of .py notes")
+    parser.add_argument("--pdf", type=float, default=0.1, help="share of .pdf notes")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument(
+        "--fractions",
+        type=float,
+        nargs="+",
+        default=[0.01, 0.1, 0.5],
+        help="changed-note fractions for update timing",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", type=Path, default=Path("bench_results"))
+    parser.add_argument(
+        "--compare",
+        type=Path,
+        nargs=2,
+        metavar=("OLD", "NEW"),
+        help="compare two saved result files",
+    )
+    args = parser.parse_args()
+
+    if args.compare:
+        print(compare_results(*args.compare))
+        return
+
+    results = run_benchmarks(
+        n_files=args.files,
+        file_size=args.file_size,
+        mix={"md": args.md, "py": args.py, "pdf": args.pdf},
+        n_queries=args.queries,
+        change_fractions=tuple(args.fractions),
+        seed=args.seed,
+    )
+    out_path = save_results(results, args.out)
+    print(f"Saved benchmark results to {out_path}")
+
+
+if __name__ == "__main__":
+    main()
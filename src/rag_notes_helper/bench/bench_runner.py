@@ -0,0 +1,259 @@
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import tempfile
+import time
+from collections.abc import Iterator
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from rag_notes_helper.bench.corpus import WORDS, generate_corpus, modify_fraction
+from rag_notes_helper.bench.fakes import FakeEmbedder, StubLLMServer
+from rag_notes_helper.core.config import get_settings
+from rag_notes_helper.rag.index import (
+    RagIndex,
+    build_and_save_rag,
+    load_index,
+    rebuild_index,
+)
+from rag_notes_helper.rag.ingest import load_notes
+from rag_notes_helper.rag.llm import get_llm
+from rag_notes_helper.rag.meta_store import MetaStore
+from rag_notes_helper.rag.retrieval import retrieve
+
+
+@contextlib.contextmanager
+def _configure(workspace: Path, llm_url: str) -> Iterator[None]:
+    """
+    point settings at the synthetic workspace and the stub LLM, the
+    caller's environment is restored on exit
+    """
+    overrides = {
+        "NOTES_DIR": str(workspace / "data"),
+        "STORAGE_DIR": str(workspace / "storage"),
+        "LLM_PROVIDER": "ollama",
+        "LLM_MODEL": "stub",
+        "OLLAMA_BASE_URL": llm_url,
+    }
+    saved = {key: os.environ.get(key) for key in overrides}
+
+    os.environ.update(overrides)
+    (workspace / "data").mkdir(parents=True, exist_ok=True)
+    get_settings.cache_clear()
+
+    try :
+        yield
+    finally :
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else :
+                os.environ[key] = value
+
+        get_settings.cache_clear()
+
+
+@contextlib.contextmanager
+def _fake_model() -> Iterator[None]:
+    """ every build and query inside embeds with the fake model """
+    model_name = get_settings().embed_model_name
+    previous = RagIndex._models.get(model_name)
+    RagIndex._models[model_name] = FakeEmbedder()
+    RagIndex._model_futures.pop(model_name, None)
+
+    try :
+        yield
+    finally :
+        if previous is None:
+            RagIndex._models.pop(model_name, None)
+        else :
+            RagIndex._models[model_name] = previous
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    scale = 1 if platform.system() == "Darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2**20
+
+
+def _percentiles(samples_ms: list[float]) -> dict[str, float]:
+    samples = np.asarray(samples_ms)
+    return {
+        "n": len(samples),
+        "mean_ms": float(samples.mean()),
+        "p50_ms": float(np.percentile(samples, 50)),
+        "p99_ms": float(np.percentile(samples, 99)),
+    }
+
+
+def _git_commit() -> str:
+    try :
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_benchmarks(
+    *,
+    n_files: int = 200,
+    file_size: int = 4_000,
+    mix: dict[str, float] | None = None,
+    n_queries: int = 200,
+    change_fractions: tuple[float, ...] = (0.01, 0.1, 0.5),
+    seed: int = 0,
+) -> dict:
+    results: dict = {
+        "commit": _git_commit(),
+        "time": datetime.now().isoformat(timespec="seconds"),
+        "params": {
+            "n_files": n_files,
+            "file_size": file_size,
+            "mix": mix or {"md": 0.6, "py": 0.3, "pdf": 0.1},
+            "n_queries": n_queries,
+            "seed": seed,
+        },
+    }
+    rng = random.Random(seed)
+    quiet = contextlib.redirect_stdout(io.StringIO())
+
+    with (
+        tempfile.TemporaryDirectory() as tmp,
+        StubLLMServer() as server,
+        _configure(Path(tmp), server.base_url),
+        _fake_model(),
+    ):
+        paths = generate_corpus(
+            get_settings().notes_dir,
+            n_files=n_files,
+            file_size=file_size,
+            mix=mix,
+            seed=seed,
+        )
+
+        # 1. ingest: load + chunk only
+        start = time.perf_counter()
+        n_chunks = sum(1 for _ in load_notes())
+        elapsed = time.perf_counter() - start
+        results["ingest"] = {
+            "chunks": n_chunks,
+            "seconds": elapsed,
+            "chunks_per_sec": n_chunks / elapsed,
+        }
+
+        # 2. full build: ingest + embed + write
+        start = time.perf_counter()
+        with quiet:
+            rag = build_and_save_rag()
+        results["build"] = {
+            "seconds": time.perf_counter() - start,
+            "vectors": rag.index.ntotal,
+            "peak_rss_mb": _peak_rss_mb(),
+        }
+
+        # 3. retrieval latency
+        rag = load_index()
+        queries = [
+            " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 10)))
+            for _ in range(n_queries)
+        ]
+
+        with MetaStore(rag.path) as meta_store:
+            samples = []
+            for query in queries:
+                start = time.perf_counter()
+                retrieve(rag, meta_store, query=query)
+                samples.append((time.perf_counter() - start) * 1000)
+            results["query"] = _percentiles(samples)
+
+            samples = []
+            for _ in range(n_queries):
+                faiss_id = rng.randrange(rag.index.ntotal) # type: ignore
+                start = time.perf_counter()
+                meta_store.get(faiss_id)
+                samples.append((time.perf_counter() - start) * 1000)
+            results["meta_get"] = _percentiles(samples)
+
+        # 4. smart update cost against the fraction of changed notes
+        results["update"] = []
+        for fraction in change_fractions:
+            changed = modify_fraction(paths, fraction, seed=rng.randrange(2**32))
+            start = time.perf_counter()
+            with quiet:
+                rebuild_index()
+            results["update"].append({
+                "fraction": fraction,
+                "changed_files": len(changed),
+                "seconds": time.perf_counter() - start,
+            })
+
+        # 5. streaming against the stub server
+        llm = get_llm()
+        prompt = [{"role": "user", "content": "benchmark"}]
+        ttft, totals = [], []
+        for _ in range(5):
+            start = time.perf_counter()
+            stream = llm.stream(prompt)
+            next(stream)
+            ttft.append((time.perf_counter() - start) * 1000)
+            for _ in stream:
+                pass
+            totals.append((time.perf_counter() - start) * 1000)
+
+        results["stream"] = {
+            "ttft": _percentiles(ttft),
+            "total": _percentiles(totals),
+        }
+
+        results["peak_rss_mb"] = _peak_rss_mb()
+
+    return results
+
+
+def save_results(results: dict, out_dir: Path) -> Path:
+    out_dir.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    out_path = out_dir / f"bench_{results['commit']}_{stamp}.json"
+    out_path.write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+    return out_path
+
+
+def _flatten(data, prefix: str = "") -> dict[str, float]:
+    flat = {}
+    if isinstance(data, dict):
+        for key, value in data.items():
+            flat.update(_flatten(value, f"{prefix}{key}."))
+    elif isinstance(data, list):
+        for i, value in enumerate(data):
+            flat.update(_flatten(value, f"{prefix}{i}."))
+    elif isinstance(data, (int, float)) and not isinstance(data, bool):
+        flat[prefix.rstrip(".")] = float(data)
+
+    return flat
+
+
+def compare_results(old_path: Path, new_path: Path) -> str:
+    """ side-by-side table of two saved benchmark runs """
+    old = _flatten(json.loads(old_path.read_text(encoding="utf-8")))
+    new = _flatten(json.loads(new_path.read_text(encoding="utf-8")))
+
+    lines = [f"{'metric':<32}{'old':>12}{'new':>12}{'ratio':>8}"]
+    for key in sorted(old.keys() & new.keys()):
+        if key.startswith("params."):
+            continue
+        ratio = new[key] / old[key] if old[key] else float("nan")
+        lines.append(f"{key:<32}{old[key]:>12.3f}{new[key]:>12.3f}{ratio:>8.2f}")
+
+    return "\n".join(lines)
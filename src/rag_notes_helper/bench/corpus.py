@@ -0,0 +1,112 @@
+import random
+from pathlib import Path
+
+import pymupdf
+
+
+WORDS = (
+    "index vector chunk embedding query retrieval note model prompt context "
+    "search token cache latency source document faiss answer batch score "
+    "python markdown update metadata stream server memory storage config"
+).split()
+
+
+def _sentence(rng: random.Random, n_words: int = 12) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(n_words)).capitalize() + "."
+
+
+def _paragraph(rng: random.Random, size: int) -> list[str]:
+    lines, total = [], 0
+    while total < size:
+        line = _sentence(rng, rng.randint(6, 20))
+        lines.append(line)
+        total += len(line) + 1
+
+    return lines
+
+
+def _markdown(rng: random.Random, size: int) -> str:
+    lines = []
+    for section in range(max(size // 800, 1)):
+        lines.append(f"## Section {section}")
+        lines.extend(_paragraph(rng, 800))
+        lines.append("")
+
+    return "# Note\n\n" + "\n".join(lines)
+
+
+def _python(rng: random.Random, size: int) -> str:
+    lines = ["import os", ""]
+    for n in range(max(size // 300, 1)):
+        lines.append(f"def func_{n}(x):")
+        lines.append(f'    """ {_sentence(rng)} """')
+        for _ in range(rng.randint(3, 8)):
+            lines.append(f"    x = x + {rng.randint(0, 99)}  # {rng.choice(WORDS)}")
+        lines.append("    return x")
+        lines.append("")
+
+    return "\n".join(lines)
+
+
+def _write_pdf(path: Path, rng: random.Random, size: int) -> None:
+    doc = pymupdf.open()
+    lines = _paragraph(rng, size)
+
+    # ~40 lines per page
+    for start in range(0, len(lines), 40):
+        page = doc.new_page()
+        page.insert_text((50, 50), "\n".join(lines[start : start + 40]), fontsize=8)
+
+    doc.save(path)
+    doc.close()
+
+
+def generate_corpus(
+    notes_dir: Path,
+    *,
+    n_files: int = 200,
+    file_size: int = 4_000,
+    mix: dict[str, float] | None = None,
+    seed: int = 0,
+) -> list[Path]:
+    """ write a reproducible synthetic notes directory """
+    mix = mix or {"md": 0.6, "py": 0.3, "pdf": 0.1}
+    rng = random.Random(seed)
+    notes_dir.mkdir(parents=True, exist_ok=True)
+
+    kinds = rng.choices(list(mix), weights=list(mix.values()), k=n_files)
+    paths = []
+
+    for i, kind in enumerate(kinds):
+        path = notes_dir / f"topic_{i % 10}" / f"note_{i:05d}.{kind}"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        size = int(file_size * rng.uniform(0.5, 1.5))
+
+        if kind == "pdf":
+            _write_pdf(path, rng, size)
+        elif kind == "py":
+            path.write_text(_python(rng, size), encoding="utf-8")
+        else :
+            path.write_text(_markdown(rng, size), encoding="utf-8")
+
+        paths.append(path)
+
+    return paths
+
+
+def modify_fraction(
+    paths: list[Path],
+    fraction: float,
+    *,
+    seed: int = 0,
+) -> list[Path]:
+    """ append a line to a fraction of the text notes """
+    rng = random.Random(seed)
+    candidates = [p for p in paths if p.suffix != ".pdf"]
+    changed = rng.sample(candidates, max(int(len(candidates) * fraction), 1))
+
+    for path in changed:
+        with path.open("a", encoding="utf-8") as f:
+            f.write(f"\n# edit {rng.random()}\n")
+
+    return changed
@@ -0,0 +1,136 @@
+import hashlib
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+
+WORD_RE = re.compile(r"\w+|[^\w\s]")
+
+
+class FakeTokenizer:
+    """ word-level tokenizer with the fast-tokenizer call signature """
+
+    def __call__(self, texts, add_special_tokens=False, return_offsets_mapping=False):
+        single = isinstance(texts, str)
+        texts = [texts] if single else texts
+
+        offsets = [
+            [m.span() for m in WORD_RE.finditer(text)]
+            for text in texts
+        ]
+        encoded = {
+            "input_ids": [list(range(len(o))) for o in offsets],
+            "offset_mapping": offsets,
+        }
+
+        if single:
+            return {k: v[0] for k, v in encoded.items()}
+
+        return encoded
+
+    def num_special_tokens_to_add(self, pair: bool = False) -> int:
+        return 2
+
+
+class FakeEmbedder:
+    """ deterministic CPU embedder: hashed bag of words, no model download """
+
+    def __init__(self, dim: int = 384, max_seq_length: int = 256) -> None:
+        self.dim = dim
+        self.max_seq_length = max_seq_length
+        self.tokenizer = FakeTokenizer()
+
+    def _embed(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype="float32")
+
+        for word in WORD_RE.findall(text.lower())[: self.max_seq_length]:
+            h = int.from_bytes(
+                hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(),
+                "little",
+            )
+            vector[h % self.dim] += 1.0 if (h >> 32) & 1 else -1.0
+
+        return vector
+
+    def encode(
+        self,
+        texts: list[str],
+        normalize_embeddings: bool = False,
+        convert_to_numpy: bool = True,
+        **kws,
+    ) -> np.ndarray:
+        embeddings = np.stack([self._embed(t) for t in texts])
+
+        if normalize_embeddings:
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings /= np.maximum(norms, 1e-12)
+
+        return embeddings
+
+
+class StubLLMServer:
+    """ Ollama compatible /api/chat server streaming a fixed answer """
+
+    def __init__(
+        self,
+        *,
+        answer: str = "This is a stub answer from the benchmark server. " * 4,
+        first_token_delay: float = 0.05,
+        token_delay: float = 0.002,
+    ) -> None:
+        self.answer = answer
+        self.first_token_delay = first_token_delay
+        self.token_delay = token_delay
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                tokens = stub.answer.split(" ")
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.end_headers()
+
+                time.sleep(stub.first_token_delay)
+
+                if not payload.get("stream"):
+                    body = {"message": {"content": stub.answer}, "done": True}
+                    self.wfile.write(json.dumps(body).encode("utf-8"))
+                    return
+
+                for token in tokens:
+                    chunk = {"message": {"content": token + " "}, "done": False}
+                    self.wfile.write(json.dumps(chunk).encode("utf-8") + b"\n")
+                    self.wfile.flush()
+                    time.sleep(stub.token_delay)
+
+                done = {"message": {"content": ""}, "done": True, "eval_count": len(tokens)}
+                self.wfile.write(json.dumps(done).encode("utf-8") + b"\n")
+
+        return Handler
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._server.shutdown()
+        self._server.server_close()
@@ -1,19 +1,36 @@
 import argparse
+import atexit
 import sys
+from contextlib import nullcontext, redirect_stdout
 from pydantic import ValidationError
-from collections.abc import Iterator
+from collections.abc import Callable, Iterator
 
-from rag_notes_helper.core.config import get_settings
+from rag_notes_helper.core.config import active_profile, get_settings, use_profile
 from rag_notes_helper.rag.index import (
     RagIndex,
+    build_profiles,
     load_or_build_index,
+    preload_index,
     rebuild_index,
+    rechunk_index,
 )
 from rag_notes_helper.eval.eval_runner import run_evaluation
+from rag_notes_helper.eval.retrieval_bench import run_retrieval_evaluation
+from rag_notes_helper.rag.generations import current_generation
 from rag_notes_helper.rag.meta_store import MetaStore
+from rag_notes_helper.rag.prefetch import Prefetcher
+from rag_notes_helper.rag.profiles import ProfileSet, resolve_profiles
 from rag_notes_helper.rag.retrieval import retrieve
-from rag_notes_helper.rag.answer import rag_answer
+from rag_notes_helper.rag.session import ChatSession
+from rag_notes_helper.rag.structured import run_structured
+from rag_notes_helper.rag.watcher import IndexWatcher
+from rag_notes_helper.rag.answer import SYSTEM_PROMPT, rag_answer
+from rag_notes_helper.rag.llm import get_llm
+from rag_notes_helper.utils.events import EventWriter
 from rag_notes_helper.utils.logger import get_logger
+from rag_notes_helper.utils.metrics import dump_metrics, get_metrics
+from rag_notes_helper.utils.query_reader import QueryReader
+from rag_notes_helper.utils.threads import run_in_background
 from rag_notes_helper.utils.timer import time_block, deco_time_block
 
 
@@ -37,15 +54,20 @@ def show_config():
     print(f"    API Key    : {settings.llm.api_key}")
 
     print("\nEmbedding:")
+    print(f"    Profile    : {active_profile()}")
     print(f"    Model      : {settings.embed_model_name}")
+    print(f"    Index      : {settings.index_type}")
 
     print("\nChunking:")
     print(f"    Size       : {settings.chunk_size}")
     print(f"    Overlap    : {settings.chunk_overlap}")
+    print(f"    Unit       : {settings.chunk_unit}")
+    print(f"    Structured : {settings.structured_chunking}")
 
     print("\nRetrieval:")
     print(f"    TOP_K      : {settings.top_k}")
     print(f"    Min Score  : {settings.min_retrieval_score}")
+    print(f"    MMR        : {settings.mmr}")
 
     print("\nFormat:")
     print(f"    stream     : {settings.stream}")
@@ -54,6 +76,9 @@ def show_config():
     print("\nPaths:")
     print(f"    Notes dir  : {settings.notes_dir}")
     print(f"    Storage dir: {settings.storage_dir}")
+    generation = current_generation()
+    print(f"    Generation : {generation.name if generation else None}")
+    print(f"    Profiles   : {', '.join(resolve_profiles(['all']))}")
 
     print("\nConfig check completed")
 
@@ -65,6 +90,11 @@ def show_sources(meta_store: MetaStore):
         print(f"- {s}")
 
 
+def show_metrics():
+    print("\nLATENCY (ms):\n")
+    print(get_metrics().summary())
+
+
 @deco_time_block
 def show_citations(result, show_full: bool = False):
     if show_full:
@@ -101,33 +131,72 @@ def display_ansewr(answer):
 
 
 def run_onetime(
-    rag: RagIndex,
-    meta_store: MetaStore,
+    rag: RagIndex | None,
+    meta_store: MetaStore | None,
     *,
     query: str,
     citations: bool = False,
+    search: Callable[[str], list[dict]] | None = None,
 ) -> None:
-    hits = retrieve(rag, meta_store, query=query)
+    with time_block("total"):
+        hits = (
+            search(query) if search
+            else retrieve(rag, meta_store, query=query) # type: ignore
+        )
 
-    logger.info((f"query: {query[:20]}{' ...' if len(query) > 20 else ''}"))
-    result = rag_answer(query, hits=hits)
+        logger.info((f"query: {query[:20]}{' ...' if len(query) > 20 else ''}"))
+        result = rag_answer(query, hits=hits)
 
-    display_ansewr(result["answer"])
+        display_ansewr(result["answer"])
 
     if citations and result["citations"]:
         show_citations(result)
 
 
+def _make_prefetcher(rag: RagIndex, meta_store: MetaStore) -> Prefetcher | None:
+    return Prefetcher(rag, meta_store) if get_settings().prefetch else None
+
+
+def _swap_index(
+    rag: RagIndex,
+    meta_store: MetaStore,
+    prefetcher: Prefetcher | None,
+) -> tuple[MetaStore, Prefetcher | None]:
+    """ reopen the readers pinned to the old generation on a new one """
+    if prefetcher:
+        prefetcher.close()
+    meta_store.close()
+
+    meta_store = MetaStore(rag.path)
+    return meta_store, _make_prefetcher(rag, meta_store)
+
+
 def repl(
     rag: RagIndex | None = None,
     meta_store: MetaStore | None = None,
     *,
     citations: bool = False,
+    watch: bool = False,
 ):
-    rag = rag or load_or_build_index()
-    meta_store = meta_store or MetaStore()
+    rag = rag or preload_index()
+    meta_store = meta_store or MetaStore(rag.path)
+    prefetcher = _make_prefetcher(rag, meta_store)
+    watcher = IndexWatcher() if watch or get_settings().watch else None
+    session = ChatSession() if get_settings().session else None
     stream_response: bool = get_settings().stream
 
+    def speculate(query: str) -> None:
+        # on the reader thread, as soon as a query is entered, which may
+        # be while the previous answer still streams
+        if prefetcher and query and query[0] not in ":;":
+            try :
+                prefetcher.embed(query)
+            except RuntimeError:
+                # swapped for a new index meanwhile
+                pass
+
+    reader = QueryReader(on_query=speculate)
+
     print(
         "\nRAG-based Notes Helper\n"
         "(enter ':h' for help)\n"
@@ -137,7 +206,23 @@ def repl(
     try :
         while True:
             try :
-                query = input("> ").strip()
+                query = reader.get()
+
+                # a build the watcher finished while the user was typing
+                new_rag = watcher.take() if watcher else None
+                if new_rag is not None:
+                    rag = new_rag
+                    meta_store, prefetcher = _swap_index(rag, meta_store, prefetcher)
+                    if session is not None:
+                        session.reset()
+                    print("\n/Index updated from changed notes")
+
+                # usually started by speculate() already
+                q_future = (
+                    prefetcher.embed(query)
+                    if prefetcher and query and query[0] not in ":;"
+                    else None
+                )
                 logger.info(f"[input]: {query}")
             except KeyboardInterrupt:
                 print("\nBye~")
@@ -156,15 +241,32 @@ def repl(
                     break
 
                 if query in {":update", ":ud", ":reindex", ":ri"}:
-                    meta_store.close()
-
+                    # the new build is a separate generation, the open
+                    # one stays valid until the swap below
                     do_force = query in {":reindex", ":ri"}
                     with time_block(
                         f"rebuild_index({'force' if do_force else 'smart'})"
                     ):
                         rag = rebuild_index(force=do_force)
 
-                    meta_store = MetaStore()
+                    meta_store, prefetcher = _swap_index(rag, meta_store, prefetcher)
+                    # chunk ids of the new index differ, start over
+                    if session is not None:
+                        session.reset()
+
+                    print()
+                    continue
+
+                if query in {":rechunk", ":rc"}:
+                    # the new build is a separate generation, the open
+                    # one stays valid until the swap below
+                    with time_block("rechunk_index"):
+                        rag = rechunk_index()
+
+                    meta_store, prefetcher = _swap_index(rag, meta_store, prefetcher)
+                    # chunk ids of the new index differ, start over
+                    if session is not None:
+                        session.reset()
 
                     print()
                     continue
@@ -197,6 +299,36 @@ def repl(
                     stream_response = not stream_response
                     continue
 
+                if query in {":session", ":se"}:
+                    if session is None:
+                        session = ChatSession()
+                        print("\n/Session mode, follow-ups reuse earlier turns\n")
+                    else :
+                        session = None
+                        print("\n/Single question mode\n")
+                    continue
+
+                if query in {":watch", ":wa"}:
+                    if watcher is None:
+                        watcher = IndexWatcher()
+                        print(f"\n/Watching notes ({watcher.watcher.backend})\n")
+                    else :
+                        watcher.close()
+                        watcher = None
+                        print("\n/Stopped watching notes\n")
+                    continue
+
+                if query in {":reset", ":rs"}:
+                    if session is not None:
+                        session.reset()
+                    print("\n/Conversation cleared\n")
+                    continue
+
+                if query in {":metrics", ":m"}:
+                    show_metrics()
+                    print()
+                    continue
+
                 if query in {":evaluate", ":ev"}:
                     run_evaluation()
                     continue
@@ -208,10 +340,15 @@ def repl(
                         "  :help      or  :h    -> show instructions\n"
                         "  :reindex   or  :ri   -> rebuild rag (hard update)\n"
                         "  :update    or  :ud   -> update data (soft update)\n"
+                        "  :rechunk   or  :rc   -> re-chunk stored notes\n"
                         "  :citations or  :ci   -> show citation files\n"
                         "  :sources   or  :so   -> show all source files\n"
                         "  :config    or  :co   -> check configuration\n"
                         "  :stream    or  :s    -> toggle stream mode\n"
+                        "  :session   or  :se   -> toggle multi-turn session\n"
+                        "  :reset     or  :rs   -> clear session history\n"
+                        "  :watch     or  :wa   -> toggle index updates on note changes\n"
+                        "  :metrics   or  :m    -> show latency summary\n"
                         "  :evaluate  or  :ev   -> evaluate rag\n"
                     )
                     continue
@@ -221,17 +358,34 @@ def repl(
 
             logger.info((f"query: {query[:20]}{' ...' if len(query) > 20 else ''}"))
 
-            hits = retrieve(rag, meta_store, query=query)
+            with time_block("total"):
+                hits = retrieve(
+                    rag,
+                    meta_store,
+                    query=query,
+                    q_emb=q_future.result() if q_future else None,
+                )
 
-            result = rag_answer(query, hits=hits, stream=stream_response)
+                if session is not None:
+                    result = session.ask(query, hits=hits, stream=stream_response)
+                else :
+                    result = rag_answer(query, hits=hits, stream=stream_response)
 
-            display_ansewr(result["answer"])
+                display_ansewr(result["answer"])
+
+            # likely follow-ups land near the chunks just cited
+            if prefetcher and hits:
+                prefetcher.warm_neighbors(hits)
 
             if citations and result["citations"]:
                 show_citations(result, show_full=True)
 
             print()
     finally :
+        if watcher:
+            watcher.close()
+        if prefetcher:
+            prefetcher.close()
         meta_store.close()
 
 
@@ -254,6 +408,13 @@ def build_parser() -> argparse.ArgumentParser:
         help="Start interactive REPL mode",
     )
 
+    parser.add_argument(
+        "-w",
+        "--watch",
+        action="store_true",
+        help="Start the REPL and update the index as notes change.",
+    )
+
     parser.add_argument(
         "-ev",
         "--eval",
@@ -261,6 +422,13 @@ def build_parser() -> argparse.ArgumentParser:
         help="Run RAG evaluation (RAGAS)",
     )
 
+    parser.add_argument(
+        "-er",
+        "--eval-retrieval",
+        action="store_true",
+        help="Run the offline retrieval benchmark (no LLM).",
+    )
+
     parser.add_argument(
         "-ud",
         "--update",
@@ -275,6 +443,36 @@ def build_parser() -> argparse.ArgumentParser:
         help="Rebuild the index from scratch.",
     )
 
+    parser.add_argument(
+        "-rc",
+        "--rechunk",
+        action="store_true",
+        help="Re-chunk stored line streams with current chunk settings.",
+    )
+
+    parser.add_argument(
+        "-p",
+        "--profile",
+        action="append",
+        metavar="NAME",
+        help=(
+            "Index profile to use (repeatable). Several profiles, or 'all', "
+            "are built together and their retrieval results are fused."
+        ),
+    )
+
+    output = parser.add_mutually_exclusive_group()
+    output.add_argument(
+        "--json",
+        action="store_true",
+        help="Print the answer, hits, citations and timings as one JSON object.",
+    )
+    output.add_argument(
+        "--ndjson",
+        action="store_true",
+        help="Stream retrieval, token, answer and timing events as JSON lines.",
+    )
+
     parser.add_argument(
         "-co",
         "--config",
@@ -289,6 +487,13 @@ def build_parser() -> argparse.ArgumentParser:
         help="Show citation information with query results.",
     )
 
+    parser.add_argument(
+        "-m",
+        "--metrics",
+        action="store_true",
+        help="Print per-stage latency summary before exit.",
+    )
+
     parser.add_argument(
         "-so",
         "--sources",
@@ -300,29 +505,162 @@ def build_parser() -> argparse.ArgumentParser:
 
 
 def main():
+    # latency of the whole run is exported once the process exits
+    atexit.register(dump_metrics)
+
     parser = build_parser()
     args = parser.parse_args()
     query = (" ".join(args.query)).strip()
+    args.repl = args.repl or args.watch
+    profiles = resolve_profiles(args.profile)
     logger.info(
         f"[input]: rag-app{f' {query}' if query else ''}"
         f"{' --repl' if args.repl else ''}"
+        f"{' --watch' if args.watch else ''}"
         f"{' --reindex' if args.reindex else ''}"
         f"{' --update' if args.update else ''}"
+        f"{' --rechunk' if args.rechunk else ''}"
         f"{' --citations' if args.citations else ''}"
         f"{' --sources' if args.sources else ''}"
         f"{' --config' if args.config else ''}"
         f"{' --eval' if args.eval else ''}"
+        f"{' --eval-retrieval' if args.eval_retrieval else ''}"
+        f"{' --metrics' if args.metrics else ''}"
+        f"{' --json' if args.json else ''}"
+        f"{' --ndjson' if args.ndjson else ''}"
+        + "".join(f" --profile {name}" for name in args.profile or [])
     )
     logger.info(f"config: {get_settings().model_dump_json()}")
 
-    with time_block("start up preparation"):
-        rag = (
-            rebuild_index(force=args.reindex)
-            if args.update or args.reindex
-            else load_or_build_index()
-        )
+    events = None
+    if args.json or args.ndjson:
+        if args.repl or not query:
+            parser.error("--json and --ndjson answer a single query, not the REPL")
+        events = EventWriter(sys.stdout, ndjson=args.ndjson)
+
+    unknown = set(profiles) - set(resolve_profiles(["all"]))
+    if unknown:
+        parser.error(f"unknown index profile: {', '.join(sorted(unknown))}")
+
+    if len(profiles) > 1 and (args.repl or args.eval or args.eval_retrieval):
+        parser.error("several profiles are fused for single queries only")
+
+    # stdout carries only events, notices and progress go to stderr
+    with redirect_stdout(sys.stderr) if events else nullcontext():
+        if len(profiles) > 1:
+            _run_profiles(args, parser, query, events, profiles)
+            return
+
+        # every setting read below is the routed profile's
+        with use_profile(profiles[0]):
+            _run(args, parser, query, events)
+
+
+def _warm_up_llm() -> None:
+    # a local LLM loads the model and caches the system prompt meanwhile
+    run_in_background(
+        get_llm().warm_up,
+        [{"role": "system", "content": SYSTEM_PROMPT}],
+        name="llm-warm-up",
+    )
 
-        meta_store = MetaStore()
+
+def _run_profiles(
+    args: argparse.Namespace,
+    parser: argparse.ArgumentParser,
+    query: str,
+    events: EventWriter | None,
+    profiles: list[str],
+) -> None:
+    """ index commands applied to every profile, the query fused over them """
+    if query:
+        _warm_up_llm()
+
+    if args.reindex:
+        build_profiles(profiles)
+
+    for name in profiles:
+        with use_profile(name):
+            if args.update:
+                rebuild_index()
+            elif args.rechunk:
+                rechunk_index()
+
+            if args.config:
+                show_config()
+
+            if args.sources:
+                with MetaStore() as meta_store:
+                    show_sources(meta_store)
+
+    if query:
+        with ProfileSet(profiles) as profile_set:
+            if events is not None:
+                logger.info("==== run_structured start ====")
+                ok = run_structured(
+                    None,
+                    None,
+                    events,
+                    query=query,
+                    search=profile_set.retrieve,
+                )
+                logger.info("==== run_structured end ====")
+                if not ok:
+                    sys.exit(1)
+
+            else :
+                logger.info("==== run_onetime start ====")
+                run_onetime(
+                    None,
+                    None,
+                    query=query,
+                    citations=args.citations,
+                    search=profile_set.retrieve,
+                )
+                logger.info("==== run_onetime end ====")
+
+    elif not (
+        args.config
+        or args.sources
+        or args.reindex
+        or args.update
+        or args.rechunk
+    ):
+        parser.print_help()
+        sys.exit(1)
+
+    if args.metrics:
+        show_metrics()
+
+
+def _run(
+    args: argparse.Namespace,
+    parser: argparse.ArgumentParser,
+    query: str,
+    events: EventWriter | None,
+) -> None:
+    # builds its own in-memory indexes, the served index is not needed
+    if args.eval_retrieval:
+        run_retrieval_evaluation()
+        return
+
+    # the embedding model loads while the index is read and the user types
+    if query or args.repl:
+        RagIndex.preload()
+        _warm_up_llm()
+
+    with time_block("start up preparation"):
+        if args.update or args.reindex:
+            rag = rebuild_index(force=args.reindex)
+        elif args.rechunk:
+            rag = rechunk_index()
+        elif args.repl:
+            rag = preload_index()
+        else :
+            rag = load_or_build_index()
+
+        # pinned to the generation the index was loaded from
+        meta_store = MetaStore(rag.path)
 
     if args.eval:
         run_evaluation()
@@ -348,9 +686,17 @@ def main():
             rag,
             meta_store,
             citations=args.citations,
+            watch=args.watch,
         )
         logger.info("==== REPL end ====")
 
+    elif events is not None:
+        logger.info("==== run_structured start ====")
+        ok = run_structured(rag, meta_store, events, query=query)
+        logger.info("==== run_structured end ====")
+        if not ok:
+            sys.exit(1)
+
     elif query and not args.repl:
         logger.info("==== run_onetime start ====")
         run_onetime(
@@ -361,10 +707,19 @@ def main():
         )
         logger.info("==== run_onetime end ====")
 
-    elif not (args.config or args.sources or args.reindex or args.update):
+    elif not (
+        args.config
+        or args.sources
+        or args.reindex
+        or args.update
+        or args.rechunk
+    ):
         parser.print_help()
         sys.exit(1)
 
+    if args.metrics:
+        show_metrics()
+
 
 if __name__ == "__main__":
     main()
@@ -1,8 +1,12 @@
 from __future__ import annotations
 
+import re
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
 from functools import lru_cache
 from pathlib import Path
-from typing import Literal
+from typing import Any, Literal
 
 from pydantic import (
     Field,
@@ -25,8 +29,30 @@ class LLMSettings(BaseSettings):
     api_key: SecretStr | None = None
 
     max_chunks: int = Field(5, gt=0, le=50)
+    # estimated prompt tokens spent on retrieved context
+    context_tokens: int = Field(3000, gt=0)
+    trim_sentences: bool = False
+    trim_keep_ratio: float = Field(0.5, gt=0, le=1)
     max_tokens: int = Field(1024, gt=0)
     temperature: float = Field(0.3, gt=0, le=1)
+    # REPL session mode: turns kept and estimated tokens of kept history
+    session_turns: int = Field(6, gt=0, le=50)
+    session_tokens: int = Field(8000, gt=0)
+
+    # seconds before a provider request is abandoned
+    timeout: float = Field(120, gt=0)
+
+    # hedging: race this provider when the first token is later than hedge_after
+    hedge_provider: Literal["hf", "openai", "ollama", "gemini"] | None = None
+    hedge_model: str | None = None
+    hedge_api_key: SecretStr | None = None
+    hedge_after: float = Field(3.0, gt=0)
+
+    # ollama: how long the model stays loaded after a request ("-1" = forever),
+    # context window and CPU threads, unset uses the server defaults
+    keep_alive: str | None = "30m"
+    num_ctx: int | None = Field(None, gt=0)
+    num_thread: int | None = Field(None, gt=0)
 
     eval_provider: Literal["openai", "ollama", "gemini"] = "gemini"
     eval_model: str = "gemini-2.0-flash"
@@ -37,6 +63,13 @@ class LLMSettings(BaseSettings):
     def api_key_str(self) -> str | None:
         return self.api_key.get_secret_value() if self.api_key else None
 
+    @property
+    def hedge_api_key_str(self) -> str | None:
+        if self.hedge_api_key:
+            return self.hedge_api_key.get_secret_value()
+
+        return self.api_key_str
+
     @model_validator(mode="after")
     def validate_llm(self) -> LLMSettings:
         if self.provider != "ollama" and not self.api_key:
@@ -45,6 +78,13 @@ class LLMSettings(BaseSettings):
         if self.provider == "ollama" and "/" in self.model:
             raise ValueError("Ollama model name should be like 'llama3'")
 
+        if self.hedge_provider is not None:
+            if not self.hedge_model:
+                raise ValueError("LLM_HEDGE_MODEL is required with LLM_HEDGE_PROVIDER")
+
+            if self.hedge_provider != "ollama" and not self.hedge_api_key_str:
+                raise ValueError(f"API Key is required for {self.hedge_provider}")
+
         return self
 
 
@@ -62,17 +102,75 @@ class Settings(BaseSettings):
 
     # embedding model
     embed_model_name: str = Field("sentence-transformers/all-MiniLM-L6-v2")
+    # index builds: encoder processes, torch threads each (default cores /
+    # workers) and internal batch size (0 tunes it on the first large batch)
+    embed_workers: int = Field(1, ge=1, le=64)
+    embed_threads: int | None = Field(None, gt=0)
+    embed_batch_size: int = Field(0, ge=0, le=1024)
+
+    # vector index: exact inner product search or an HNSW graph
+    index_type: Literal["flat", "hnsw"] = "flat"
+    hnsw_m: int = Field(32, ge=4, le=128)
+    hnsw_ef_search: int = Field(64, gt=0, le=4096)
+    # two-stage flat search: coarse_dim wide projections (pca, or the
+    # "prefix" of matryoshka embeddings) shortlist coarse_candidates rows
+    # that are re-scored with full vectors, 0 searches full width only
+    coarse_dim: int = Field(0, ge=0, le=4096)
+    coarse_method: Literal["pca", "prefix"] = "pca"
+    coarse_candidates: int = Field(200, gt=0, le=10000)
 
     # chunking strategy
     chunk_size: int = Field(1000, gt=0)
     chunk_overlap: int = Field(200, gt=0)
+    # "tokens" measures chunks with the embedding model's tokenizer
+    chunk_unit: Literal["chars", "tokens"] = "chars"
+    # split .md on headings and .py on top-level defs/classes
+    structured_chunking: bool = True
+
+    # store one vector per exact / near-duplicate (SimHash) chunk cluster
+    dedup_chunks: bool = True
+    dedup_max_distance: int = Field(5, ge=0, le=7)
+
+    # chunk records: "none" keeps meta.jsonl, "zlib" / "zstd" (zstandard
+    # package) compress blocks of meta_block_records records each
+    meta_compression: Literal["none", "zlib", "zstd"] = "none"
+    meta_block_records: int = Field(64, gt=0, le=4096)
+
+    # index builds kept on disk, older ones are deleted after a new publish
+    keep_generations: int = Field(2, ge=1, le=20)
+
+    # named indexes kept side by side in storage_dir/profiles/<name>, each
+    # overriding index settings, e.g. {"large": {"embed_model_name": "..."}}
+    profiles: dict[str, dict[str, Any]] = Field(default_factory=dict)
+    # line streams of the notes, shared by every profile
+    lines_dir: Path | None = None
 
     # retrieval
     top_k: int = Field(5, gt=0, le=50)
     min_retrieval_score: float = Field(0.2, ge=0, le=1)
+    # adjacent chunks of the same document appended to each hit
+    retrieval_neighbors: int = Field(0, ge=0, le=5)
+    # maximal marginal relevance over mmr_fetch_k candidates
+    mmr: bool = False
+    mmr_fetch_k: int = Field(20, gt=0, le=200)
+    mmr_lambda: float = Field(0.5, ge=0, le=1)
+    # REPL: embed queries early and warm records around cited chunks
+    prefetch: bool = True
+    prefetch_radius: int = Field(2, ge=0, le=10)
+
+    # REPL: watch notes_dir and apply debounced incremental updates
+    watch: bool = False
+    watch_debounce: float = Field(1.0, gt=0, le=60)
+    # polling fallback where inotify is unavailable
+    watch_poll_interval: float = Field(2.0, gt=0, le=300)
+
+    # evaluation: concurrent questions answered while building the dataset
+    eval_workers: int = Field(4, gt=0, le=32)
 
     # format
     stream: bool = True
+    # REPL starts in multi-turn session mode
+    session: bool = False
     line_width: int = 80
 
     # path
@@ -97,6 +195,17 @@ class Settings(BaseSettings):
                 f"exceed LLM_MAX_CHUNKS ({self.llm.max_chunks})"
             )
 
+        # profiles
+        for name, overrides in self.profiles.items():
+            if name == DEFAULT_PROFILE or not PROFILE_NAME.fullmatch(name):
+                raise ValueError(f"Invalid profile name: {name!r}")
+
+            unknown = set(overrides) - PROFILE_FIELDS
+            if unknown:
+                raise ValueError(
+                    f"Profile {name!r} cannot override {', '.join(sorted(unknown))}"
+                )
+
         # path logic
         if not self.notes_dir.exists():
             raise ValueError("data/ is missing")
@@ -107,7 +216,70 @@ class Settings(BaseSettings):
         return self
 
 
+# name of the index in storage_dir itself
+DEFAULT_PROFILE = "default"
+PROFILE_NAME = re.compile(r"[A-Za-z0-9][A-Za-z0-9_.-]*")
+# settings that shape an index, the rest is shared by every profile
+PROFILE_FIELDS = {
+    "embed_model_name",
+    "embed_workers",
+    "embed_threads",
+    "embed_batch_size",
+    "index_type",
+    "hnsw_m",
+    "hnsw_ef_search",
+    "coarse_dim",
+    "coarse_method",
+    "coarse_candidates",
+    "chunk_size",
+    "chunk_overlap",
+    "chunk_unit",
+    "structured_chunking",
+    "dedup_chunks",
+    "dedup_max_distance",
+    "meta_compression",
+    "meta_block_records",
+    "min_retrieval_score",
+}
+
+# profile served in the current context, None is the default index
+_active_profile: ContextVar[str | None] = ContextVar("profile", default=None)
+
+
 @lru_cache
+def _profile_settings(profile: str | None) -> Settings:
+    if profile is None:
+        return Settings()
+
+    base = _profile_settings(None)
+    if profile not in base.profiles:
+        raise ValueError(f"Unknown index profile: {profile}")
+
+    return Settings.model_validate({
+        **dict(base),
+        **base.profiles[profile],
+        "storage_dir": base.storage_dir / "profiles" / profile,
+        "lines_dir": base.lines_dir or base.storage_dir / "lines",
+    })
+
+
 def get_settings() -> Settings:
-    return Settings()
+    return _profile_settings(_active_profile.get())
+
+get_settings.cache_clear = _profile_settings.cache_clear # type: ignore
+
+
+def active_profile() -> str:
+    return _active_profile.get() or DEFAULT_PROFILE
+
+
+@contextmanager
+def use_profile(name: str | None) -> Iterator[Settings]:
+    """ get_settings() returns the settings of profile name inside the block """
+    token = _active_profile.set(None if name == DEFAULT_PROFILE else name)
+
+    try :
+        yield get_settings()
+    finally :
+        _active_profile.reset(token)
 
@@ -1,7 +1,7 @@
 import json
 from datasets import Dataset
 
-from rag_notes_helper.eval.rag_runner import run_single_query
+from rag_notes_helper.eval.rag_runner import run_queries
 
 
 def load_testset(path: str) -> list[dict]:
@@ -10,7 +10,13 @@ def load_testset(path: str) -> list[dict]:
 
 
 def build_dataset(rag, meta_store, testset_path: str) -> Dataset:
-    records = load_testset(testset_path)
+    records = [
+        item for item in load_testset(testset_path)
+        if item.get("type") != "system"
+    ]
+
+    # cached answers of the same config are reused, the rest run concurrently
+    results = run_queries(rag, meta_store, [item["question"] for item in records])
 
     rows = {
         "question": [],
@@ -20,13 +26,10 @@ def build_dataset(rag, meta_store, testset_path: str) -> Dataset:
     }
 
     for item in records:
-        if item.get("type") == "system":
-            continue
-        
         question = item["question"]
         ground_truth = item.get("ground_truth", "")
 
-        result = run_single_query(rag, meta_store, question)
+        result = results[question]
 
         rows["question"].append(question)
         rows["answer"].append(result.answer)
@@ -10,7 +10,7 @@ from rag_notes_helper.eval.ragas_runner import run_ragas
 
 def run_evaluation():
     rag = load_or_build_index()
-    meta_store = MetaStore()
+    meta_store = MetaStore(rag.path)
 
     try :
         dataset = build_dataset(
@@ -1,8 +1,51 @@
-from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import asdict, dataclass
+from pathlib import Path
 from typing import List
+import contextvars
+import hashlib
+import json
 
+from tqdm import tqdm
+
+from rag_notes_helper.core.config import get_settings
+from rag_notes_helper.rag.generations import INDEX_FILE, current_generation
 from rag_notes_helper.rag.retrieval import retrieve
 from rag_notes_helper.rag.answer import rag_answer
+from rag_notes_helper.utils.logger import get_logger
+
+
+logger = get_logger("eval")
+
+# settings that change retrieved contexts or generated answers
+ANSWER_CONFIG = {
+    "embed_model_name": True,
+    "chunk_size": True,
+    "chunk_overlap": True,
+    "chunk_unit": True,
+    "structured_chunking": True,
+    "dedup_chunks": True,
+    "dedup_max_distance": True,
+    "top_k": True,
+    "min_retrieval_score": True,
+    "retrieval_neighbors": True,
+    "mmr": True,
+    "mmr_fetch_k": True,
+    "mmr_lambda": True,
+    "coarse_dim": True,
+    "coarse_method": True,
+    "coarse_candidates": True,
+    "llm": {
+        "provider",
+        "model",
+        "max_chunks",
+        "context_tokens",
+        "trim_sentences",
+        "trim_keep_ratio",
+        "max_tokens",
+        "temperature",
+    },
+}
 
 
 @dataclass
@@ -35,3 +78,109 @@ def run_single_query(rag, meta_store, query: str) -> QAResult:
         sources=sources,
         scores=scores,
     )
+
+
+def config_hash(generation: Path | None = None) -> str:
+    """
+    fingerprint of the answer settings and the index version, generation
+    is the one the answering rag is pinned to (default the served one)
+    """
+    settings = get_settings()
+    config = settings.model_dump(mode="json", include=ANSWER_CONFIG)
+
+    generation = generation or current_generation()
+    if generation is not None:
+        stat = (generation / INDEX_FILE).stat()
+        config["index"] = [generation.name, stat.st_size, stat.st_mtime_ns]
+
+    raw = json.dumps(config, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(raw).hexdigest()[:16]
+
+
+def checkpoint_path(generation: Path | None = None) -> Path:
+    answers_dir = get_settings().reports_dir / "answers"
+    return answers_dir / f"{config_hash(generation)}.jsonl"
+
+
+def load_checkpoint(path: Path) -> dict[str, QAResult]:
+    """ question -> answered result, a torn last line is ignored """
+    results: dict[str, QAResult] = {}
+    if not path.exists():
+        return results
+
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            try :
+                result = QAResult(**json.loads(line))
+            except (json.JSONDecodeError, TypeError):
+                continue
+
+            results[result.question] = result
+
+    return results
+
+
+def run_queries(
+    rag,
+    meta_store,
+    questions: list[str],
+    *,
+    workers: int | None = None,
+    checkpoint: Path | None = None,
+) -> dict[str, QAResult]:
+    """
+    answer questions on a bounded thread pool, appending each result
+    to the checkpoint so an interrupted run resumes where it stopped
+    """
+    workers = workers or get_settings().eval_workers
+    # keyed on the generation answering, a rebuild may publish meanwhile
+    checkpoint = checkpoint or checkpoint_path(rag.path)
+    checkpoint.parent.mkdir(parents=True, exist_ok=True)
+
+    results = load_checkpoint(checkpoint)
+    pending = [q for q in dict.fromkeys(questions) if q not in results]
+    logger.info(
+        f"[EVAL] {len(questions) - len(pending)} cached, {len(pending)} to answer "
+        f"with {workers} workers, checkpoint {checkpoint.name}"
+    )
+
+    if not pending:
+        return results
+
+    # load the embedding model once, before workers race on it
+    rag.embed_model
+
+    failed: list[str] = []
+    with (
+        checkpoint.open("a", encoding="utf-8") as f,
+        ThreadPoolExecutor(max_workers=workers) as pool,
+    ):
+        # workers answer with the caller's index profile
+        futures = {
+            pool.submit(
+                contextvars.copy_context().run,
+                run_single_query, rag, meta_store, q,
+            ): q
+            for q in pending
+        }
+
+        for future in tqdm(as_completed(futures), total=len(futures), desc="Answering"):
+            question = futures[future]
+            try :
+                result = future.result()
+            except Exception as e:
+                logger.warning(f"[EVAL] failed: {question!r}: {e}")
+                failed.append(question)
+                continue
+
+            results[question] = result
+            f.write(json.dumps(asdict(result), ensure_ascii=False) + "\n")
+            f.flush()
+
+    if failed:
+        raise RuntimeError(
+            f"{len(failed)} of {len(pending)} questions failed. "
+            f"Answers so far are saved in {checkpoint}, re-run to resume."
+        )
+
+    return results
@@ -0,0 +1,332 @@
+import argparse
+import csv
+import json
+import math
+import time
+from datetime import datetime
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+from rag_notes_helper.core.config import get_settings
+from rag_notes_helper.rag.chunking import Chunk, chunk_document
+from rag_notes_helper.rag.index import RagIndex
+from rag_notes_helper.rag.ingest import get_stable_doc_id, is_supported_file
+from rag_notes_helper.rag.loaders import iter_file_lines
+from rag_notes_helper.rag.retrieval import mmr_select
+from rag_notes_helper.utils.logger import get_logger
+
+
+logger = get_logger("eval")
+
+INDEX_TYPES = ("flat", "hnsw", "ivf")
+
+
+# metrics
+
+def recall_at_k(hit_targets: list[set[str]], n_targets: int, k: int) -> float:
+    """ fraction of labeled targets found in the first k results """
+    if n_targets == 0:
+        return 0.0
+
+    found = set().union(*hit_targets[:k])
+    return len(found) / n_targets
+
+
+def reciprocal_rank(relevant: list[bool], k: int) -> float:
+    for rank, is_relevant in enumerate(relevant[:k], start=1):
+        if is_relevant:
+            return 1 / rank
+
+    return 0.0
+
+
+def ndcg_at_k(relevant: list[bool], n_relevant: int, k: int) -> float:
+    """ binary-gain nDCG, ideal ranking puts every relevant chunk first """
+    dcg = sum(
+        1 / math.log2(rank + 1)
+        for rank, is_relevant in enumerate(relevant[:k], start=1)
+        if is_relevant
+    )
+    idcg = sum(1 / math.log2(rank + 1) for rank in range(1, min(k, n_relevant) + 1))
+
+    return dcg / idcg if idcg else 0.0
+
+
+# labels
+
+def load_labeled(path: Path) -> list[dict]:
+    """ (question, relevant sources / text snippets) pairs """
+    with open(path, "r", encoding="utf-8") as f:
+        items = json.load(f)
+
+    return [
+        item for item in items
+        if item.get("relevant_sources") or item.get("relevant_text")
+    ]
+
+
+def _matched_targets(chunk: Chunk, item: dict) -> set[str]:
+    """ labeled targets a chunk satisfies, snippets are matched case-insensitively """
+    sources = item.get("relevant_sources") or []
+    if sources and chunk.source not in sources:
+        return set()
+
+    snippets = item.get("relevant_text") or []
+    if not snippets:
+        return {chunk.source}
+
+    text = chunk.text.lower()
+    return {s for s in snippets if s.lower() in text}
+
+
+def _n_targets(item: dict) -> int:
+    return len(item.get("relevant_text") or item.get("relevant_sources") or [])
+
+
+# corpus
+
+def _read_notes(notes_dir: Path) -> list[tuple[str, str, list[str]]]:
+    docs = []
+    for file_path in sorted(notes_dir.rglob("*")):
+        if not file_path.is_file() or not is_supported_file(file_path):
+            continue
+
+        docs.append((
+            get_stable_doc_id(file_path),
+            str(file_path.relative_to(notes_dir)),
+            list(iter_file_lines(file_path)),
+        ))
+
+    return docs
+
+
+def _chunk_corpus(
+    docs: list[tuple[str, str, list[str]]],
+    chunk_size: int,
+) -> list[Chunk]:
+    overlap = min(get_settings().chunk_overlap, chunk_size // 2)
+
+    return [
+        chunk
+        for doc_id, source, lines in docs
+        for chunk in chunk_document(
+            lines=lines,
+            doc_id=doc_id,
+            source=source,
+            chunk_size=chunk_size,
+            overlap=overlap,
+        )
+    ]
+
+
+def make_index(kind: str, vectors: np.ndarray) -> faiss.Index:
+    """ inner-product index of the given type, trained and filled """
+    dim = vectors.shape[1]
+    params = faiss.ParameterSpace()
+
+    if kind == "flat":
+        index = faiss.IndexFlatIP(dim)
+    elif kind == "hnsw":
+        index = faiss.index_factory(dim, "HNSW32", faiss.METRIC_INNER_PRODUCT)
+        params.set_index_parameter(index, "efSearch", 64)
+    elif kind == "ivf":
+        nlist = max(int(math.sqrt(len(vectors))), 1)
+        index = faiss.index_factory(dim, f"IVF{nlist},Flat", faiss.METRIC_INNER_PRODUCT)
+        index.train(vectors) # type: ignore
+        params.set_index_parameter(index, "nprobe", max(nlist // 8, 1))
+    else :
+        raise ValueError(f"Unsupported index type: {kind}")
+
+    index.add(vectors) # type: ignore
+    return index
+
+
+def _search(
+    index: faiss.Index,
+    vectors: np.ndarray,
+    q_emb: np.ndarray,
+    *,
+    k: int,
+    mmr: bool,
+) -> tuple[list[list[int]], float]:
+    """ ranked faiss_ids per query and mean latency in ms """
+    settings = get_settings()
+    fetch_k = max(settings.mmr_fetch_k, k) if mmr else k
+
+    start = time.perf_counter()
+    _, indices = index.search(q_emb, fetch_k) # type: ignore
+
+    ranked = []
+    for q, ids in zip(q_emb, indices):
+        ids = ids[ids >= 0]
+        if mmr and len(ids) > 1:
+            ids = ids[mmr_select(q, vectors[ids], k, settings.mmr_lambda)]
+        ranked.append(ids[:k].tolist())
+
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    return ranked, elapsed_ms / len(q_emb)
+
+
+def run_retrieval_benchmark(
+    testset_path: Path | None = None,
+    *,
+    index_types: tuple[str, ...] = INDEX_TYPES,
+    top_ks: tuple[int, ...] = (3, 5, 10),
+    chunk_sizes: tuple[int, ...] | None = None,
+    mmr_options: tuple[bool, ...] = (False, True),
+    notes_dir: Path | None = None,
+) -> list[dict]:
+    """
+    offline retrieval grid: no LLM, the score threshold is not applied
+    so metrics reflect ranking quality only
+    """
+    settings = get_settings()
+    testset_path = testset_path or settings.eval_dir / "testset/retrieval.json"
+    chunk_sizes = chunk_sizes or (settings.chunk_size,)
+
+    items = load_labeled(testset_path)
+    if not items:
+        raise ValueError(f"No labeled questions in {testset_path}")
+
+    model = RagIndex(None).embed_model
+    q_emb = model.encode(
+        [item["question"] for item in items],
+        normalize_embeddings=True,
+        convert_to_numpy=True,
+    ).astype("float32")
+
+    docs = _read_notes(notes_dir or settings.notes_dir)
+    max_k = max(top_ks)
+    rows = []
+
+    for chunk_size in chunk_sizes:
+        chunks = _chunk_corpus(docs, chunk_size)
+        if not chunks:
+            raise ValueError("No chunks to index")
+
+        start = time.perf_counter()
+        vectors = model.encode(
+            [c.text for c in chunks],
+            batch_size=64,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+        ).astype("float32")
+        embed_s = time.perf_counter() - start
+
+        # targets matched by every chunk, per question
+        matches = [[_matched_targets(c, item) for c in chunks] for item in items]
+
+        for kind in index_types:
+            start = time.perf_counter()
+            index = make_index(kind, vectors)
+            build_s = time.perf_counter() - start
+            index_bytes = faiss.serialize_index(index).nbytes
+
+            for mmr in mmr_options:
+                # greedy MMR and plain ranking are prefix stable, search once for the largest k
+                ranked, latency_ms = _search(index, vectors, q_emb, k=max_k, mmr=mmr)
+
+                for k in top_ks:
+                    recall, mrr, ndcg = [], [], []
+
+                    for item, item_matches, ids in zip(items, matches, ranked):
+                        hit_targets = [item_matches[i] for i in ids]
+                        relevant = [bool(t) for t in hit_targets]
+                        n_relevant = sum(bool(t) for t in item_matches)
+
+                        recall.append(recall_at_k(hit_targets, _n_targets(item), k))
+                        mrr.append(reciprocal_rank(relevant, k))
+                        ndcg.append(ndcg_at_k(relevant, n_relevant, k))
+
+                    rows.append({
+                        "chunk_size": chunk_size,
+                        "index": kind,
+                        "mmr": mmr,
+                        "top_k": k,
+                        "recall@k": float(np.mean(recall)),
+                        "mrr": float(np.mean(mrr)),
+                        "ndcg@k": float(np.mean(ndcg)),
+                        "latency_ms": latency_ms,
+                        "chunks": len(chunks),
+                        "index_bytes": index_bytes,
+                        "build_s": build_s,
+                        "embed_s": embed_s,
+                    })
+
+    return rows
+
+
+def format_rows(rows: list[dict]) -> str:
+    lines = [
+        f"{'chunk':>6} {'index':<6}{'mmr':<6}{'k':>3}"
+        f"{'recall':>9}{'mrr':>8}{'ndcg':>8}{'ms/q':>9}{'size KB':>10}"
+    ]
+    for row in rows:
+        lines.append(
+            f"{row['chunk_size']:>6} {row['index']:<6}{str(row['mmr']):<6}"
+            f"{row['top_k']:>3}{row['recall@k']:>9.3f}{row['mrr']:>8.3f}"
+            f"{row['ndcg@k']:>8.3f}{row['latency_ms']:>9.3f}"
+            f"{row['index_bytes'] / 1024:>10.1f}"
+        )
+
+    return "\n".join(lines)
+
+
+def save_rows(rows: list[dict]) -> Path:
+    reports_dir = get_settings().reports_dir
+    reports_dir.mkdir(parents=True, exist_ok=True)
+
+    time_stamp = datetime.now().strftime("%Y%m%d_%H%M")
+    out_path = reports_dir / f"retrieval_{time_stamp}.csv"
+
+    with out_path.open("w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+    return out_path
+
+
+def run_retrieval_evaluation(**kws) -> list[dict]:
+    rows = run_retrieval_benchmark(**kws)
+
+    print("\n=== RETRIEVAL BENCHMARK ===\n")
+    print(format_rows(rows))
+
+    out_path = save_rows(rows)
+    print(f"\nSaved run to {out_path}\n")
+    logger.info(f"retrieval benchmark saved to {out_path}")
+
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m rag_notes_helper.eval.retrieval_bench",
+        description="Offline retrieval quality and latency benchmark",
+    )
+    parser.add_argument("--testset", type=Path, default=None)
+    parser.add_argument("--index", nargs="+", choices=INDEX_TYPES, default=list(INDEX_TYPES))
+    parser.add_argument("--top-k", nargs="+", type=int, default=[3, 5, 10])
+    parser.add_argument("--chunk-size", nargs="+", type=int, default=None)
+    parser.add_argument(
+        "--mmr",
+        nargs="+",
+        choices=["off", "on"],
+        default=["off", "on"],
+    )
+    args = parser.parse_args()
+
+    run_retrieval_evaluation(
+        testset_path=args.testset,
+        index_types=tuple(args.index),
+        top_ks=tuple(args.top_k),
+        chunk_sizes=tuple(args.chunk_size) if args.chunk_size else None,
+        mmr_options=tuple(m == "on" for m in args.mmr),
+    )
+
+
+if __name__ == "__main__":
+    main()
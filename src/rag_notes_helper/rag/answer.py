@@ -1,8 +1,9 @@
 from typing import Any
 
+from rag_notes_helper.rag.context import build_context
 from rag_notes_helper.rag.llm import get_llm
 from rag_notes_helper.core.config import get_settings
-from rag_notes_helper.utils.timer import deco_time_block
+from rag_notes_helper.utils.timer import deco_time_block, time_block
 
 
 SYSTEM_PROMPT = """
@@ -34,12 +35,34 @@ OUTPUT FORMAT:
 """.strip()
 
 
+def format_user_prompt(context: str, query: str) -> str:
+    if not context.strip():
+        context = "[No Context Provided]"
+
+    return f"""
+    Context: {context}
+    USER Question: {query}
+    """
+
+
+def get_citations(hits: list[dict]) -> list[dict]:
+    """ one citation per served chunk, duplicates included """
+    return [
+        {
+            "source": c["source"],
+            "chunk_id": c["chunk_id"],
+            "score": h["score"],
+        } for h in hits for c in [h, *h.get("duplicates", [])]
+    ]
+
+
 @deco_time_block
 def rag_answer(
     query: str,
     *,
     hits: list[dict],
     stream: bool = False,
+    line_width: int | None = None,
 ) -> dict[str, Any]:
 
     # if not hits:
@@ -53,29 +76,17 @@ def rag_answer(
 
     settings = get_settings()
 
-    context = ""
-    citations = []
+    with time_block("prompt_build"):
+        context = ""
+        citations = []
 
-    if hits:
-        hits = hits[: settings.llm.max_chunks]
+        if hits:
+            hits = hits[: settings.llm.max_chunks]
 
-    context_blocks = [f"file:{h['source']}\n{h['text']}" for h in hits]
-    context = "\n\n".join(context_blocks)
-    citations = [
-        {
-            "source": h["source"],
-            "chunk_id": h["chunk_id"],
-            "score": h["score"],
-        } for h in hits
-    ]
+        context = build_context(query, hits)
+        citations = get_citations(hits)
 
-    if not context.strip():
-        context = "[No Context Provided]"
-
-    USER_PROMPT = f"""
-    Context: {context}
-    USER Question: {query}
-    """
+    USER_PROMPT = format_user_prompt(context, query)
 
     prompt = [
         {
@@ -89,16 +100,17 @@ def rag_answer(
     ]
 
     llm = get_llm()
+    line_width = line_width or settings.line_width
 
     if stream:
         answer_text = llm.stream(
             prompt,
-            line_width=settings.line_width,
+            line_width=line_width,
         )
     else :
         answer_text = llm.generate(
             prompt,
-            line_width=settings.line_width,
+            line_width=line_width,
         )
 
     return {
@@ -1,6 +1,9 @@
+import ast
+import re
 from collections import deque
 from dataclasses import dataclass
-from collections.abc import Iterator
+from collections.abc import Iterable, Iterator
+from pathlib import Path
 
 from rag_notes_helper.core.config import get_settings
 
@@ -11,47 +14,126 @@ class Chunk:
     text: str
     source: str
 
+
+def get_tokenizer():
+    """ fast tokenizer of the embedding model and its usable window """
+    # imported lazily, index imports chunking
+    from rag_notes_helper.rag.index import RagIndex
+
+    model = RagIndex(None).embed_model
+    tokenizer = model.tokenizer
+    window = model.max_seq_length - tokenizer.num_special_tokens_to_add()
+
+    return tokenizer, window
+
+
+def _measure_chars(lines: Iterable[str]) -> Iterator[tuple[str, int]]:
+    for line in lines:
+        yield line, len(line)
+
+
+def _measure_tokens(
+    lines: Iterable[str],
+    tokenizer,
+    window: int,
+    batch_size: int = 256,
+) -> Iterator[tuple[str, int]]:
+    batch: list[str] = []
+
+    for line in lines:
+        batch.append(line)
+
+        if len(batch) >= batch_size:
+            yield from _measure_token_batch(batch, tokenizer, window)
+            batch = []
+
+    if batch:
+        yield from _measure_token_batch(batch, tokenizer, window)
+
+
+def _measure_token_batch(
+    batch: list[str],
+    tokenizer,
+    window: int,
+) -> Iterator[tuple[str, int]]:
+    encoded = tokenizer(
+        batch,
+        add_special_tokens=False,
+        return_offsets_mapping=True,
+    )
+
+    for line, offsets in zip(batch, encoded["offset_mapping"]):
+        if len(offsets) <= window:
+            yield line, len(offsets)
+            continue
+
+        # split lines longer than the model window on token boundaries
+        for start in range(0, len(offsets), window):
+            piece = offsets[start : start + window]
+            yield line[piece[0][0] : piece[-1][1]], len(piece)
+
+
 def chunk_lines(
     *,
-    lines: Iterator[str],
+    lines: Iterable[str],
     doc_id: str,
     source: str,
     chunk_size: int | None = None,
     overlap: int | None = None,
+    unit: str | None = None,
+    sep: str = ", ",
 ) -> Iterator[Chunk]:
 
     settings = get_settings()
     chunk_size = chunk_size or settings.chunk_size
-    overlap = overlap or settings.chunk_overlap
+    overlap = settings.chunk_overlap if overlap is None else overlap
+    unit = unit or settings.chunk_unit
 
-    buffer = deque()
+    if unit == "tokens":
+        tokenizer, window = get_tokenizer()
+        if chunk_size > window:
+            # keep the configured overlap ratio in the capped chunks
+            overlap = overlap * window // chunk_size
+            chunk_size = window
+        sep_len = len(tokenizer(sep, add_special_tokens=False)["input_ids"])
+        measured = _measure_tokens(lines, tokenizer, window)
+    else :
+        sep_len = 0
+        measured = _measure_chars(lines)
+
+    buffer: deque[str] = deque()
+    lengths: deque[int] = deque()
     buffer_len = 0
     chunk_id = 0
 
-    for line in lines:
-        line_len = len(line)
+    for line, line_len in measured:
 
-        if buffer_len + line_len >= chunk_size and buffer:
+        if buffer and buffer_len + line_len + sep_len * len(buffer) >= chunk_size:
             yield Chunk(
                 doc_id=doc_id,
                 chunk_id=chunk_id,
-                text=", ".join(buffer),
+                text=sep.join(buffer),
                 source=source,
             )
             chunk_id += 1
 
-            tmp_buffer = deque()
-            tmp_len = 0
-
-            while tmp_len < overlap and buffer:
-                last_line = buffer.pop()
-                tmp_buffer.appendleft(last_line)
-                tmp_len += len(last_line)
+            # keep the shortest tail reaching overlap, each line leaves once
+            while buffer and buffer_len - lengths[0] >= overlap:
+                buffer.popleft()
+                buffer_len -= lengths.popleft()
 
-            buffer = tmp_buffer
-            buffer_len = tmp_len
+            # the model window is a hard limit, drop overlap that leaves
+            # no room for the next line
+            while (
+                unit == "tokens"
+                and buffer
+                and buffer_len + line_len + sep_len * len(buffer) >= chunk_size
+            ):
+                buffer.popleft()
+                buffer_len -= lengths.popleft()
 
         buffer.append(line)
+        lengths.append(line_len)
         buffer_len += line_len
 
     # remain buffer
@@ -59,6 +141,240 @@ def chunk_lines(
         yield Chunk(
             doc_id=doc_id,
             chunk_id=chunk_id,
-            text=", ".join(buffer),
+            text=sep.join(buffer),
             source=source,
         )
+
+
+HEADING_RE = re.compile(r"^(#{1,6})\s+(.+?)\s*#*$")
+FENCE_PREFIXES = ("```", "~~~")
+
+
+def _markdown_sections(
+    lines: Iterable[str],
+) -> Iterator[tuple[str, list[str]]]:
+    """ yield (heading path, body lines) per markdown section """
+    headings: list[tuple[int, str]] = []
+    body: list[str] = []
+    in_fence = False
+
+    for line in lines:
+        if line.startswith(FENCE_PREFIXES):
+            in_fence = not in_fence
+
+        match = None if in_fence else HEADING_RE.match(line)
+
+        if match is None:
+            body.append(line)
+            continue
+
+        if body:
+            yield " > ".join(title for _, title in headings), body
+            body = []
+
+        level = len(match.group(1))
+        while headings and headings[-1][0] >= level:
+            headings.pop()
+
+        headings.append((level, match.group(2)))
+
+    if body:
+        yield " > ".join(title for _, title in headings), body
+
+
+def _python_sections(lines: list[str]) -> Iterator[tuple[str, list[str]]]:
+    """
+    yield (definition name, lines) per top-level def/class, comment lines
+    right above a definition go with it, every other line to module sections
+    """
+    tree = ast.parse("\n".join(lines))
+
+    module_body: list[str] = []
+    # first line not yet given to a section, comments are not ast nodes
+    pos = 0
+
+    for node in tree.body:
+        is_definition = isinstance(
+            node,
+            (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef),
+        )
+        start = node.lineno
+        if is_definition:
+            start = min([d.lineno for d in node.decorator_list] + [start]) # type: ignore
+
+        # statements sharing a line with the previous one are already taken
+        start = max(start - 1, pos)
+        end = max(node.end_lineno or node.lineno, start)
+        gap = lines[pos:start]
+        pos = end
+
+        if not is_definition:
+            module_body.extend(gap + lines[start:end])
+            continue
+
+        lead = len(gap)
+        while lead and gap[lead - 1].lstrip().startswith("#"):
+            lead -= 1
+        module_body.extend(gap[:lead])
+
+        if module_body:
+            yield "", module_body
+            module_body = []
+
+        kind = "class" if isinstance(node, ast.ClassDef) else "def"
+        yield f"{kind} {node.name}", gap[lead:] + lines[start:end] # type: ignore
+
+    module_body.extend(lines[pos:])
+    if module_body:
+        yield "", module_body
+
+
+def _measure_text(text: str, unit: str) -> int:
+    if unit == "tokens":
+        tokenizer, _ = get_tokenizer()
+        return len(tokenizer(text, add_special_tokens=False)["input_ids"])
+
+    return len(text)
+
+
+def _chunk_sections(
+    sections: Iterable[tuple[str, list[str]]],
+    *,
+    doc_id: str,
+    source: str,
+    chunk_size: int | None = None,
+    unit: str | None = None,
+) -> Iterator[Chunk]:
+    settings = get_settings()
+    chunk_size = chunk_size or settings.chunk_size
+    unit = unit or settings.chunk_unit
+
+    chunk_id = 0
+    # whole small sections packed into one chunk, with their headers
+    packed: list[str] = []
+    packed_len = 0
+
+    def flush() -> Iterator[Chunk]:
+        nonlocal chunk_id, packed_len
+        if packed:
+            yield Chunk(
+                doc_id=doc_id,
+                chunk_id=chunk_id,
+                text="\n".join(packed),
+                source=source,
+            )
+            chunk_id += 1
+            packed.clear()
+            packed_len = 0
+
+    for context, body in sections:
+        header = f"{context}\n" if context else ""
+        text = header + "\n".join(body)
+        text_len = _measure_text(text, unit)
+
+        if text_len <= chunk_size:
+            if packed and packed_len + text_len > chunk_size:
+                yield from flush()
+
+            packed.append(text)
+            packed_len += text_len
+            continue
+
+        # only sections over the budget are split, each part keeps the header
+        yield from flush()
+        budget = max(chunk_size - _measure_text(header, unit), 1)
+
+        # sections are cut apart, no overlap is needed inside them
+        for chunk in chunk_lines(
+            lines=body,
+            doc_id=doc_id,
+            source=source,
+            chunk_size=budget,
+            overlap=0,
+            unit=unit,
+            sep="\n",
+        ):
+            yield Chunk(
+                doc_id=doc_id,
+                chunk_id=chunk_id,
+                text=header + chunk.text,
+                source=source,
+            )
+            chunk_id += 1
+
+    yield from flush()
+
+
+def chunk_markdown(
+    *,
+    lines: Iterable[str],
+    doc_id: str,
+    source: str,
+    **kws,
+) -> Iterator[Chunk]:
+    yield from _chunk_sections(
+        _markdown_sections(lines),
+        doc_id=doc_id,
+        source=source,
+        **kws,
+    )
+
+
+def chunk_python(
+    *,
+    lines: Iterable[str],
+    doc_id: str,
+    source: str,
+    **kws,
+) -> Iterator[Chunk]:
+    lines = list(lines)
+
+    try :
+        sections = list(_python_sections(lines))
+    except SyntaxError:
+        yield from chunk_lines(
+            lines=lines,
+            doc_id=doc_id,
+            source=source,
+            **kws,
+        )
+        return
+
+    kws.pop("overlap", None)
+    yield from _chunk_sections(
+        sections,
+        doc_id=doc_id,
+        source=source,
+        **kws,
+    )
+
+
+def chunk_document(
+    *,
+    lines: Iterable[str],
+    doc_id: str,
+    source: str,
+    **kws,
+) -> Iterator[Chunk]:
+    """ chunk lines with the chunker matching the source format """
+    if get_settings().structured_chunking:
+        suffix = Path(source).suffix.lower()
+
+        if suffix == ".md":
+            kws.pop("overlap", None)
+            return chunk_markdown(
+                lines=lines,
+                doc_id=doc_id,
+                source=source,
+                **kws,
+            )
+
+        if suffix == ".py":
+            return chunk_python(
+                lines=lines,
+                doc_id=doc_id,
+                source=source,
+                **kws,
+            )
+
+    return chunk_lines(lines=lines, doc_id=doc_id, source=source, **kws)
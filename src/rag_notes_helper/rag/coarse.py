@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+from rag_notes_helper.utils.logger import get_logger
+from rag_notes_helper.utils.timer import time_block
+
+
+logger = get_logger("index")
+
+# low-dimension copy of the vectors and the projection that made it, next
+# to faiss.index in a generation
+COARSE_FILE = "coarse.index"
+PROJECTION_FILE = "coarse.npz"
+# rows used to fit the pca projection, strided over the whole index
+PCA_SAMPLE = 65536
+# rows projected and added per step
+COARSE_BLOCK = 65536
+
+
+def _pca_projection(index: faiss.Index, dim: int) -> np.ndarray:
+    """
+    top dim principal axes of the uncentered vectors, inner products of
+    projected vectors approximate the full ones without a mean term
+    """
+    step = max(index.ntotal // PCA_SAMPLE, 1)
+    ids = np.arange(0, index.ntotal, step, dtype="int64")[:PCA_SAMPLE]
+    sample = index.reconstruct_batch(ids).astype("float64") # type: ignore
+
+    _, axes = np.linalg.eigh(sample.T @ sample)
+    # eigh sorts ascending, keep the largest
+    return np.ascontiguousarray(axes[:, ::-1][:, :dim].T, dtype="float32")
+
+
+class CoarseIndex:
+    """ projected vectors in a flat index, searched with full-width queries """
+
+    def __init__(
+        self,
+        projection: np.ndarray,
+        index: faiss.Index | None = None,
+        *,
+        normalize: bool = False,
+    ) -> None:
+        # (dim, d) rows of the projection
+        self.projection = projection
+        self.normalize = normalize
+        self.index = index or faiss.IndexFlatIP(projection.shape[0])
+
+    @property
+    def ntotal(self) -> int:
+        return self.index.ntotal
+
+    def project(self, vectors: np.ndarray) -> np.ndarray:
+        projected = np.ascontiguousarray(vectors @ self.projection.T, dtype="float32")
+        if self.normalize:
+            faiss.normalize_L2(projected)
+
+        return projected
+
+    def add(self, vectors: np.ndarray) -> None:
+        self.index.add(self.project(vectors)) # type: ignore
+
+    def search(self, q_emb: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        return self.index.search(self.project(q_emb), k) # type: ignore
+
+    def save(self, generation: Path) -> None:
+        faiss.write_index(self.index, str(generation / COARSE_FILE))
+        np.savez(
+            generation / PROJECTION_FILE,
+            projection=self.projection,
+            normalize=self.normalize,
+        )
+
+    @classmethod
+    def load(cls, generation: Path) -> CoarseIndex | None:
+        """ None for generations built without a coarse index """
+        if not (generation / PROJECTION_FILE).exists():
+            return None
+
+        with time_block("read coarse index"):
+            with np.load(generation / PROJECTION_FILE) as data:
+                projection = data["projection"]
+                normalize = bool(data["normalize"])
+
+            index = faiss.read_index(str(generation / COARSE_FILE))
+
+        return cls(projection, index, normalize=normalize)
+
+
+def build_coarse(
+    index: faiss.Index,
+    dim: int,
+    method: str = "pca",
+) -> CoarseIndex | None:
+    """
+    dim-wide copy of the rows of a flat index; "prefix" keeps the first
+    dim components of matryoshka embeddings, renormalized
+    """
+    if not isinstance(index, faiss.IndexFlat):
+        logger.warning("coarse search needs a flat index, skipped")
+        return None
+
+    if dim >= index.d:
+        logger.warning(f"coarse dim {dim} >= vector dim {index.d}, skipped")
+        return None
+
+    with time_block("build coarse index"):
+        if method == "prefix":
+            coarse = CoarseIndex(
+                np.eye(index.d, dtype="float32")[:dim],
+                normalize=True,
+            )
+        else :
+            coarse = CoarseIndex(_pca_projection(index, dim))
+
+        for start in range(0, index.ntotal, COARSE_BLOCK):
+            n = min(COARSE_BLOCK, index.ntotal - start)
+            coarse.add(index.reconstruct_n(start, n)) # type: ignore
+
+    logger.info(
+        f"coarse index: {index.ntotal} vectors, {index.d} -> {dim} dims ({method})"
+    )
+
+    return coarse
+
+
+def search_two_stage(
+    coarse: CoarseIndex,
+    index: faiss.Index,
+    q_emb: np.ndarray,
+    k: int,
+    candidates: int,
+) -> tuple[np.ndarray, np.ndarray]:
+    """ shortlist with the coarse index, then rank the shortlist by full vectors """
+    n = min(max(candidates, k), coarse.ntotal)
+
+    with time_block("coarse_search"):
+        _, shortlist = coarse.search(q_emb, n)
+        ids = shortlist[0][shortlist[0] >= 0]
+
+    with time_block("rescore"):
+        scores = index.reconstruct_batch(ids) @ q_emb[0] # type: ignore
+        order = np.argsort(-scores, kind="stable")[:k]
+
+    return scores[order][None, :], ids[order][None, :]
@@ -0,0 +1,136 @@
+import math
+import re
+
+import numpy as np
+
+from rag_notes_helper.core.config import get_settings
+from rag_notes_helper.rag.index import RagIndex
+
+
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s+|\n")
+
+
+def estimate_tokens(text: str) -> int:
+    """ provider independent estimate, ~4 characters per token """
+    return math.ceil(len(text) / 4)
+
+
+def overlap_len(prev: str, nxt: str) -> int:
+    """ length of the longest suffix of prev that is a prefix of nxt """
+    m = min(len(prev), len(nxt))
+    if m == 0:
+        return 0
+
+    # prefix function of nxt + sentinel + tail of prev
+    s = nxt[:m] + "\x00" + prev[-m:]
+    pi = [0] * len(s)
+
+    for i in range(1, len(s)):
+        k = pi[i - 1]
+        while k and s[i] != s[k]:
+            k = pi[k - 1]
+        if s[i] == s[k]:
+            k += 1
+        pi[i] = k
+
+    return pi[-1]
+
+
+def merge_texts(prev: str, nxt: str, min_overlap: int = 8) -> str:
+    """ join adjacent chunks, dropping the text they share """
+    k = overlap_len(prev, nxt)
+
+    if k >= min_overlap or k == len(nxt):
+        return prev + nxt[k:]
+
+    return prev + "\n" + nxt
+
+
+def _merge_hits(hits: list[dict]) -> list[dict]:
+    """ merge consecutive chunks of the same document into blocks """
+    groups: dict[str, list[dict]] = {}
+    for h in hits:
+        groups.setdefault(h.get("doc_id", h["source"]), []).append(h)
+
+    blocks = []
+    for group in groups.values():
+        # hits expanded with neighbours span several chunk_ids
+        spans = []
+        for h in group:
+            chunk_ids = [h["chunk_id"], *h.get("neighbors", [])]
+            spans.append((min(chunk_ids), max(chunk_ids), h))
+
+        block = None
+        for first_id, last_id, h in sorted(spans, key=lambda span: span[0]):
+            if block is not None and first_id == block["last_id"] + 1:
+                block["text"] = merge_texts(block["text"], h["text"])
+                block["last_id"] = last_id
+                block["score"] = max(block["score"], h.get("score", 0.0))
+                continue
+
+            block = {
+                "source": h["source"],
+                "text": h["text"],
+                "last_id": last_id,
+                "score": h.get("score", 0.0),
+            }
+            blocks.append(block)
+
+    return sorted(blocks, key=lambda b: b["score"], reverse=True)
+
+
+def _trim_sentences(query: str, text: str, keep_ratio: float) -> str:
+    """ keep the sentences most similar to the query, in original order """
+    sentences = [s for s in SENTENCE_RE.split(text) if s.strip()]
+    n_keep = math.ceil(len(sentences) * keep_ratio)
+
+    if len(sentences) <= 2 or n_keep >= len(sentences):
+        return text
+
+    embeddings = RagIndex(None).embed_model.encode(
+        [query, *sentences],
+        normalize_embeddings=True,
+        convert_to_numpy=True,
+    )
+    similarity = embeddings[1:] @ embeddings[0]
+    keep = np.sort(np.argsort(-similarity)[:n_keep])
+
+    return " ".join(sentences[i] for i in keep)
+
+
+def build_context(
+    query: str,
+    hits: list[dict],
+    *,
+    token_budget: int | None = None,
+    trim_sentences: bool | None = None,
+) -> str:
+    """ merged, de-overlapped and budgeted context for the prompt """
+    settings = get_settings()
+    token_budget = token_budget or settings.llm.context_tokens
+    if trim_sentences is None:
+        trim_sentences = settings.llm.trim_sentences
+
+    context_blocks = []
+    used = 0
+
+    for block in _merge_hits(hits):
+        text = block["text"]
+
+        if trim_sentences:
+            text = _trim_sentences(query, text, settings.llm.trim_keep_ratio)
+
+        context_block = f"file:{block['source']}\n{text}"
+        tokens = estimate_tokens(context_block)
+
+        if used + tokens > token_budget:
+            remaining = (token_budget - used) * 4
+            # a cut block still has to carry some content
+            if remaining > len(block["source"]) + 100:
+                context_blocks.append(context_block[:remaining])
+            break
+
+        context_blocks.append(context_block)
+        used += tokens + 1
+
+    return "\n\n".join(context_blocks)
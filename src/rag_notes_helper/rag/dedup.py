@@ -0,0 +1,122 @@
+import hashlib
+import re
+
+import numpy as np
+
+
+WORD_RE = re.compile(r"\w+")
+
+
+def _shingle_hashes(words: list[str], size: int = 3) -> np.ndarray:
+    shingles = {
+        " ".join(words[i : i + size])
+        for i in range(max(len(words) - size + 1, 1))
+    }
+
+    return np.frombuffer(
+        b"".join(
+            hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest()
+            for s in shingles
+        ),
+        dtype=np.uint64,
+    )
+
+
+def simhash(words: list[str]) -> int:
+    """ 64-bit SimHash over word 3-shingles """
+    hashes = _shingle_hashes(words)
+    bits = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1)
+
+    # majority vote per bit position
+    votes = bits.sum(axis=0) * 2 > len(hashes)
+
+    return int.from_bytes(np.packbits(votes).tobytes(), "big")
+
+
+class Deduplicator:
+    """ exact hash plus SimHash near-duplicate lookup of chunk texts """
+
+    def __init__(self, max_distance: int = 5, min_words: int = 10) -> None:
+        self.max_distance = max_distance
+        self.min_words = min_words
+
+        # pigeonhole: max_distance + 1 bands, a near-dup matches one exactly
+        self.n_bands = max_distance + 1
+        self.band_bits = 64 // self.n_bands
+        self.band_mask = (1 << self.band_bits) - 1
+
+        self.exact: dict[bytes, int] = {}
+        self.fingerprints: dict[int, int] = {}
+        self.bands: list[dict[int, list[int]]] = [
+            {} for _ in range(self.n_bands)
+        ]
+
+    def _bands(self, fingerprint: int) -> list[int]:
+        return [
+            (fingerprint >> (b * self.band_bits)) & self.band_mask
+            for b in range(self.n_bands)
+        ]
+
+    def find_or_add(self, text: str, faiss_id: int) -> int | None:
+        """ return faiss_id of the duplicated text, else register text """
+        words = WORD_RE.findall(text.lower())
+
+        key = hashlib.blake2b(
+            " ".join(words).encode("utf-8"),
+            digest_size=16,
+        ).digest()
+
+        if (rep_id := self.exact.get(key)) is not None:
+            return rep_id
+
+        self.exact[key] = faiss_id
+
+        # short texts give unreliable fingerprints
+        if len(words) < self.min_words:
+            return None
+
+        fingerprint = simhash(words)
+        bands = self._bands(fingerprint)
+
+        for band, value in zip(self.bands, bands):
+            for rep_id in band.get(value, ()):
+                distance = (fingerprint ^ self.fingerprints[rep_id]).bit_count()
+                if distance <= self.max_distance:
+                    self.exact[key] = rep_id
+                    return rep_id
+
+        self.fingerprints[faiss_id] = fingerprint
+        for band, value in zip(self.bands, bands):
+            band.setdefault(value, []).append(faiss_id)
+
+        return None
+
+    def export(self) -> dict[str, np.ndarray]:
+        """ registered signatures as arrays, saved with each generation """
+        return {
+            "exact_keys": np.frombuffer(
+                b"".join(self.exact), dtype=np.uint8
+            ).reshape(-1, 16),
+            "exact_ids": np.fromiter(self.exact.values(), dtype=np.int64),
+            "fp_ids": np.fromiter(self.fingerprints, dtype=np.int64),
+            "fps": np.fromiter(self.fingerprints.values(), dtype=np.uint64),
+        }
+
+    def merge(self, state, id_map: np.ndarray) -> None:
+        """ register exported signatures under new faiss_ids, -1 drops one """
+        raw = state["exact_keys"].tobytes()
+        exact_ids = id_map[state["exact_ids"]].tolist()
+
+        for i, faiss_id in enumerate(exact_ids):
+            if faiss_id >= 0:
+                self.exact.setdefault(raw[i * 16 : (i + 1) * 16], faiss_id)
+
+        fp_ids = id_map[state["fp_ids"]].tolist()
+
+        for faiss_id, fingerprint in zip(fp_ids, state["fps"].tolist()):
+            if faiss_id < 0:
+                continue
+
+            self.fingerprints[faiss_id] = fingerprint
+            for band, value in zip(self.bands, self._bands(fingerprint)):
+                band.setdefault(value, []).append(faiss_id)
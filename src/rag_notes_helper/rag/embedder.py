@@ -0,0 +1,189 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from rag_notes_helper.core.config import get_settings
+from rag_notes_helper.utils.logger import get_logger
+from rag_notes_helper.utils.metrics import get_metrics
+
+
+logger = get_logger("index")
+
+# internal batch sizes tried by auto-tuning, sentence-transformers uses 32
+BATCH_CANDIDATES = (16, 32, 64, 128)
+# texts encoded per candidate, tuning needs a call at least twice this size
+TUNE_SAMPLE = 256
+
+# model of an encoder process, set by _init_worker
+_worker_model = None
+
+
+def _init_worker(model_name: str, threads: int) -> None:
+    global _worker_model
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    # one pinned thread pool per process instead of every process using all cores
+    torch.set_num_threads(threads)
+    _worker_model = SentenceTransformer(model_name)
+
+
+def _encode(model, texts: list[str], batch_size: int) -> np.ndarray:
+    return model.encode(
+        texts,
+        batch_size=batch_size,
+        normalize_embeddings=True,
+        convert_to_numpy=True,
+    ).astype("float32")
+
+
+def _encode_in_worker(texts: list[str], batch_size: int) -> np.ndarray:
+    return _encode(_worker_model, texts, batch_size)
+
+
+class ChunkEmbedder:
+    """
+    embed chunk texts for an index build: texts are sorted by length so
+    batches pad little, optionally spread over encoder processes
+    """
+
+    # tuned batch size per (model, workers, threads), kept across builds
+    _tuned: dict[tuple, int] = {}
+
+    def __init__(
+        self,
+        model,
+        *,
+        workers: int | None = None,
+        threads: int | None = None,
+        batch_size: int | None = None,
+    ) -> None:
+        settings = get_settings()
+        self.model = model
+        self.workers = workers or settings.embed_workers
+        self.threads = threads or settings.embed_threads or max(
+            (os.cpu_count() or 1) // self.workers, 1
+        )
+        self.batch_size = batch_size or settings.embed_batch_size or None
+        # an explicit thread count is also pinned when encoding in this process,
+        # the default (all cores) is torch's own
+        self._pin_threads = bool(threads or settings.embed_threads)
+        self._restore_threads: int | None = None
+        self._key = (settings.embed_model_name, self.workers, self.threads)
+
+        self._pool: ProcessPoolExecutor | None = None
+        self.n_texts = 0
+        self.seconds = 0.0
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: forking a process that already runs torch threads can hang
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(get_settings().embed_model_name, self.threads),
+            )
+            logger.info(
+                f"started {self.workers} encoder processes, "
+                f"{self.threads} threads each"
+            )
+
+        return self._pool
+
+    def _pin_local_threads(self) -> None:
+        """ torch threads of this process while a single worker encodes here """
+        if not self._pin_threads or self._restore_threads is not None:
+            return
+
+        import torch
+
+        self._restore_threads = torch.get_num_threads()
+        torch.set_num_threads(self.threads)
+
+    def _run(self, texts: list[str], batch_size: int) -> np.ndarray:
+        """ encode length-sorted texts, in order """
+        if self.workers == 1:
+            self._pin_local_threads()
+            return _encode(self.model, texts, batch_size)
+
+        # contiguous slices keep each worker's batches of similar length
+        step = -(-len(texts) // self.workers)
+        blocks = [texts[i : i + step] for i in range(0, len(texts), step)]
+        pool = self._get_pool()
+
+        return np.concatenate(
+            list(pool.map(_encode_in_worker, blocks, [batch_size] * len(blocks)))
+        )
+
+    def _tune(self, texts: list[str]) -> int:
+        """ fastest internal batch size on a sample spread over all lengths """
+        sample = texts[:: max(len(texts) // TUNE_SAMPLE, 1)][:TUNE_SAMPLE]
+        timings = {}
+
+        for batch_size in BATCH_CANDIDATES:
+            start = time.perf_counter()
+            self._run(sample, batch_size)
+            timings[batch_size] = time.perf_counter() - start
+
+        best = min(timings, key=timings.__getitem__)
+        logger.info(
+            "embed batch size tuned: "
+            + " ".join(f"{b}={len(sample) / t:.0f}/s" for b, t in timings.items())
+            + f", using {best}"
+        )
+
+        return best
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        if not texts:
+            return np.empty((0, 0), dtype="float32")
+
+        order = np.argsort([-len(text) for text in texts], kind="stable")
+        sorted_texts = [texts[i] for i in order]
+
+        batch_size = self.batch_size or self._tuned.get(self._key)
+        if batch_size is None:
+            if len(texts) >= 2 * TUNE_SAMPLE:
+                batch_size = self._tuned[self._key] = self._tune(sorted_texts)
+            else :
+                batch_size = 32
+
+        start = time.perf_counter()
+        sorted_embeddings = self._run(sorted_texts, batch_size)
+        self.seconds += time.perf_counter() - start
+        self.n_texts += len(texts)
+
+        embeddings = np.empty_like(sorted_embeddings)
+        embeddings[order] = sorted_embeddings
+
+        return embeddings
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+        # queries after the build use the process default again
+        if self._restore_threads is not None:
+            import torch
+
+            torch.set_num_threads(self._restore_threads)
+            self._restore_threads = None
+
+        if self.n_texts and self.seconds > 0:
+            rate = self.n_texts / self.seconds
+            get_metrics().observe("embed_chunks_per_sec", rate, unit="chunks/s")
+            logger.info(
+                f"embedded {self.n_texts} chunks in {self.seconds:.2f}s "
+                f"({rate:.1f} chunks/s, {self.workers} workers)"
+            )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,107 @@
+import os
+import shutil
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+from rag_notes_helper.core.config import get_settings
+from rag_notes_helper.utils.logger import get_logger
+
+
+logger = get_logger("index")
+
+# storage/generations/<name>/ holds one complete build, storage/CURRENT names
+# the served one; a build is only visible once CURRENT is swapped to it
+POINTER = "CURRENT"
+GENERATIONS_DIR = "generations"
+INDEX_FILE = "faiss.index"
+META_FILES = ["meta.jsonl", "meta.idx", "meta.dups.json", "meta.chunks.json"]
+
+# unpublished builds older than this are leftovers of crashed processes
+STALE_BUILD_SECONDS = 3600
+
+
+def current_generation(storage: Path | None = None) -> Path | None:
+    """ directory of the served generation, None if nothing is indexed """
+    storage = storage or get_settings().storage_dir
+
+    try :
+        name = (storage / POINTER).read_text(encoding="utf-8").strip()
+    except FileNotFoundError:
+        name = ""
+
+    if name:
+        return storage / GENERATIONS_DIR / name
+
+    # flat layout written before generations existed
+    if (storage / INDEX_FILE).exists():
+        return storage
+
+    return None
+
+
+def new_generation(storage: Path | None = None) -> Path:
+    """ private directory for a build, named to sort by creation time """
+    storage = storage or get_settings().storage_dir
+    name = f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}-{uuid.uuid4().hex[:6]}"
+
+    path = storage / GENERATIONS_DIR / name
+    path.mkdir(parents=True)
+
+    return path
+
+
+def publish(generation: Path, storage: Path | None = None) -> None:
+    """ atomically point CURRENT at a complete generation """
+    storage = storage or get_settings().storage_dir
+
+    tmp = storage / f"{POINTER}.{uuid.uuid4().hex[:8]}.tmp"
+    with tmp.open("w", encoding="utf-8") as f:
+        f.write(generation.name)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, storage / POINTER)
+
+    logger.info(f"published generation {generation.name}")
+    prune_generations(storage)
+
+
+def prune_generations(
+    storage: Path | None = None,
+    keep: int | None = None,
+) -> None:
+    """
+    drop old generations, keeping the current one and the keep - 1 before
+    it, so readers pinned to a recent generation can finish their queries
+    """
+    storage = storage or get_settings().storage_dir
+    keep = keep or get_settings().keep_generations
+    current = current_generation(storage)
+
+    root = storage / GENERATIONS_DIR
+    if current is None or not root.exists():
+        return
+
+    complete = sorted(
+        (p for p in root.iterdir() if (p / INDEX_FILE).exists()),
+        key=lambda p: p.name,
+    )
+    served = [p for p in complete if p.name <= current.name]
+    expired = served[: max(len(served) - keep, 0)]
+
+    # never touch builds still being written by another process
+    now = time.time()
+    expired += [
+        p for p in root.iterdir()
+        if not (p / INDEX_FILE).exists()
+        and now - p.stat().st_mtime > STALE_BUILD_SECONDS
+    ]
+
+    for path in expired:
+        shutil.rmtree(path, ignore_errors=True)
+
+    # files of the flat layout are superseded by the first generation
+    if current != storage:
+        for name in [INDEX_FILE, *META_FILES]:
+            (storage / name).unlink(missing_ok=True)
@@ -1,39 +1,349 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import ExitStack
+from dataclasses import asdict
+from datetime import datetime
 from itertools import chain
 from pathlib import Path
-from typing import Iterator
+from typing import Iterable, Iterator
+import hashlib
 import json
-import struct
+import mmap
+import shutil
+import threading
 
 import numpy as np
 import faiss
 from tqdm import tqdm
 
-from rag_notes_helper.core.config import get_settings
-from rag_notes_helper.rag.chunking import Chunk
-from rag_notes_helper.rag.ingest import get_changed_doc_ids, load_notes
-from rag_notes_helper.rag.loaders import load_pdf_file, load_text_file
+from rag_notes_helper.core.config import get_settings, use_profile
+from rag_notes_helper.rag.chunking import Chunk, chunk_document
+from rag_notes_helper.rag.coarse import CoarseIndex, build_coarse
+from rag_notes_helper.rag.dedup import Deduplicator
+from rag_notes_helper.rag.embedder import ChunkEmbedder
+from rag_notes_helper.rag.generations import (
+    INDEX_FILE,
+    current_generation,
+    new_generation,
+    publish,
+)
+from rag_notes_helper.rag.ingest import (
+    get_changed_doc_ids,
+    get_touched_doc_ids,
+    ingest_lines,
+    iter_stored_chunks,
+    load_notes,
+)
+from rag_notes_helper.rag.line_store import LineStore
+from rag_notes_helper.rag.loaders import load_file
 from rag_notes_helper.rag.meta_store import MetaStore
+from rag_notes_helper.rag.records import OFFSETS_FILE, RecordReader, open_writer
 from rag_notes_helper.utils.logger import get_logger
+from rag_notes_helper.utils.threads import run_in_background
 from rag_notes_helper.utils.timer import time_block, deco_time_block
 
 
 logger = get_logger("index")
 
+# one rebuild at a time, a later build must start from the newest generation
+_build_lock = threading.Lock()
+
+# old rows migrated per step of smart_rebuild, bounds the extra memory
+MIGRATE_BLOCK = 65536
+
 class RagIndex:
-    _model =  None
+    # embedding models by name, profiles with the same model share one
+    _models: dict[str, object] = {}
+    _model_futures: dict[str, Future] = {}
+    _model_lock = threading.Lock()
+
+    def __init__(
+        self,
+        index: faiss.Index | None,
+        *,
+        loader: Future | None = None,
+        path: Path | None = None,
+        model_name: str | None = None,
+        coarse: CoarseIndex | None = None,
+    ) -> None:
+        self._index = index
+        self._loader = loader
+        # generation directory the index was read from or written to
+        self.path = path
+        self._coarse = coarse
+        self._coarse_read = coarse is not None
+        # model the vectors were embedded with, the active profile's by default
+        self.model_name = model_name or get_settings().embed_model_name
+
+    @property
+    def index(self) -> faiss.Index | None:
+        # wait for a background load only when the index is first used
+        if self._index is None and self._loader is not None:
+            self._index = self._loader.result()
+            self._loader = None
+
+        return self._index
 
-    def __init__(self, index: faiss.Index | None) -> None:
-        self.index = index
+    @index.setter
+    def index(self, index: faiss.Index | None) -> None:
+        self._index = index
+        self._loader = None
 
     @property
-    def embed_model(self):
-        if RagIndex._model is None:
+    def coarse(self) -> CoarseIndex | None:
+        """ low-dimension index of the two-stage search, None if not built """
+        if not self._coarse_read and self.path is not None:
+            self._coarse = CoarseIndex.load(self.path)
+            self._coarse_read = True
+
+        return self._coarse
+
+    @classmethod
+    def preload(cls, model_name: str | None = None) -> Future:
+        """ load and warm up an embedding model on a background thread """
+        model_name = model_name or get_settings().embed_model_name
+
+        with cls._model_lock:
+            future = cls._model_futures.get(model_name)
+            stale = (
+                future is not None
+                and future.done()
+                and model_name not in cls._models
+            )
+            if future is None or stale:
+                future = cls._model_futures[model_name] = run_in_background(
+                    cls._load_model,
+                    model_name,
+                    name="preload-embed-model",
+                )
+
+            return future
+
+    @classmethod
+    def _load_model(cls, model_name: str):
+        if model_name not in cls._models:
             with time_block("loading embedding model"):
                 from sentence_transformers import SentenceTransformer
-                embed_model_name = get_settings().embed_model_name
-                RagIndex._model = SentenceTransformer(embed_model_name)
+                model = SentenceTransformer(model_name)
+
+            # first inference pays for lazy allocations, keep it off the query path
+            with time_block("embed_warmup"):
+                model.encode(
+                    ["warm up the embedding model"],
+                    normalize_embeddings=True,
+                    convert_to_numpy=True,
+                )
+
+            cls._models[model_name] = model
+
+        return cls._models[model_name]
+
+    @property
+    def embed_model(self):
+        model = RagIndex._models.get(self.model_name)
+        if model is None:
+            model = RagIndex.preload(self.model_name).result()
+
+        return model
+
 
-        return RagIndex._model
+def _record_line(record: dict) -> bytes:
+    """ one meta.jsonl line of a chunk record """
+    record = {
+        "doc_id": record["doc_id"],
+        "chunk_id": record["chunk_id"],
+        "source": record["source"],
+        "text": record["text"],
+    }
+
+    return json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n"
+
+
+def _new_index(dim: int) -> faiss.Index:
+    settings = get_settings()
+
+    if settings.index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, settings.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+        # saved with the index, readers search with the same beam width
+        index.hnsw.efSearch = settings.hnsw_ef_search
+        return index
+
+    return faiss.IndexFlatIP(dim)
+
+
+class IndexWriter:
+    """ write vectors, meta records and duplicate clusters of one build """
+
+    def __init__(self, storage: Path | None = None) -> None:
+        settings = get_settings()
+        # a fresh generation, invisible to readers until commit publishes it
+        self.storage = storage or new_generation()
+        self.storage.mkdir(parents=True, exist_ok=True)
+
+        self.index: faiss.Index | None = None
+        self.duplicates: dict[int, list[dict]] = {}
+        # doc_id -> chunk_id -> faiss_id, for neighbour lookups
+        self.positions: dict[str, dict[int, int]] = {}
+        # source -> catalog entry of each indexed note
+        self.docs: dict[str, dict] = {}
+        self.dedup = (
+            Deduplicator(settings.dedup_max_distance)
+            if settings.dedup_chunks else None
+        )
+
+        self.records = open_writer(
+            self.storage,
+            settings.meta_compression,
+            settings.meta_block_records,
+        )
+
+    @property
+    def ntotal(self) -> int:
+        return 0 if self.index is None else self.index.ntotal
+
+    def assign(self, batch: list[Chunk]) -> tuple[list[int], list[int]]:
+        """ faiss_id of each chunk, and positions of chunks needing a vector """
+        ids: list[int] = []
+        keep: list[int] = []
+        next_id = self.ntotal
+
+        for i, chunk in enumerate(batch):
+            rep_id = (
+                self.dedup.find_or_add(chunk.text, next_id)
+                if self.dedup is not None else None
+            )
+
+            if rep_id is None:
+                ids.append(next_id)
+                keep.append(i)
+                next_id += 1
+            else :
+                ids.append(rep_id)
+                self.add_duplicate(rep_id, asdict(chunk))
+
+        return ids, keep
+
+    def _add_vectors(self, embeddings: np.ndarray) -> None:
+        if self.index is None:
+            self.index = _new_index(embeddings.shape[1])
+
+        self.index.add(embeddings) # type: ignore
+
+    def add(self, batch: list[Chunk], embeddings: np.ndarray) -> None:
+        if not batch:
+            return
+
+        first_id = self.ntotal
+        self._add_vectors(embeddings)
+
+        for faiss_id, chunk in enumerate(batch, start=first_id):
+            record = asdict(chunk)
+            self.positions.setdefault(chunk.doc_id, {})[chunk.chunk_id] = faiss_id
+            self._track(faiss_id, record)
+            self.records.append(_record_line(record))
+
+    def add_raw(
+        self,
+        embeddings: np.ndarray,
+        lines: list[bytes],
+        offsets: np.ndarray,
+    ) -> None:
+        """
+        append vectors with their serialized meta records, offsets are
+        relative to the first line; callers record chunk positions themselves
+        """
+        self._add_vectors(embeddings)
+        self.records.extend(lines, offsets)
+
+    def _track(self, faiss_id: int, record: dict) -> None:
+        entry = self.docs.setdefault(record["source"], {
+            "doc_id": record["doc_id"],
+            "chunks": 0,
+            "first_id": faiss_id,
+            "last_id": faiss_id,
+        })
+        entry["chunks"] = max(entry["chunks"], record["chunk_id"] + 1)
+        entry["first_id"] = min(entry["first_id"], faiss_id)
+        entry["last_id"] = max(entry["last_id"], faiss_id)
+
+    def add_duplicate(self, faiss_id: int, record: dict) -> None:
+        doc_positions = self.positions.setdefault(record["doc_id"], {})
+        doc_positions[record["chunk_id"]] = faiss_id
+        self._track(faiss_id, record)
+
+        self.duplicates.setdefault(faiss_id, []).append({
+            "doc_id": record["doc_id"],
+            "chunk_id": record["chunk_id"],
+            "source": record["source"],
+            "text": record["text"],
+        })
+
+    def close(self) -> None:
+        self.records.close()
+
+    def commit(self) -> RagIndex:
+        """ complete the generation on disk and make it the served one """
+        self.close()
+
+        if self.index is None:
+            raise ValueError("No chunks to index")
+
+        with (self.storage / "meta.dups.json").open("w", encoding="utf-8") as f:
+            json.dump(self.duplicates, f, ensure_ascii=False)
+
+        # chunk_ids of a document are dense, store faiss_ids as a list
+        chunk_positions = {
+            doc_id: [
+                doc_positions.get(chunk_id, -1)
+                for chunk_id in range(max(doc_positions) + 1)
+            ]
+            for doc_id, doc_positions in self.positions.items()
+        }
+        with (self.storage / "meta.chunks.json").open("w", encoding="utf-8") as f:
+            json.dump(chunk_positions, f)
+
+        # document catalog, migrated entries keep their size and index time
+        notes_dir = get_settings().notes_dir
+        indexed_at = datetime.now().isoformat(timespec="seconds")
+        for source, entry in self.docs.items():
+            if "indexed_at" not in entry:
+                path = notes_dir / source
+                entry["size"] = path.stat().st_size if path.exists() else None
+                entry["indexed_at"] = indexed_at
+        with (self.storage / "meta.docs.json").open("w", encoding="utf-8") as f:
+            json.dump(self.docs, f, ensure_ascii=False)
+
+        # lets a smart rebuild keep the migrated chunks' signatures unhashed
+        if self.dedup is not None:
+            np.savez(self.storage / "meta.dedup.npz", **self.dedup.export())
+
+        with time_block("write faiss index"):
+            faiss.write_index(self.index, str(self.storage / INDEX_FILE))
+
+        settings = get_settings()
+        coarse = (
+            build_coarse(self.index, settings.coarse_dim, settings.coarse_method)
+            if settings.coarse_dim else None
+        )
+        if coarse is not None:
+            coarse.save(self.storage)
+
+        publish(self.storage)
+
+        n_dups = sum(len(d) for d in self.duplicates.values())
+        logger.info(f"indexed {self.ntotal} vectors, {n_dups} duplicate chunks")
+
+        return RagIndex(index=self.index, path=self.storage, coarse=coarse)
+
+    def abort(self) -> None:
+        self.close()
+        shutil.rmtree(self.storage, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.abort()
 
 
 def build_index(
@@ -50,282 +360,427 @@ def build_index(
 
     chunks = chain([first], chunks)
 
-    storage: Path = get_settings().storage_dir
-
-    model = RagIndex(None).embed_model
-    index = None
+    embedder = ChunkEmbedder(RagIndex(None).embed_model)
     batch: list[Chunk] = []
-    packer = struct.Struct("Q")
 
     with time_block("processing chunks"):
-        with (
-            (storage / "meta.idx").open("wb") as idx_f,
-            (storage / "meta.jsonl").open("wb") as meta_f
-        ):
+        with IndexWriter() as writer, embedder:
             for chunk in tqdm(chunks, desc="Indexing chunks"):
                 batch.append(chunk)
 
                 if len(batch) >= batch_size:
-                    index = _process_batch(
-                        batch,
-                        model,
-                        index,
-                        meta_f,
-                        idx_f,
-                        packer
-                    )
+                    _process_batch(batch, embedder, writer)
                     batch.clear()
 
             if batch:
-                index = _process_batch(
-                    batch,
-                    model,
-                    index,
-                    meta_f,
-                    idx_f,
-                    packer
-                )
+                _process_batch(batch, embedder, writer)
 
-    if index is None:
-        raise ValueError("No chunks to index")
-
-    return RagIndex(index=index)
+            return writer.commit()
 
 
 def _process_batch(
     batch: list[Chunk],
-    model,
-    index,
-    meta_f,
-    idx_f,
-    packer: struct.Struct,
-) -> faiss.Index:
-
-    if not batch:
-        return index
-
-    # 1. generate embedding vectors
-    embeddings = model.encode(
-        [c.text for c in batch],
-        normalize_embeddings=True,
-        convert_to_numpy=True,
-    ).astype("float32")
-
-
-    # 2. initialize or update faiss index
-    if index is None:
-        index = faiss.IndexFlatIP(embeddings.shape[1])
+    embedder: ChunkEmbedder,
+    writer: IndexWriter,
+) -> None:
 
-    index.add(embeddings) # type: ignore
+    # 1. skip duplicated chunk texts
+    _, keep = writer.assign(batch)
+    batch = [batch[i] for i in keep]
 
+    if not batch:
+        return
 
-    # 3. write meta_f and offset_f
-    for chunk in batch:
-        offset = meta_f.tell()
-
-        record = {
-            "doc_id": chunk.doc_id,
-            "chunk_id": chunk.chunk_id,
-            "source": chunk.source,
-            "text": chunk.text,
-        }
-
-        # write meta_f
-        meta_f.write(
-            json.dumps(record, ensure_ascii=False).encode("utf-8")
-            + b"\n"
-        )
-        # write offset_f
-        idx_f.write(packer.pack(offset))
+    # 2. generate embedding vectors
+    embeddings = embedder.encode([c.text for c in batch])
 
-    return index
+    # 3. update faiss index and write meta records
+    writer.add(batch, embeddings)
 
 
 def smart_rebuild(
     changed_ids: list[tuple[str, Path]],
     unchanged_ids: set[str],
     batch_size = 1024,
+    *,
+    progress: bool = True,
 ) -> RagIndex:
 
-    settings = get_settings()
-    storage = settings.storage_dir
-    notes_dir = settings.notes_dir
-
-    tmp_meta_path = storage / "meta.json.tmp"
-    tmp_idx_path = storage / "meta.idx.tmp"
+    notes_dir = get_settings().notes_dir
 
     old_rag = load_index()
-    model = old_rag.embed_model
+    embedder = ChunkEmbedder(old_rag.embed_model)
+    line_store = LineStore()
 
-    new_index = None
-    embeddings = []
     batch: list[Chunk] = []
-    packer = struct.Struct("Q")
-
-    storage.mkdir(parents=True, exist_ok=True)
 
     with time_block("smart process chunks"):
-        with (
-            tmp_meta_path.open("wb") as meta_f,
-            tmp_idx_path.open("wb") as idx_f,
-        ):
+        with IndexWriter() as writer, embedder:
             # 1. migrate unchanged files' chunks
-            with MetaStore() as meta_store:
-                for i in tqdm(
-                    range(old_rag.index.ntotal), # type: ignore
-                    desc="Migrating existing chunks ..."
-                ):
-                    chunk_dict = meta_store.get(i)
-                    if chunk_dict["doc_id"] in unchanged_ids:
-                        embeddings.append(old_rag.index.reconstruct(i)) # type: ignore
-                        batch.append(Chunk(**chunk_dict))
+            with MetaStore(old_rag.path) as meta_store:
+                n_kept = _migrate_unchanged(
+                    old_rag,
+                    meta_store,
+                    unchanged_ids,
+                    writer,
+                    progress=progress,
+                )
+            logger.info(f"migrated {n_kept}/{old_rag.index.ntotal} vectors") # type: ignore
+
+            # 2. get chunks from changed files
+            for doc_id, path in tqdm(
+                changed_ids,
+                desc="Embedding new chunks ...",
+                disable=not progress,
+            ):
+                source = str(path.relative_to(notes_dir))
+
+                chunk_iter = load_file(
+                    path,
+                    doc_id=doc_id,
+                    source=source,
+                    line_store=line_store,
+                )
+
+                for chunk in chunk_iter:
+                    batch.append(chunk)
 
-                    # write unchanged chunks into meta and idx
+                    #  write new chunks into meta and idx
                     if len(batch) >= batch_size:
-                        new_index = _smart_process_chunks(
-                            batch,
-                            new_index,
-                            meta_f,
-                            idx_f,
-                            packer,
-                            embeddings=embeddings,
-                        )
-                        embeddings.clear()
+                        _process_batch(batch, embedder, writer)
                         batch.clear()
 
-                if batch:
-                    new_index = _smart_process_chunks(
-                        batch,
-                        new_index,
-                        meta_f,
-                        idx_f,
-                        packer,
-                        embeddings=embeddings,
-                    )
-                    embeddings.clear()
-                    batch.clear()
+            if batch:
+                _process_batch(batch, embedder, writer)
 
-            # 2. get chunks from changed files
-            for doc_id, path in tqdm(changed_ids, desc="Embedding new chunks ..."):
-                source = str(path.relative_to(notes_dir))
+            try :
+                rag = writer.commit()
+            except ValueError:
+                raise ValueError("No notes left after smart rebuild")
+
+    line_store.prune(unchanged_ids | {doc_id for doc_id, _ in changed_ids})
 
-                if source.endswith(".pdf"):
-                    chunk_iter = load_pdf_file(
-                        path,
-                        doc_id=doc_id,
-                        source=source,
-                    )
+    return rag
+
+
+def _scan_positions(meta_store: MetaStore) -> dict[str, list[int]]:
+    """ chunk positions of generations written before meta.chunks.json """
+    positions: dict[str, dict[int, int]] = {}
+
+    for faiss_id, record in enumerate(meta_store.iter_records()):
+        positions.setdefault(record["doc_id"], {})[record["chunk_id"]] = faiss_id
+
+    for faiss_id, members in meta_store.duplicates.items():
+        for member in members:
+            positions.setdefault(member["doc_id"], {})[member["chunk_id"]] = faiss_id
+
+    return {
+        doc_id: [p.get(chunk_id, -1) for chunk_id in range(max(p) + 1)]
+        for doc_id, p in positions.items()
+    }
+
+
+def _vector_rows(index: faiss.Index, start: int, stop: int) -> np.ndarray:
+    """ rows start:stop of the stored vectors, a view for flat indexes """
+    if isinstance(index, faiss.IndexFlat):
+        xb = faiss.rev_swig_ptr(index.get_xb(), index.ntotal * index.d) # type: ignore
+        return xb.reshape(index.ntotal, index.d)[start:stop] # type: ignore
+
+    return index.reconstruct_n(start, stop - start) # type: ignore
+
+
+def _migrate_unchanged(
+    old_rag: RagIndex,
+    meta_store: MetaStore,
+    unchanged_ids: set[str],
+    writer: IndexWriter,
+    *,
+    progress: bool = True,
+) -> int:
+    """
+    copy the rows of unchanged documents into the writer in bulk: a keep
+    mask from the chunk positions selects vectors block by block and meta
+    lines are copied as raw byte ranges, returns the number of rows kept
+    """
+    old_index = old_rag.index
+    ntotal = old_index.ntotal # type: ignore
+    positions = meta_store.chunk_positions or _scan_positions(meta_store)
+
+    # 1. a row survives while any of its chunks belongs to an unchanged doc
+    kept_docs = [doc_id for doc_id in unchanged_ids if doc_id in positions]
+    doc_rows = np.fromiter(
+        chain.from_iterable(positions[doc_id] for doc_id in kept_docs),
+        dtype=np.int64,
+    )
+
+    keep = np.zeros(ntotal, dtype=bool)
+    keep[doc_rows[doc_rows >= 0]] = True
+
+    id_map = np.where(keep, np.cumsum(keep) - 1 + writer.ntotal, -1)
+
+    # 2. chunk positions of kept docs follow their rows
+    new_rows = np.where(doc_rows >= 0, id_map[doc_rows], -1).tolist()
+    start = 0
+    for doc_id in kept_docs:
+        n_chunks = len(positions[doc_id])
+        writer.positions[doc_id] = {
+            chunk_id: faiss_id
+            for chunk_id, faiss_id in enumerate(new_rows[start : start + n_chunks])
+            if faiss_id >= 0
+        }
+        start += n_chunks
+
+    # catalog entries of kept docs, their faiss_id range follows the rows
+    for source, entry in meta_store.catalog.items():
+        if entry["doc_id"] in unchanged_ids:
+            writer.docs[source] = {
+                **entry,
+                "first_id": int(id_map[entry["first_id"]]),
+                "last_id": int(id_map[entry["last_id"]]),
+            }
+
+    # 3. clusters lose changed members, a changed head is replaced by a kept one
+    rewrites: dict[int, bytes] = {}
+    for faiss_id, members in meta_store.duplicates.items():
+        if not keep[faiss_id]:
+            continue
+
+        head = meta_store.get(faiss_id)
+        members = [
+            m for m in [head, *members] if m["doc_id"] in unchanged_ids
+        ]
+        if members[0] is not head:
+            rewrites[faiss_id] = _record_line(members[0])
+
+        for member in members[1:]:
+            writer.add_duplicate(int(id_map[faiss_id]), member)
+
+    # 4. vectors and meta lines, in row order
+    reader = meta_store.records
+
+    with ExitStack() as stack:
+        # plain meta.jsonl: runs of rows are copied as raw byte ranges
+        if isinstance(reader, RecordReader):
+            offsets = np.fromfile(old_rag.path / OFFSETS_FILE, dtype=np.uint64) # type: ignore
+            ends = np.append(offsets[1:], np.uint64(reader.meta_path.stat().st_size))
+            mm = stack.enter_context(mmap.mmap(
+                reader.meta_f.fileno(),
+                length=0,
+                access=mmap.ACCESS_READ,
+            ))
+        else :
+            mm = None
+
+        for block_start in tqdm(
+            range(0, ntotal, MIGRATE_BLOCK),
+            desc="Migrating existing chunks ...",
+            disable=not progress,
+        ):
+            block_stop = min(block_start + MIGRATE_BLOCK, ntotal)
+            rows = np.flatnonzero(keep[block_start:block_stop]) + block_start
+            if not rows.size:
+                continue
+
+            vectors = _vector_rows(old_index, block_start, block_stop)[rows - block_start]
+
+            # runs of consecutive rows are one byte range of meta.jsonl
+            cuts = {0, len(rows), *(np.flatnonzero(np.diff(rows) != 1) + 1).tolist()}
+            for faiss_id in rewrites:
+                if block_start <= faiss_id < block_stop:
+                    i = int(np.searchsorted(rows, faiss_id))
+                    cuts |= {i, i + 1}
+            cuts = sorted(cuts)
+
+            lines: list[bytes] = []
+            line_offsets: list[np.ndarray] = []
+            pos = 0
+
+            for a, b in zip(cuts, cuts[1:]):
+                first, last = int(rows[a]), int(rows[b - 1])
+
+                if first in rewrites:
+                    line = rewrites[first]
+                    line_offsets.append(np.array([pos], dtype=np.uint64))
+                elif mm is not None:
+                    line = mm[offsets[first] : ends[last]]
+                    line_offsets.append(offsets[rows[a:b]] - offsets[first] + np.uint64(pos))
                 else :
-                    chunk_iter = load_text_file(
-                        path,
-                        doc_id=doc_id,
-                        source=source,
-                    )
+                    # compressed blocks: one decompression per block, no json
+                    run = [reader.read(row) for row in range(first, last + 1)]
+                    line = b"".join(run)
+                    starts = np.cumsum([0, *map(len, run[:-1])], dtype=np.uint64)
+                    line_offsets.append(starts + np.uint64(pos))
 
-                for chunk in chunk_iter:
+                lines.append(line)
+                pos += len(line)
+
+            writer.add_raw(vectors, lines, np.concatenate(line_offsets))
+
+    # 5. let new chunks dedupe against the migrated ones
+    if writer.dedup is not None:
+        dedup_path = old_rag.path / "meta.dedup.npz" # type: ignore
+        if dedup_path.exists():
+            with np.load(dedup_path) as state:
+                writer.dedup.merge(state, id_map)
+        else :
+            for faiss_id, record in enumerate(meta_store.iter_records()):
+                if keep[faiss_id] and faiss_id not in rewrites:
+                    writer.dedup.find_or_add(record["text"], int(id_map[faiss_id]))
+
+    return int(keep.sum())
+
+
+def _text_key(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+def rechunk_rebuild(batch_size: int = 1024) -> RagIndex:
+    """ re-chunk persisted line streams, embedding only unseen chunk texts """
+    old_rag = load_index()
+    embedder = ChunkEmbedder(old_rag.embed_model)
+    line_store = LineStore()
+
+    # 1. map chunk texts already embedded to their faiss_id
+    with MetaStore(old_rag.path) as meta_store:
+        doc_ids = meta_store.get_all_doc_id()
+        known_ids = {
+            _text_key(record["text"]): faiss_id
+            for faiss_id, record in enumerate(meta_store.iter_records())
+        }
+        for faiss_id, members in meta_store.duplicates.items():
+            for member in members:
+                known_ids.setdefault(_text_key(member["text"]), faiss_id)
+
+    missing = doc_ids - line_store.doc_ids()
+    if missing:
+        raise FileNotFoundError(
+            f"Line streams of {len(missing)} documents not found"
+        )
+
+    docs = sorted(
+        (line_store.read(doc_id) + (doc_id,) for doc_id in doc_ids),
+        key=lambda doc: doc[0],
+    )
+
+    batch: list[Chunk] = []
+    n_reused = 0
+
+    with time_block("rechunk process chunks"):
+        with IndexWriter() as writer, embedder:
+            # 2. chunk line streams with current chunking settings
+            for source, lines, doc_id in tqdm(docs, desc="Re-chunking ..."):
+                for chunk in chunk_document(
+                    lines=lines,
+                    doc_id=doc_id,
+                    source=source,
+                ):
                     batch.append(chunk)
 
-                    #  write new chunks into meta and idx
                     if len(batch) >= batch_size:
-                        new_index = _smart_process_chunks(
+                        n_reused += _rechunk_process_chunks(
                             batch,
-                            new_index,
-                            meta_f,
-                            idx_f,
-                            packer,
-                            has_new_chunk=True,
-                            model=model,
+                            writer,
+                            embedder=embedder,
+                            old_index=old_rag.index,
+                            known_ids=known_ids,
                         )
                         batch.clear()
 
             if batch:
-                new_index = _smart_process_chunks(
+                n_reused += _rechunk_process_chunks(
                     batch,
-                    new_index,
-                    meta_f,
-                    idx_f,
-                    packer,
-                    has_new_chunk=True,
-                    model=model,
+                    writer,
+                    embedder=embedder,
+                    old_index=old_rag.index,
+                    known_ids=known_ids,
                 )
 
-    if new_index is None:
-        raise ValueError("No notes left after smart rebuild")
+            rag = writer.commit()
 
-    # 3. swap temp with original file meta and idx
-    tmp_meta_path.replace(storage / "meta.jsonl")
-    tmp_idx_path.replace(storage / "meta.idx")
+    logger.info(
+        f"rechunk reused {n_reused}/{rag.index.ntotal} chunk embeddings"
+    )
 
-    return RagIndex(index=new_index)
+    return rag
 
 
-def _smart_process_chunks(
+def _rechunk_process_chunks(
     batch: list[Chunk],
-    index,
-    meta_f,
-    idx_f,
-    packer: struct.Struct,
+    writer: IndexWriter,
     *,
-    embeddings: list[np.ndarray] | None = None,
-    has_new_chunk: bool = False,
-    model = None,
-):
-    if has_new_chunk:
-        embeddings = model.encode( # type: ignore
-            [c.text for c in batch],
-            normalize_embeddings=True,
-            convert_to_numpy=True,
-        ).astype("float32")
-    else :
-        embeddings = np.asarray(embeddings).astype("float32") # type: ignore
-
-    if index is None:
-        index = faiss.IndexFlatIP(embeddings.shape[1]) # type: ignore
-
-    index.add(embeddings) # type: ignore
-
-    for chunk in batch:
-        offset = meta_f.tell()
-        record = {
-            "doc_id": chunk.doc_id,
-            "chunk_id": chunk.chunk_id,
-            "source": chunk.source,
-            "text": chunk.text,
-        }
+    embedder: ChunkEmbedder,
+    old_index: faiss.Index,
+    known_ids: dict[bytes, int],
+) -> int:
 
-        # write meta_f
-        meta_f.write(
-            json.dumps(record, ensure_ascii=False).encode("utf-8")
-            + b"\n"
-        )
-        # write offset_f
-        idx_f.write(packer.pack(offset))
+    _, keep = writer.assign(batch)
+    batch = [batch[i] for i in keep]
 
-    return index
+    if not batch:
+        return 0
 
+    old_ids = [known_ids.get(_text_key(c.text), -1) for c in batch]
+    reused = [i for i, old_id in enumerate(old_ids) if old_id >= 0]
+    fresh = [i for i, old_id in enumerate(old_ids) if old_id < 0]
 
-@deco_time_block
-def save_index(rag: RagIndex) -> None:
-    store_path = get_settings().storage_dir / "faiss.index"
-    faiss.write_index(rag.index, str(store_path))
+    embeddings = np.empty((len(batch), old_index.d), dtype="float32")
 
+    # 1. reuse stored vectors of unchanged chunk texts
+    if reused:
+        embeddings[reused] = old_index.reconstruct_batch( # type: ignore
+            np.asarray([old_ids[i] for i in reused], dtype="int64")
+        )
 
-@deco_time_block
-def load_index() -> RagIndex:
-    store_path = get_settings().storage_dir / "faiss.index"
+    # 2. embed only the new chunk texts
+    if fresh:
+        embeddings[fresh] = embedder.encode([batch[i].text for i in fresh])
+
+    writer.add(batch, embeddings)
 
-    if not store_path.exists():
+    return len(reused)
+
+
+def _read_index(generation: Path | None) -> faiss.Index:
+    if generation is None or not (generation / INDEX_FILE).exists():
         raise FileNotFoundError("Index not found")
 
-    index = faiss.read_index(str(store_path))
+    with time_block("read faiss index"):
+        return faiss.read_index(str(generation / INDEX_FILE))
 
-    return RagIndex(index=index)
+
+@deco_time_block
+def load_index() -> RagIndex:
+    """ the served generation, its meta files are opened with MetaStore(rag.path) """
+    generation = current_generation()
+    return RagIndex(index=_read_index(generation), path=generation)
+
+
+def preload_index() -> RagIndex:
+    """
+    start loading the embedding model and faiss index in the background,
+    the returned RagIndex blocks on first use only if loading is unfinished
+    """
+    RagIndex.preload()
+
+    # a missing index is built in the foreground, it prints progress
+    generation = current_generation()
+    if generation is None:
+        return load_or_build_index()
+
+    return RagIndex(
+        None,
+        loader=run_in_background(
+            _read_index,
+            generation,
+            name="preload-faiss-index",
+        ),
+        path=generation,
+    )
 
 
 def build_and_save_rag() -> RagIndex:
     """ full building rag pipeline """
-    rag = build_index(load_notes())
-    save_index(rag)
+    rag = build_index(load_notes(line_store=LineStore()))
     print("Index built and saved")
 
     return rag
@@ -346,32 +801,103 @@ def load_or_build_index():
 
 def rebuild_index(force: bool = False):
     """ two rebuild mode: smart and force """
-    print(f"\n{'Force' if force else 'Smart'} rebuilding index from notes ...")
+    with _build_lock:
+        print(f"\n{'Force' if force else 'Smart'} rebuilding index from notes ...")
 
-    # force rebuild
-    if force:
-        return build_and_save_rag()
+        # force rebuild
+        if force:
+            return build_and_save_rag()
 
-    # smart rebuild
-    try :
-        # 1. get current files' hash value
+        # smart rebuild
+        try :
+            # 1. get current files' hash value
+            with MetaStore() as meta_store:
+                old_doc_ids = meta_store.get_all_doc_id()
+
+            # 2. get the changed and unchanged file
+            changed_ids, unchanged_ids = get_changed_doc_ids(old_doc_ids)
+
+            if not changed_ids:
+                print("Index is already up to date")
+                return load_index()
+
+            rag = smart_rebuild(changed_ids, unchanged_ids)
+            print("Index updated and saved")
+            return rag
+
+        except Exception as e:
+            logger.warning(
+                f"Smart rebuild failed ({e}), fall back to full rebuild index"
+            )
+            return build_and_save_rag()
+
+
+def build_profiles(names: list[str]) -> dict[str, RagIndex]:
+    """
+    full rebuild of several index profiles: notes are read once into the
+    shared line store, then every profile chunks and embeds them in parallel
+    """
+    with _build_lock:
+        print(f"\nBuilding {len(names)} index profiles from notes ...")
+
+        # unknown profile names fail before any work is done
+        for name in names:
+            with use_profile(name):
+                pass
+
+        line_store = LineStore()
+        with time_block("ingest notes"):
+            doc_ids = ingest_lines(line_store)
+
+        def build(name: str) -> RagIndex:
+            with use_profile(name):
+                return build_index(iter_stored_chunks(doc_ids, line_store))
+
+        with ThreadPoolExecutor(
+            max_workers=len(names),
+            thread_name_prefix="build-profile",
+        ) as pool:
+            futures = {
+                name: pool.submit(build, name)
+                for name in names
+            }
+            rags = {name: future.result() for name, future in futures.items()}
+
+        print("Index profiles built and saved")
+        return rags
+
+
+def rechunk_index():
+    """ rebuild chunks from persisted line streams without re-reading notes """
+    with _build_lock:
+        print("\nRe-chunking index from stored line streams ...")
+
+        try :
+            rag = rechunk_rebuild()
+            print("Index re-chunked and saved")
+            return rag
+
+        except Exception as e:
+            logger.warning(
+                f"Re-chunk failed ({e}), fall back to full rebuild index"
+            )
+            return build_and_save_rag()
+
+
+def update_index(paths: Iterable[Path]) -> RagIndex | None:
+    """ incremental update limited to the given note paths, None if unchanged """
+    with _build_lock:
         with MetaStore() as meta_store:
-            old_doc_ids = meta_store.get_all_doc_id()
-
-        # 2. get the changed and unchanged file
-        changed_ids, unchanged_ids = get_changed_doc_ids(old_doc_ids)
+            indexed = meta_store.get_doc_sources()
 
-        if not changed_ids:
-            print("Index is already up to date")
-            return load_index()
+        changed_ids, unchanged_ids = get_touched_doc_ids(indexed, paths)
 
-        rag = smart_rebuild(changed_ids, unchanged_ids)
-        save_index(rag)
-        print("Index updated and saved")
-        return rag
+        if not changed_ids and unchanged_ids == set(indexed.values()):
+            return None
 
-    except Exception as e:
-        logger.warning(
-            f"Smart rebuild failed ({e}), fall back to full rebuild index"
+        stale_ids = set(indexed.values()) - unchanged_ids
+        logger.info(
+            f"updating index: {len(changed_ids)} notes to embed, "
+            f"{len(stale_ids)} outdated"
         )
-        return build_and_save_rag()
+        return smart_rebuild(changed_ids, unchanged_ids, progress=False)
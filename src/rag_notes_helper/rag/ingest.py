@@ -1,11 +1,14 @@
 from pathlib import Path
 import hashlib
+import os
 import mmap
-from typing import Iterator
+from collections import deque
+from typing import Iterable, Iterator
 
 from rag_notes_helper.core.config import get_settings
-from rag_notes_helper.rag.chunking import Chunk
-from rag_notes_helper.rag.loaders import load_pdf_file, load_text_file
+from rag_notes_helper.rag.chunking import Chunk, chunk_document
+from rag_notes_helper.rag.line_store import LineStore
+from rag_notes_helper.rag.loaders import iter_file_lines, load_file
 from rag_notes_helper.utils.logger import get_logger
 from rag_notes_helper.utils.timer import deco_time_block
 
@@ -37,9 +40,12 @@ def is_supported_file(path: Path) -> bool:
 @deco_time_block
 def load_notes(
     notes_dir: Path | None = None,
+    *,
+    line_store: LineStore | None = None,
 ) -> Iterator[Chunk]:
     settings = get_settings()
     notes_dir = notes_dir or settings.notes_dir
+    seen_ids = set()
 
     for file_path in sorted(notes_dir.rglob("*")):
         if not file_path.is_file() or not is_supported_file(file_path):
@@ -47,12 +53,53 @@ def load_notes(
 
         doc_id = get_stable_doc_id(file_path)
         source = str(file_path.relative_to(notes_dir))
+        seen_ids.add(doc_id)
 
-        if file_path.suffix.lower() == ".pdf":
-            yield from load_pdf_file(file_path, doc_id, source)
+        yield from load_file(
+            file_path,
+            doc_id,
+            source,
+            line_store=line_store,
+        )
 
-        else :
-            yield from load_text_file(file_path, doc_id, source)
+    # drop line streams of deleted or modified notes
+    if line_store is not None:
+        line_store.prune(seen_ids)
+
+
+@deco_time_block
+def ingest_lines(
+    line_store: LineStore,
+    notes_dir: Path | None = None,
+) -> list[str]:
+    """ persist the line stream of every note without chunking, its doc_ids """
+    notes_dir = notes_dir or get_settings().notes_dir
+    doc_ids = []
+
+    for file_path in sorted(notes_dir.rglob("*")):
+        if not file_path.is_file() or not is_supported_file(file_path):
+            continue
+
+        doc_id = get_stable_doc_id(file_path)
+        source = str(file_path.relative_to(notes_dir))
+        doc_ids.append(doc_id)
+
+        if not line_store.has(doc_id):
+            deque(line_store.tee(doc_id, source, iter_file_lines(file_path)), maxlen=0)
+
+    line_store.prune(set(doc_ids))
+
+    return doc_ids
+
+
+def iter_stored_chunks(
+    doc_ids: Iterable[str],
+    line_store: LineStore,
+) -> Iterator[Chunk]:
+    """ chunk persisted line streams with the current chunking settings """
+    for doc_id in doc_ids:
+        source, lines = line_store.read(doc_id)
+        yield from chunk_document(lines=lines, doc_id=doc_id, source=source)
 
 
 @deco_time_block
@@ -77,4 +124,57 @@ def get_changed_doc_ids(
     return changed_ids, unchanged_ids
 
 
+def get_touched_doc_ids(
+    indexed: dict[str, str],
+    paths: Iterable[Path],
+    notes_dir: Path | None = None,
+):
+    """
+    get_changed_doc_ids restricted to the given paths (files or directories),
+    indexed maps source -> doc_id of the current index
+    """
+    notes_dir = notes_dir or get_settings().notes_dir
+
+    touched: set[str] = set()
+    current: dict[str, Path] = {}
+
+    for path in paths:
+        try :
+            prefix = str(path.relative_to(notes_dir))
+        except ValueError:
+            continue
+
+        # a moved or deleted directory only reports itself
+        touched.update(
+            source for source in indexed
+            if path == notes_dir
+            or source == prefix
+            or source.startswith(prefix + os.sep)
+        )
+
+        for file_path in path.rglob("*") if path.is_dir() else [path]:
+            if file_path.is_file() and is_supported_file(file_path):
+                source = str(file_path.relative_to(notes_dir))
+                touched.add(source)
+                current[source] = file_path
 
+    changed_ids = []
+    stale_sources = set()
+
+    for source in touched:
+        path = current.get(source)
+        doc_id = get_stable_doc_id(path) if path is not None else None
+
+        if doc_id == indexed.get(source):
+            continue
+
+        stale_sources.add(source)
+        if path is not None:
+            changed_ids.append((doc_id, path))
+
+    unchanged_ids = {
+        doc_id for source, doc_id in indexed.items()
+        if source not in stale_sources
+    }
+
+    return changed_ids, unchanged_ids
@@ -0,0 +1,79 @@
+import gzip
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+
+from rag_notes_helper.core.config import get_settings
+
+
+class LineStore:
+    """ normalized line stream of each document, one gzip file per doc_id """
+
+    def __init__(self, root: Path | None = None) -> None:
+        settings = get_settings()
+        # shared by every index profile, notes are read and split once
+        self.root = root or settings.lines_dir or settings.storage_dir / "lines"
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, doc_id: str) -> Path:
+        return self.root / f"{doc_id}.gz"
+
+    def has(self, doc_id: str) -> bool:
+        return self._path(doc_id).exists()
+
+    def doc_ids(self) -> set[str]:
+        return {p.name.removesuffix(".gz") for p in self.root.glob("*.gz")}
+
+    def tee(
+        self,
+        doc_id: str,
+        source: str,
+        lines: Iterable[str],
+    ) -> Iterator[str]:
+        """ yield lines unchanged while persisting them for doc_id """
+
+        # doc_id is a content hash, stored lines are still valid
+        if self.has(doc_id):
+            yield from lines
+            return
+
+        path = self._path(doc_id)
+        tmp_path = path.with_name(path.name + ".tmp")
+        completed = False
+
+        try :
+            with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+                # first line keeps the source for re-chunking
+                f.write(source + "\n")
+                for line in lines:
+                    f.write(line + "\n")
+                    yield line
+
+            completed = True
+            tmp_path.replace(path)
+
+        finally:
+            if not completed:
+                tmp_path.unlink(missing_ok=True)
+
+    def read(self, doc_id: str) -> tuple[str, Iterator[str]]:
+        """ return (source, lines) of doc_id """
+        path = self._path(doc_id)
+
+        if not path.exists():
+            raise FileNotFoundError(f"Lines of {doc_id} not found")
+
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            source = f.readline().rstrip("\n")
+
+        def iter_lines() -> Iterator[str]:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                f.readline()
+                for line in f:
+                    yield line.rstrip("\n")
+
+        return source, iter_lines()
+
+    def prune(self, keep: set[str]) -> None:
+        """ remove lines of documents not in keep """
+        for doc_id in self.doc_ids() - keep:
+            self._path(doc_id).unlink(missing_ok=True)
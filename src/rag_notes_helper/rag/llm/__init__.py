@@ -1,17 +1,7 @@
-def get_llm():
+def _build_llm(provider: str, **kws):
     from rag_notes_helper.core.config import get_settings
     settings = get_settings()
 
-    provider = settings.llm.provider
-
-    kws = {
-        "model": settings.llm.model,
-        "api_key": settings.llm.api_key_str,
-        "max_tokens": settings.llm.max_tokens,
-        "temperature": settings.llm.temperature,
-        "line_width": settings.line_width,
-    }
-
     if provider == "hf":
         from rag_notes_helper.rag.llm.hf_api import HuggingFaceLLM
         return HuggingFaceLLM(**kws)
@@ -26,8 +16,44 @@ def get_llm():
 
     elif provider == "ollama":
         from rag_notes_helper.rag.llm.ollama_api import OllamaLLM
-        return OllamaLLM(base_url=settings.ollama_base_url, **kws)
+        return OllamaLLM(
+            base_url=settings.ollama_base_url,
+            keep_alive=settings.llm.keep_alive,
+            num_ctx=settings.llm.num_ctx,
+            num_thread=settings.llm.num_thread,
+            **kws,
+        )
+
+    raise ValueError(f"Unknown LLM_PROVIDER: {provider}")
 
-    raise ValueError(f"Unknown LLM_PROVIDER: {settings.llm.provider}")
 
+def get_llm():
+    from rag_notes_helper.core.config import get_settings
+    settings = get_settings()
+
+    kws = {
+        "max_tokens": settings.llm.max_tokens,
+        "temperature": settings.llm.temperature,
+        "line_width": settings.line_width,
+        "timeout": settings.llm.timeout,
+    }
 
+    llm = _build_llm(
+        settings.llm.provider,
+        model=settings.llm.model,
+        api_key=settings.llm.api_key_str,
+        **kws,
+    )
+
+    if settings.llm.hedge_provider is None:
+        return llm
+
+    from rag_notes_helper.rag.llm.hedged import HedgedLLM
+    hedge = _build_llm(
+        settings.llm.hedge_provider,
+        model=settings.llm.hedge_model,
+        api_key=settings.llm.hedge_api_key_str,
+        **kws,
+    )
+
+    return HedgedLLM(llm, hedge, hedge_after=settings.llm.hedge_after)
@@ -1,8 +1,12 @@
 from typing import Any
 from typing import Iterator
 import textwrap
+import time
 from abc import ABC, abstractmethod
 
+from rag_notes_helper.utils.metrics import get_metrics
+from rag_notes_helper.utils.timer import time_block
+
 
 class BaseLLM(ABC):
     def __init__(
@@ -12,12 +16,14 @@ class BaseLLM(ABC):
         max_tokens: int = 1024,
         temperature: float = 0.3,
         line_width: int = 80,
+        timeout: float = 120,
     ):
         self.model = model
         self.api_key = api_key
         self.max_tokens = max_tokens
         self.temperature = temperature
         self.line_width = line_width
+        self.timeout = timeout
 
 
     @abstractmethod
@@ -36,7 +42,10 @@ class BaseLLM(ABC):
     ) -> str:
         line_width = kws.get("line_width", self.line_width)
 
-        if not (content := self._generate(prompt, **kws)):
+        with time_block("llm_generate"):
+            content = self._generate(prompt, **kws)
+
+        if not content:
             return "LLM return empty response"
 
         paragraphs = content.splitlines()
@@ -45,6 +54,11 @@ class BaseLLM(ABC):
         return "\n".join(wrap_paragraphs)
 
 
+    def warm_up(self, prompt: list[dict[str, Any]]) -> None:
+        """ prepare the model for prompts starting with prompt, if supported """
+        return None
+
+
     @abstractmethod
     def _stream(
         self,
@@ -66,7 +80,16 @@ class BaseLLM(ABC):
         buffer = ""
         has_content = False
 
+        start = time.perf_counter()
+        first_token_at = None
+        n_chars = 0
+
         for char in self._stream(prompt, **kws):
+            if first_token_at is None:
+                first_token_at = time.perf_counter()
+                get_metrics().observe("llm_ttft", (first_token_at - start) * 1000)
+
+            n_chars += len(char)
             has_content = True
             if char == "\n":
                 yield buffer + "\n"
@@ -96,6 +119,18 @@ class BaseLLM(ABC):
             else :
                 yield buffer
 
+        if first_token_at is not None:
+            end = time.perf_counter()
+            get_metrics().observe("llm_stream", (end - start) * 1000)
+
+            # ~4 characters per token, providers stream text not token ids
+            if end > first_token_at:
+                get_metrics().observe(
+                    "llm_tokens_per_sec",
+                    n_chars / 4 / (end - first_token_at),
+                    unit="tokens/s",
+                )
+
         if not has_content:
             yield "LLM return empty response"
 
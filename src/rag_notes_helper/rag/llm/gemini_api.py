@@ -11,7 +11,11 @@ class GeminiLLM(BaseLLM):
     def __init__(self, **kws):
         model = kws.pop("model", "gemini-2.0-flash")
         super().__init__(model=model, **kws)
-        self.client = genai.Client(api_key=self.api_key)
+        self.client = genai.Client(
+            api_key=self.api_key,
+            # milliseconds
+            http_options=types.HttpOptions(timeout=int(self.timeout * 1000)),
+        )
 
 
     def _convert_prompt(self, prompt: list[dict[str, Any]]):
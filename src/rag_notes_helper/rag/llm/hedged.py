@@ -0,0 +1,152 @@
+import queue
+import threading
+import time
+from collections.abc import Iterator
+from typing import Any
+
+from rag_notes_helper.rag.llm.base import BaseLLM
+from rag_notes_helper.utils.logger import get_logger
+
+
+logger = get_logger("llm")
+
+
+class HedgedLLM(BaseLLM):
+    """
+    race a secondary LLM against the primary: the hedge starts when the
+    primary has no first token after hedge_after seconds, or has failed,
+    and the first backend to produce output is streamed, the other cancelled
+    """
+
+    def __init__(
+        self,
+        primary: BaseLLM,
+        secondary: BaseLLM,
+        *,
+        hedge_after: float = 3.0,
+    ) -> None:
+        super().__init__(
+            model=primary.model,
+            api_key=None,
+            max_tokens=primary.max_tokens,
+            temperature=primary.temperature,
+            line_width=primary.line_width,
+            timeout=primary.timeout,
+        )
+        self.backends = [primary, secondary]
+        self.hedge_after = hedge_after
+
+    def _name(self, i: int) -> str:
+        backend = self.backends[i]
+        return f"{type(backend).__name__}({backend.model})"
+
+    def _run(
+        self,
+        i: int,
+        prompt: list[dict[str, Any]],
+        events: queue.Queue,
+        cancel: threading.Event,
+        stream: bool,
+        kws: dict,
+    ) -> None:
+        backend = self.backends[i]
+
+        try :
+            if not stream:
+                events.put((i, "token", backend._generate(prompt, **kws)))
+                events.put((i, "done", None))
+                return
+
+            tokens = backend._stream(prompt, **kws)
+            try :
+                for token in tokens:
+                    if cancel.is_set():
+                        return
+                    events.put((i, "token", token))
+            finally :
+                tokens.close() # type: ignore
+
+            events.put((i, "done", None))
+
+        except Exception as e:
+            events.put((i, "error", e))
+
+    def _race(
+        self,
+        prompt: list[dict[str, Any]],
+        *,
+        stream: bool,
+        **kws,
+    ) -> Iterator[str]:
+        events: queue.Queue = queue.Queue()
+        cancels = [threading.Event() for _ in self.backends]
+        started: list[int] = []
+        failed: set[int] = set()
+        winner: int | None = None
+
+        def start(i: int) -> None:
+            started.append(i)
+            threading.Thread(
+                target=self._run,
+                args=(i, prompt, events, cancels[i], stream, kws),
+                name=f"llm-{i}",
+                daemon=True,
+            ).start()
+
+        start(0)
+        deadline = time.monotonic() + self.hedge_after
+
+        try :
+            while True:
+                hedge_pending = winner is None and len(started) < len(self.backends)
+                timeout = max(deadline - time.monotonic(), 0) if hedge_pending else None
+
+                try :
+                    i, kind, payload = events.get(timeout=timeout)
+                except queue.Empty:
+                    logger.info(f"hedging: no output after {self.hedge_after}s, starting {self._name(1)}")
+                    start(1)
+                    continue
+
+                if winner is not None and i != winner:
+                    continue
+
+                if kind == "error":
+                    # a winner failing mid answer cannot be replaced
+                    if winner is not None:
+                        raise payload
+
+                    logger.warning(f"{self._name(i)} failed: {payload}")
+                    failed.add(i)
+                    if len(failed) == len(self.backends):
+                        raise payload
+                    if len(started) < len(self.backends):
+                        start(1)
+                    continue
+
+                if winner is None:
+                    winner = i
+                    for j, cancel in enumerate(cancels):
+                        if j != i:
+                            cancel.set()
+
+                    logger.info(f"answer served by {self._name(i)}")
+
+                if kind == "done":
+                    return
+
+                yield payload
+
+        finally :
+            for cancel in cancels:
+                cancel.set()
+
+    def _generate(self, prompt: list[dict[str, Any]], **kws) -> str:
+        return "".join(self._race(prompt, stream=False, **kws))
+
+    def _stream(self, prompt: list[dict[str, Any]], **kws) -> Iterator[str]:
+        yield from self._race(prompt, stream=True, **kws)
+
+    def warm_up(self, prompt: list[dict[str, Any]]) -> None:
+        for backend in self.backends:
+            backend.warm_up(prompt)
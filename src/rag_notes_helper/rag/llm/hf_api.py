@@ -12,7 +12,7 @@ class HuggingFaceLLM(BaseLLM):
         self.client = InferenceClient(
             provider="auto", # pick the best hardware avaliable on HF
             api_key=self.api_key,
-            timeout=120,
+            timeout=self.timeout,
         )
 
     def _generate(self, prompt: list[dict[str, Any]], **kws) -> str:
@@ -4,15 +4,70 @@ from typing import Any
 from collections.abc import Iterator
 
 from rag_notes_helper.rag.llm.base import BaseLLM
+from rag_notes_helper.utils.logger import get_logger
+from rag_notes_helper.utils.metrics import get_metrics
+
+
+logger = get_logger("latency")
+
+# one connection pool for every OllamaLLM, get_llm() builds a new one per call
+_session = requests.Session()
+
+
+def record_timings(body: dict[str, Any]) -> None:
+    """ Ollama's own durations (ns) from a final response, into metrics """
+    metrics = get_metrics()
+    parts = []
+
+    for key, name in [
+        ("load_duration", "ollama_load"),
+        ("prompt_eval_duration", "ollama_prompt_eval"),
+        ("eval_duration", "ollama_eval"),
+    ]:
+        if body.get(key) is None:
+            continue
+
+        ms = body[key] / 1e6
+        metrics.observe(name, ms)
+        parts.append(f"{key.removesuffix('_duration')}={ms:.2f} ms")
+
+    eval_count = body.get("eval_count")
+    eval_ns = body.get("eval_duration")
+    if eval_count and eval_ns:
+        metrics.observe(
+            "ollama_eval_tokens_per_sec",
+            eval_count / (eval_ns / 1e9),
+            unit="tokens/s",
+        )
+
+    if parts:
+        logger.info(
+            f"ollama {' '.join(parts)} "
+            f"prompt_tokens={body.get('prompt_eval_count', 0)} "
+            f"eval_tokens={eval_count or 0}"
+        )
 
 
 class OllamaLLM(BaseLLM):
-    def __init__(self, base_url: str = "http://localhost:11434", **kws) -> None:
+    def __init__(
+        self,
+        base_url: str = "http://localhost:11434",
+        *,
+        keep_alive: str | None = None,
+        num_ctx: int | None = None,
+        num_thread: int | None = None,
+        **kws,
+    ) -> None:
         super().__init__(**kws)
         self.base_url = base_url.rstrip("/")
+        self.keep_alive = keep_alive
+        self.num_ctx = num_ctx
+        self.num_thread = num_thread
 
 
-    def _get_payload(self, prompt, *, stream=False):
+    def _get_payload(self, prompt, *, stream=False, **options):
+        # the static system prompt leads every request, so Ollama's KV cache
+        # reuses it while the model stays loaded (keep_alive)
         payload = {
             "model": self.model,
             "messages": prompt,
@@ -22,40 +77,80 @@ class OllamaLLM(BaseLLM):
                 "temperature": self.temperature,
             }
         }
+
+        if self.keep_alive is not None:
+            # bare numbers are seconds, Ollama rejects them as strings
+            keep_alive = self.keep_alive
+            payload["keep_alive"] = (
+                int(keep_alive) if keep_alive.lstrip("-").isdigit() else keep_alive
+            )
+        if self.num_ctx is not None:
+            payload["options"]["num_ctx"] = self.num_ctx
+        if self.num_thread is not None:
+            payload["options"]["num_thread"] = self.num_thread
+
+        payload["options"].update(options)
         return payload
 
 
     def _generate(self, prompt: list[dict[str, Any]], **kws) -> str:
         payload = self._get_payload(prompt)
 
-        response = requests.post(
+        response = _session.post(
             f"{self.base_url}/api/chat",
             json=payload,
-            timeout=120,
+            timeout=self.timeout,
         )
         response.raise_for_status()
 
-        content = response.json().get("message", {}).get("content", "")
+        body = response.json()
+        record_timings(body)
+
+        content = body.get("message", {}).get("content", "")
         return content or ""
 
 
     def _stream(self, prompt: list[dict[str, Any]], **kws) -> Iterator[str]:
         payload = self._get_payload(prompt, stream=True)
 
-        response = requests.post(
+        response = _session.post(
             f"{self.base_url}/api/chat",
             json=payload,
             stream=True,
-            timeout=120,
+            timeout=self.timeout,
         )
         response.raise_for_status()
 
-        for line in response.iter_lines():
-            if not line:
-                continue
+        # closing the generator early (e.g. a cancelled hedge) drops the connection
+        try :
+            for line in response.iter_lines():
+                if not line:
+                    continue
+
+                chunk = json.loads(line.decode("utf-8"))
+                if chunk.get("done"):
+                    record_timings(chunk)
+
+                text = chunk.get("message", {}).get("content", "")
+
+                for char in text:
+                    yield char
+        finally :
+            response.close()
+
 
-            chunk = json.loads(line.decode("utf-8"))
-            text = chunk.get("message", {}).get("content", "")
+    def warm_up(self, prompt: list[dict[str, Any]]) -> None:
+        """ load the model and evaluate the prompt prefix into its KV cache """
+        payload = self._get_payload(prompt, num_predict=1)
 
-            for char in text:
-                yield char
+        try :
+            response = _session.post(
+                f"{self.base_url}/api/chat",
+                json=payload,
+                timeout=self.timeout,
+            )
+            response.raise_for_status()
+            # kept out of the metrics, it is not a user request
+            logger.info(f"ollama warm up done: {self.model}")
+        except requests.RequestException as e:
+            logger.warning(f"ollama warm up failed: {e}")
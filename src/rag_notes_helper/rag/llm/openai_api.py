@@ -11,7 +11,7 @@ class OpenAILLM(BaseLLM):
         super().__init__(**kws)
         self.client = OpenAI(
             api_key=self.api_key,
-            timeout=120
+            timeout=self.timeout
         )
 
 
@@ -1,23 +1,58 @@
+from __future__ import annotations
+
 from collections.abc import Iterator
 from pathlib import Path
+from typing import TYPE_CHECKING
 
 import pymupdf
 
-from rag_notes_helper.rag.chunking import Chunk, chunk_lines
+from rag_notes_helper.rag.chunking import Chunk, chunk_document, chunk_lines
+
+if TYPE_CHECKING:
+    from rag_notes_helper.rag.line_store import LineStore
+
+
+def iter_pdf_lines(path: Path) -> Iterator[str]:
+    with pymupdf.open(path) as doc:
+        for page in doc:
+            for line in str(page.get_text()).splitlines():
+                line = line.strip()
+                if line:
+                    yield line
+
+
+def iter_text_lines(path: Path) -> Iterator[str]:
+    with path.open("r", encoding="utf-8", errors="ignore") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield line
+
+
+def iter_code_lines(path: Path) -> Iterator[str]:
+    # keep indentation, python chunking parses the line stream
+    with path.open("r", encoding="utf-8", errors="ignore") as f:
+        for line in f:
+            line = line.rstrip()
+            if line:
+                yield line
+
+
+def iter_file_lines(path: Path) -> Iterator[str]:
+    suffix = path.suffix.lower()
+
+    if suffix == ".pdf":
+        return iter_pdf_lines(path)
+
+    if suffix == ".py":
+        return iter_code_lines(path)
+
+    return iter_text_lines(path)
 
 
 def load_pdf_file(path: Path, doc_id: str, source: str, **kws) -> Iterator[Chunk]:
-    def iter_pdf_text(path: Path) -> Iterator[str]:
-        with pymupdf.open(path) as doc:
-            for page in doc:
-                for line in str(page.get_text()).splitlines():
-                    line = line.strip()
-                    if line:
-                        yield line
-
-    lines = iter_pdf_text(path)
     yield from chunk_lines(
-        lines=lines,
+        lines=iter_pdf_lines(path),
         doc_id=doc_id,
         source=source,
         **kws,
@@ -25,10 +60,31 @@ def load_pdf_file(path: Path, doc_id: str, source: str, **kws) -> Iterator[Chunk
 
 
 def load_text_file(path: Path, doc_id: str, source: str, **kws) -> Iterator[Chunk]:
-    with path.open("r", encoding="utf-8", errors="ignore") as f:
-        yield from chunk_lines(
-            lines=(line.strip() for line in f if line.strip()),
-            doc_id=doc_id,
-            source=source,
-            **kws,
-        )
+    yield from chunk_document(
+        lines=iter_file_lines(path),
+        doc_id=doc_id,
+        source=source,
+        **kws,
+    )
+
+
+def load_file(
+    path: Path,
+    doc_id: str,
+    source: str,
+    *,
+    line_store: LineStore | None = None,
+    **kws,
+) -> Iterator[Chunk]:
+    """ chunk any supported file, optionally persisting its line stream """
+    lines = iter_file_lines(path)
+
+    if line_store is not None:
+        lines = line_store.tee(doc_id, source, lines)
+
+    yield from chunk_document(
+        lines=lines,
+        doc_id=doc_id,
+        source=source,
+        **kws,
+    )
@@ -1,72 +1,185 @@
 import json
-import struct
+import threading
+from collections import OrderedDict
+from collections.abc import Iterable, Iterator
 from pathlib import Path
 
-from rag_notes_helper.core.config import get_settings
+from rag_notes_helper.rag.generations import current_generation
+from rag_notes_helper.rag.records import open_reader
 from rag_notes_helper.utils.timer import deco_time_block, time_block
 
 class MetaStore:
-    def __init__(self, storage_dir: Path | None = None):
-        storage_dir = storage_dir or get_settings().storage_dir
+    def __init__(
+        self,
+        storage_dir: Path | None = None,
+        *,
+        cache_size: int = 1024,
+    ):
+        # pinned to one generation, pass rag.path to match a loaded index
+        storage_dir = storage_dir or current_generation()
+        if storage_dir is None:
+            raise FileNotFoundError("Index not found")
 
         with time_block("init MetaStore"):
-            self.meta_f = (storage_dir / "meta.jsonl").open("rb")
-            self.idx_f = (storage_dir / "meta.idx").open("rb")
-
-        self._unpacker = struct.Struct("Q")
-        self.sources_cache = None
+            # plain meta.jsonl or compressed blocks, as the build wrote them
+            self.records = open_reader(storage_dir)
+
+        # get() seeks shared file handles, serialize concurrent readers
+        self._lock = threading.Lock()
+        # faiss_id -> record, recently served or prefetched
+        self._cache: OrderedDict[int, dict] = OrderedDict()
+        self._cache_size = cache_size
+
+        self._chunks_path = storage_dir / "meta.chunks.json"
+        self._chunk_positions: dict[str, list[int]] | None = None
+        self._catalog_path = storage_dir / "meta.docs.json"
+        self._catalog: dict[str, dict] | None = None
+
+        # faiss_id -> chunks deduplicated into that vector
+        self.duplicates: dict[int, list[dict]] = {}
+        dups_path = storage_dir / "meta.dups.json"
+        if dups_path.exists():
+            with dups_path.open("r", encoding="utf-8") as f:
+                self.duplicates = {int(k): v for k, v in json.load(f).items()}
+
+    def _read(self, faiss_id: int) -> dict:
+        return json.loads(self.records.read(faiss_id).decode("utf-8"))
+
+    def _cache_put(self, faiss_id: int, record: dict) -> None:
+        self._cache[faiss_id] = record
+        if len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
 
     def get(self, faiss_id: int) -> dict:
-            self.idx_f.seek(faiss_id * 8)
-            raw = self.idx_f.read(8)
-
-            if len(raw) != 8:
-                raise IndexError(f"Invalid faiss_id: {faiss_id}")
-
-            offset = self._unpacker.unpack(raw)[0]
-            self.meta_f.seek(offset)
-            return json.loads(self.meta_f.readline().decode("utf-8"))
-
+        with self._lock:
+            record = self._cache.get(faiss_id)
+
+            if record is None:
+                record = self._read(faiss_id)
+                self._cache_put(faiss_id, record)
+            else :
+                self._cache.move_to_end(faiss_id)
+
+        # callers annotate records, never hand out the cached dict
+        record = dict(record)
+
+        if faiss_id in self.duplicates:
+            record["duplicates"] = [
+                dict(d) for d in self.duplicates[faiss_id]
+            ]
+
+        return record
+
+    def prefetch(self, faiss_ids: Iterable[int]) -> int:
+        """ warm the record cache in file order, returns records read """
+        n_read = 0
+
+        for faiss_id in sorted(set(faiss_ids)):
+            with self._lock:
+                if faiss_id in self._cache:
+                    continue
+
+                self._cache_put(faiss_id, self._read(faiss_id))
+                n_read += 1
+
+        return n_read
+
+    @property
+    def chunk_positions(self) -> dict[str, list[int]]:
+        """ doc_id -> faiss_id of each chunk_id """
+        if self._chunk_positions is None:
+            if self._chunks_path.exists():
+                with self._chunks_path.open("r", encoding="utf-8") as f:
+                    self._chunk_positions = json.load(f)
+            else :
+                self._chunk_positions = {}
+
+        return self._chunk_positions
+
+    def get_chunk(self, doc_id: str, chunk_id: int) -> dict | None:
+        """ record of (doc_id, chunk_id), None if it does not exist """
+        positions = self.chunk_positions.get(doc_id, [])
+
+        if not 0 <= chunk_id < len(positions) or positions[chunk_id] < 0:
+            return None
+
+        record = self.get(positions[chunk_id])
+
+        # a deduplicated chunk is served by its cluster's record
+        for member in [record, *record.pop("duplicates", [])]:
+            if member["doc_id"] == doc_id and member["chunk_id"] == chunk_id:
+                return member
+
+        return None
+
+    def iter_records(self) -> Iterator[dict]:
+        """ yield every record in faiss_id order """
+        for line in self.records:
+            yield json.loads(line)
+
+    def _iter_members(self) -> Iterator[dict]:
+        """ records plus the duplicated chunks folded into them """
+        yield from self.iter_records()
+
+        for members in self.duplicates.values():
+            yield from members
+
+    def _scan_catalog(self) -> dict[str, dict]:
+        """ catalog of generations written before meta.docs.json """
+        catalog: dict[str, dict] = {}
+
+        def track(faiss_id: int, member: dict) -> None:
+            entry = catalog.setdefault(member["source"], {
+                "doc_id": member["doc_id"],
+                "chunks": 0,
+                "first_id": faiss_id,
+                "last_id": faiss_id,
+                "size": None,
+                "indexed_at": None,
+            })
+            entry["chunks"] = max(entry["chunks"], member["chunk_id"] + 1)
+            entry["first_id"] = min(entry["first_id"], faiss_id)
+            entry["last_id"] = max(entry["last_id"], faiss_id)
+
+        for faiss_id, record in enumerate(self.iter_records()):
+            track(faiss_id, record)
+
+        for faiss_id, members in self.duplicates.items():
+            for member in members:
+                track(faiss_id, member)
+
+        return catalog
+
+    @property
+    def catalog(self) -> dict[str, dict]:
+        """
+        source -> doc_id, chunk count, faiss_id range, file size and index
+        time of every indexed note, one entry per document instead of a scan
+        """
+        if self._catalog is None:
+            if self._catalog_path.exists():
+                with self._catalog_path.open("r", encoding="utf-8") as f:
+                    self._catalog = json.load(f)
+            else :
+                self._catalog = self._scan_catalog()
+
+        return self._catalog # type: ignore
 
     @deco_time_block
     def list_indexed_sources(self) -> list[str]:
-        if self.sources_cache is not None:
-            return self.sources_cache
-
-        sources = set()
-        position = self.meta_f.tell()
-        try :
-            self.meta_f.seek(0)
-            for line in self.meta_f:
-                record = json.loads(line)
-                sources.add(record["source"])
-
-            self.sources_cache = sorted(sources)
-
-        finally:
-            self.meta_f.seek(position)
-
-        return self.sources_cache
+        return sorted(self.catalog)
 
     @deco_time_block
     def get_all_doc_id(self) -> set[str]:
-        doc_ids = set()
-        position = self.meta_f.tell()
-        try :
-            self.meta_f.seek(0)
-            for line in self.meta_f:
-                record = json.loads(line)
-                doc_ids.add(record["doc_id"])
-
-        finally:
-            self.meta_f.seek(position)
+        return {entry["doc_id"] for entry in self.catalog.values()}
 
-        return doc_ids
+    def get_doc_sources(self) -> dict[str, str]:
+        """ source path -> doc_id of every indexed note """
+        return {source: entry["doc_id"] for source, entry in self.catalog.items()}
 
     def close(self) -> None:
         with time_block("MetaStore close"):
-            self.meta_f.close()
-            self.idx_f.close()
+            self.records.close()
 
     def __enter__(self):
         return self
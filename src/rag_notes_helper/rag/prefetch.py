@@ -0,0 +1,97 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import numpy as np
+
+from rag_notes_helper.core.config import get_settings
+from rag_notes_helper.rag.index import RagIndex
+from rag_notes_helper.rag.meta_store import MetaStore
+from rag_notes_helper.utils.logger import get_logger
+from rag_notes_helper.utils.timer import time_block
+
+
+logger = get_logger("prefetch")
+
+
+class Prefetcher:
+    """ speculative retrieval work done between REPL turns """
+
+    def __init__(
+        self,
+        rag: RagIndex,
+        meta_store: MetaStore,
+        *,
+        radius: int | None = None,
+        max_queries: int = 64,
+    ) -> None:
+        self.rag = rag
+        self.meta_store = meta_store
+        self.radius = get_settings().prefetch_radius if radius is None else radius
+
+        # query embeddings never wait behind neighbor warming, each has
+        # its own worker
+        self._executor = ThreadPoolExecutor(
+            max_workers=1,
+            thread_name_prefix="prefetch",
+        )
+        self._warm_executor = ThreadPoolExecutor(
+            max_workers=1,
+            thread_name_prefix="prefetch-warm",
+        )
+        self._embeddings: OrderedDict[str, Future] = OrderedDict()
+        self._max_queries = max_queries
+        # embed is called from the query reader thread too
+        self._lock = threading.Lock()
+
+    def _encode(self, query: str) -> np.ndarray:
+        with time_block("embed_query"):
+            return self.rag.embed_model.encode(
+                [query],
+                normalize_embeddings=True,
+                convert_to_numpy=True,
+            ).astype("float32")
+
+    def embed(self, query: str) -> Future:
+        """ query embedding future, started once per distinct query """
+        with self._lock:
+            future = self._embeddings.get(query)
+
+            if future is None:
+                future = self._executor.submit(self._encode, query)
+                self._embeddings[query] = future
+                if len(self._embeddings) > self._max_queries:
+                    self._embeddings.popitem(last=False)
+            else :
+                self._embeddings.move_to_end(query)
+
+        return future
+
+    def neighbor_ids(self, hits: list[dict]) -> set[int]:
+        """ faiss_ids of chunks within radius of each hit in its document """
+        ids: set[int] = set()
+
+        for hit in hits:
+            positions = self.meta_store.chunk_positions.get(hit["doc_id"], [])
+            start = max(hit["chunk_id"] - self.radius, 0)
+            stop = min(hit["chunk_id"] + self.radius + 1, len(positions))
+
+            ids.update(p for p in positions[start:stop] if p >= 0)
+
+        return ids
+
+    def _warm(self, hits: list[dict]) -> int:
+        with time_block("prefetch_neighbors"):
+            n_read = self.meta_store.prefetch(self.neighbor_ids(hits))
+
+        logger.info(f"prefetched {n_read} records around {len(hits)} hits")
+        return n_read
+
+    def warm_neighbors(self, hits: list[dict]) -> Future:
+        """ load the records a follow-up question is likely to hit """
+        return self._warm_executor.submit(self._warm, hits)
+
+    def close(self) -> None:
+        """ finish pending work, the meta store must outlive this call """
+        self._warm_executor.shutdown(wait=True, cancel_futures=True)
+        self._executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,103 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from rag_notes_helper.core.config import DEFAULT_PROFILE, get_settings, use_profile
+from rag_notes_helper.rag.index import RagIndex, preload_index
+from rag_notes_helper.rag.meta_store import MetaStore
+from rag_notes_helper.rag.retrieval import retrieve
+from rag_notes_helper.utils.logger import get_logger
+from rag_notes_helper.utils.timer import time_block
+
+
+logger = get_logger("retrieval")
+
+# reciprocal rank fusion constant, damps the weight of the first ranks
+RRF_K = 60
+
+
+def resolve_profiles(names: list[str] | None) -> list[str]:
+    """ requested profile names, "all" is the default index and every profile """
+    if not names:
+        return [DEFAULT_PROFILE]
+
+    if "all" in names:
+        return [DEFAULT_PROFILE, *get_settings().profiles]
+
+    return list(dict.fromkeys(names))
+
+
+def fuse_hits(
+    ranked: dict[str, list[dict]],
+    top_k: int,
+    k: int = RRF_K,
+) -> list[dict]:
+    """
+    reciprocal rank fusion of the hit lists of several profiles, the same
+    chunk text found by several profiles is one hit with summed scores
+    """
+    fused: dict[tuple[str, str], dict] = {}
+
+    for name, hits in ranked.items():
+        for rank, hit in enumerate(hits):
+            key = (hit["source"], hit["text"])
+            entry = fused.get(key)
+
+            if entry is None:
+                entry = fused[key] = {**hit, "rrf": 0.0, "profiles": []}
+
+            entry["rrf"] += 1 / (k + rank + 1)
+            entry["profiles"].append(name)
+
+    return sorted(fused.values(), key=lambda h: -h["rrf"])[:top_k]
+
+
+class ProfileSet:
+    """ indexes of several profiles, queried in parallel and fused """
+
+    def __init__(self, names: list[str]) -> None:
+        self.members: dict[str, tuple[RagIndex, MetaStore]] = {}
+
+        # profiles are opened one after another, preload_index only starts
+        # the model and index reads, those then run in the background; a
+        # missing index is built here in turn, builds share the line store
+        for name in names:
+            with use_profile(name):
+                rag = preload_index()
+                self.members[name] = (rag, MetaStore(rag.path))
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=len(names),
+            thread_name_prefix="profile-search",
+        )
+
+    def _search(self, name: str, query: str, top_k: int) -> list[dict]:
+        rag, meta_store = self.members[name]
+
+        with use_profile(name):
+            return retrieve(rag, meta_store, query=query, top_k=top_k)
+
+    def retrieve(self, query: str, *, top_k: int | None = None) -> list[dict]:
+        top_k = top_k or get_settings().top_k
+
+        with time_block("fused_retrieve"):
+            futures = {
+                name: self._executor.submit(self._search, name, query, top_k)
+                for name in self.members
+            }
+            ranked = {name: future.result() for name, future in futures.items()}
+
+        logger.info(
+            "fused "
+            + ", ".join(f"{name}={len(hits)}" for name, hits in ranked.items())
+        )
+        return fuse_hits(ranked, top_k)
+
+    def close(self) -> None:
+        self._executor.shutdown()
+        for _, meta_store in self.members.values():
+            meta_store.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
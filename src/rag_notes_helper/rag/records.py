@@ -0,0 +1,249 @@
+import json
+import struct
+import zlib
+from collections import OrderedDict
+from collections.abc import Iterator
+from pathlib import Path
+
+import numpy as np
+
+from rag_notes_helper.utils.logger import get_logger
+
+
+logger = get_logger("index")
+
+# plain layout: one json line per record plus a uint64 offset per record
+RECORDS_FILE = "meta.jsonl"
+OFFSETS_FILE = "meta.idx"
+# block layout: compressed runs of block_records lines, the block index holds
+# the start of every block and the end of the last one
+BLOCKS_FILE = "meta.blocks"
+BLOCK_INDEX_FILE = "meta.bidx"
+BLOCKS_HEADER = "meta.blocks.json"
+
+
+def _codec(name: str):
+    """ (compress, decompress) of a block codec """
+    if name == "zstd":
+        try :
+            import zstandard
+        except ImportError:
+            raise ImportError(
+                "zstd compressed metadata needs the zstandard package "
+                "(pip install zstandard)"
+            )
+
+        return (
+            lambda data: zstandard.ZstdCompressor(level=9).compress(data),
+            lambda data: zstandard.ZstdDecompressor().decompress(data),
+        )
+
+    if name == "zlib":
+        return (lambda data: zlib.compress(data, 9), zlib.decompress)
+
+    raise ValueError(f"Unknown metadata codec: {name}")
+
+
+def _split_lines(data: bytes, offsets: np.ndarray) -> list[bytes]:
+    bounds = [*offsets.tolist(), len(data)]
+    return [data[a:b] for a, b in zip(bounds, bounds[1:])]
+
+
+class RecordWriter:
+    """ meta.jsonl lines with their offsets in meta.idx """
+
+    def __init__(self, storage: Path) -> None:
+        self.meta_f = (storage / RECORDS_FILE).open("wb")
+        self.idx_f = (storage / OFFSETS_FILE).open("wb")
+        self.packer = struct.Struct("Q")
+
+    def append(self, line: bytes) -> None:
+        self.idx_f.write(self.packer.pack(self.meta_f.tell()))
+        self.meta_f.write(line)
+
+    def extend(self, lines: list[bytes], offsets: np.ndarray) -> None:
+        """ lines holding several records, offsets relative to the first """
+        base = self.meta_f.tell()
+        for line in lines:
+            self.meta_f.write(line)
+
+        self.idx_f.write((offsets + base).astype(np.uint64).tobytes())
+
+    def close(self) -> None:
+        self.meta_f.close()
+        self.idx_f.close()
+
+
+class BlockRecordWriter:
+    """ records compressed in blocks, decompressed one block per lookup """
+
+    def __init__(
+        self,
+        storage: Path,
+        *,
+        codec: str = "zlib",
+        block_records: int = 64,
+    ) -> None:
+        if codec == "zstd":
+            try :
+                _codec(codec)
+            except ImportError as e:
+                logger.warning(f"{e}, compressing metadata with zlib")
+                codec = "zlib"
+
+        self.storage = storage
+        self.codec = codec
+        self.block_records = block_records
+        self._compress = _codec(codec)[0]
+
+        self.blocks_f = (storage / BLOCKS_FILE).open("wb")
+        self.block_offsets: list[int] = []
+        self.block: list[bytes] = []
+        self.n_records = 0
+        self.raw_bytes = 0
+
+    def _flush(self) -> None:
+        if not self.block:
+            return
+
+        self.block_offsets.append(self.blocks_f.tell())
+        self.blocks_f.write(self._compress(b"".join(self.block)))
+        self.block.clear()
+
+    def append(self, line: bytes) -> None:
+        self.block.append(line)
+        self.n_records += 1
+        self.raw_bytes += len(line)
+
+        if len(self.block) >= self.block_records:
+            self._flush()
+
+    def extend(self, lines: list[bytes], offsets: np.ndarray) -> None:
+        for line in _split_lines(b"".join(lines), offsets):
+            self.append(line)
+
+    def close(self) -> None:
+        if self.blocks_f.closed:
+            return
+
+        self._flush()
+        self.block_offsets.append(self.blocks_f.tell())
+        self.blocks_f.close()
+
+        np.asarray(self.block_offsets, dtype=np.uint64).tofile(
+            self.storage / BLOCK_INDEX_FILE
+        )
+        with (self.storage / BLOCKS_HEADER).open("w", encoding="utf-8") as f:
+            json.dump({
+                "codec": self.codec,
+                "block_records": self.block_records,
+                "records": self.n_records,
+            }, f)
+
+        if self.raw_bytes:
+            logger.info(
+                f"metadata {self.raw_bytes} -> {self.block_offsets[-1]} bytes "
+                f"({self.codec}, {self.block_records} records per block)"
+            )
+
+
+def open_writer(
+    storage: Path,
+    compression: str = "none",
+    block_records: int = 64,
+) -> RecordWriter | BlockRecordWriter:
+    if compression == "none":
+        return RecordWriter(storage)
+
+    return BlockRecordWriter(
+        storage,
+        codec=compression,
+        block_records=block_records,
+    )
+
+
+class RecordReader:
+    """ random access to the json lines of meta.jsonl """
+
+    def __init__(self, storage: Path) -> None:
+        self.meta_path = storage / RECORDS_FILE
+        self.meta_f = self.meta_path.open("rb")
+        self.idx_f = (storage / OFFSETS_FILE).open("rb")
+        self._unpacker = struct.Struct("Q")
+
+    def read(self, faiss_id: int) -> bytes:
+        self.idx_f.seek(faiss_id * 8)
+        raw = self.idx_f.read(8)
+
+        if len(raw) != 8:
+            raise IndexError(f"Invalid faiss_id: {faiss_id}")
+
+        offset = self._unpacker.unpack(raw)[0]
+        self.meta_f.seek(offset)
+        return self.meta_f.readline()
+
+    def __iter__(self) -> Iterator[bytes]:
+        # own handle, read() may seek the shared one from another thread
+        with self.meta_path.open("rb") as f:
+            yield from f
+
+    def close(self) -> None:
+        self.meta_f.close()
+        self.idx_f.close()
+
+
+class BlockRecordReader:
+    """ random access to block compressed records, recent blocks are cached """
+
+    def __init__(self, storage: Path, *, cache_blocks: int = 8) -> None:
+        with (storage / BLOCKS_HEADER).open("r", encoding="utf-8") as f:
+            header = json.load(f)
+
+        self.blocks_path = storage / BLOCKS_FILE
+        self.blocks_f = self.blocks_path.open("rb")
+        self.block_records = header["block_records"]
+        self.n_records = header["records"]
+        self._decompress = _codec(header["codec"])[1]
+        self.block_offsets = np.fromfile(storage / BLOCK_INDEX_FILE, dtype=np.uint64)
+
+        self._blocks: OrderedDict[int, list[bytes]] = OrderedDict()
+        self._cache_blocks = cache_blocks
+
+    def _read_block(self, f, block_id: int) -> list[bytes]:
+        start = int(self.block_offsets[block_id])
+        f.seek(start)
+        data = self._decompress(f.read(int(self.block_offsets[block_id + 1]) - start))
+        return data.splitlines(keepends=True)
+
+    def read(self, faiss_id: int) -> bytes:
+        if not 0 <= faiss_id < self.n_records:
+            raise IndexError(f"Invalid faiss_id: {faiss_id}")
+
+        block_id, i = divmod(faiss_id, self.block_records)
+        block = self._blocks.get(block_id)
+
+        if block is None:
+            block = self._read_block(self.blocks_f, block_id)
+            self._blocks[block_id] = block
+            if len(self._blocks) > self._cache_blocks:
+                self._blocks.popitem(last=False)
+        else :
+            self._blocks.move_to_end(block_id)
+
+        return block[i]
+
+    def __iter__(self) -> Iterator[bytes]:
+        with self.blocks_path.open("rb") as f:
+            for block_id in range(len(self.block_offsets) - 1):
+                yield from self._read_block(f, block_id)
+
+    def close(self) -> None:
+        self.blocks_f.close()
+
+
+def open_reader(storage: Path) -> RecordReader | BlockRecordReader:
+    """ reader for whichever layout the generation was written with """
+    if (storage / BLOCKS_HEADER).exists():
+        return BlockRecordReader(storage)
+
+    return RecordReader(storage)
@@ -1,7 +1,11 @@
+import numpy as np
+
 from rag_notes_helper.core.config import get_settings
+from rag_notes_helper.rag.coarse import search_two_stage
+from rag_notes_helper.rag.context import merge_texts
 from rag_notes_helper.rag.index import RagIndex
 from rag_notes_helper.rag.meta_store import MetaStore
-from rag_notes_helper.utils.timer import deco_time_block
+from rag_notes_helper.utils.timer import deco_time_block, time_block
 
 @deco_time_block
 def retrieve(
@@ -10,19 +14,54 @@ def retrieve(
     *,
     query: str,
     top_k: int | None = None,
+    mmr: bool | None = None,
+    neighbors: int | None = None,
+    q_emb: np.ndarray | None = None,
 ) -> list[dict]:
+    """ q_emb, when given, is the query embedding computed ahead of time """
     settings = get_settings()
     top_k = top_k or settings.top_k
+    if neighbors is None:
+        neighbors = settings.retrieval_neighbors
+
+    if q_emb is None:
+        model = rag.embed_model
+
+        with time_block("embed_query"):
+            q_emb = model.encode(
+                [query],
+                normalize_embeddings=True,
+                convert_to_numpy=True,
+            ).astype("float32")
+
+    use_mmr = settings.mmr if mmr is None else mmr
+    fetch_k = max(settings.mmr_fetch_k, top_k) if use_mmr else top_k
 
-    model = rag.embed_model
+    coarse = rag.coarse if settings.coarse_dim else None
 
-    q_emb = model.encode(
-        [query],
-        normalize_embeddings=True,
-        convert_to_numpy=True,
-    ).astype("float32")
+    with time_block("faiss_search"):
+        if coarse is not None:
+            scores, indices = search_two_stage(
+                coarse,
+                rag.index,
+                q_emb,
+                fetch_k,
+                settings.coarse_candidates,
+            )
+        else :
+            scores, indices = rag.index.search(q_emb, fetch_k) # type: ignore
 
-    scores, indices = rag.index.search(q_emb, top_k) # type: ignore
+    if use_mmr:
+        with time_block("mmr_rerank"):
+            scores, indices = _mmr_rerank(
+                rag,
+                q_emb[0],
+                scores[0],
+                indices[0],
+                top_k=top_k,
+                lambda_=settings.mmr_lambda,
+                min_score=settings.min_retrieval_score,
+            )
 
     # max_score = scores[0][0]
     #
@@ -31,17 +70,105 @@ def retrieve(
     #     return []
 
     results: list[dict] = []
-    for score, idx in zip(scores[0], indices[0]):
+    with time_block("meta_fetch"):
+        for score, idx in zip(scores[0], indices[0]):
 
-        if idx < 0:
-            continue
+            if idx < 0:
+                continue
 
-        if score < settings.min_retrieval_score:
-            continue
+            if score < settings.min_retrieval_score:
+                continue
 
-        item = meta_store.get(idx)
-        item["score"] = float(score)
-        results.append(item)
+            item = meta_store.get(idx)
+            item["score"] = float(score)
+            results.append(item)
+
+        if neighbors:
+            _expand_neighbors(results, meta_store, neighbors)
 
     return results
 
+
+def _expand_neighbors(
+    hits: list[dict],
+    meta_store: MetaStore,
+    neighbors: int,
+) -> None:
+    """ extend each hit with adjacent chunks of its document, in place """
+    seen = {(h["doc_id"], h["chunk_id"]) for h in hits}
+
+    for hit in hits:
+        doc_id, chunk_id = hit["doc_id"], hit["chunk_id"]
+        text = hit["text"]
+        added = []
+
+        # stop at chunks already served by another hit
+        for step in [-1, 1]:
+            for offset in range(1, neighbors + 1):
+                key = (doc_id, chunk_id + step * offset)
+                if key in seen:
+                    break
+
+                record = meta_store.get_chunk(*key)
+                if record is None:
+                    break
+
+                seen.add(key)
+                added.append(key[1])
+                text = (
+                    merge_texts(record["text"], text)
+                    if step < 0 else merge_texts(text, record["text"])
+                )
+
+        hit["text"] = text
+        hit["neighbors"] = sorted(added)
+
+
+
+def mmr_select(
+    query: np.ndarray,
+    candidates: np.ndarray,
+    k: int,
+    lambda_: float = 0.5,
+) -> list[int]:
+    """ maximal marginal relevance order of the first k candidates """
+    relevance = candidates @ query
+    similarity = candidates @ candidates.T
+
+    selected: list[int] = []
+    # highest similarity of each candidate to the selected set
+    redundancy = np.zeros(len(candidates), dtype="float32")
+    available = np.ones(len(candidates), dtype=bool)
+
+    for _ in range(min(k, len(candidates))):
+        mmr_scores = lambda_ * relevance - (1 - lambda_) * redundancy
+        mmr_scores[~available] = -np.inf
+
+        best = int(np.argmax(mmr_scores))
+        selected.append(best)
+        available[best] = False
+        redundancy = np.maximum(redundancy, similarity[best])
+
+    return selected
+
+
+def _mmr_rerank(
+    rag: RagIndex,
+    q_emb: np.ndarray,
+    scores: np.ndarray,
+    indices: np.ndarray,
+    *,
+    top_k: int,
+    lambda_: float,
+    min_score: float,
+) -> tuple[np.ndarray, np.ndarray]:
+    keep = (indices >= 0) & (scores >= min_score)
+    scores, indices = scores[keep], indices[keep]
+
+    if len(indices) <= 1:
+        return scores[None, :], indices[None, :]
+
+    vectors = rag.index.reconstruct_batch(indices) # type: ignore
+    order = mmr_select(q_emb, vectors, top_k, lambda_)
+
+    return scores[order][None, :], indices[order][None, :]
@@ -0,0 +1,144 @@
+from collections import deque
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+from typing import Any
+
+from rag_notes_helper.core.config import get_settings
+from rag_notes_helper.rag.answer import (
+    SYSTEM_PROMPT,
+    format_user_prompt,
+    get_citations,
+)
+from rag_notes_helper.rag.context import build_context, estimate_tokens
+from rag_notes_helper.rag.llm import get_llm
+from rag_notes_helper.utils.logger import get_logger
+from rag_notes_helper.utils.timer import deco_time_block, time_block
+
+
+logger = get_logger("session")
+
+NO_NEW_CONTEXT = "[No New Context, use the context of earlier questions]"
+
+
+@dataclass
+class Turn:
+    user: str
+    answer: str = ""
+    # (doc_id, chunk_id) of the chunks first sent in this turn
+    chunk_keys: set[tuple[str, int]] = field(default_factory=set)
+
+    @property
+    def tokens(self) -> int:
+        return estimate_tokens(self.user) + estimate_tokens(self.answer)
+
+
+def _hit_keys(hit: dict) -> set[tuple[str, int]]:
+    doc_id = hit.get("doc_id", hit["source"])
+    return {(doc_id, c) for c in [hit["chunk_id"], *hit.get("neighbors", [])]}
+
+
+class ChatSession:
+    """
+    multi-turn conversation: each turn only sends chunks not already in
+    the transcript, and the transcript only grows at its end so provider
+    prompt caches keep the system prompt and earlier turns
+    """
+
+    def __init__(
+        self,
+        *,
+        max_turns: int | None = None,
+        history_tokens: int | None = None,
+    ) -> None:
+        settings = get_settings()
+        self.max_turns = max_turns or settings.llm.session_turns
+        self.history_tokens = history_tokens or settings.llm.session_tokens
+        self.turns: deque[Turn] = deque()
+
+    def reset(self) -> None:
+        self.turns.clear()
+
+    @property
+    def known_keys(self) -> set[tuple[str, int]]:
+        return set().union(*(t.chunk_keys for t in self.turns))
+
+    def _trim(self, incoming_tokens: int) -> None:
+        """ drop the oldest turns, their chunks are re-sent when retrieved again """
+        while self.turns and (
+            len(self.turns) >= self.max_turns
+            or sum(t.tokens for t in self.turns) + incoming_tokens > self.history_tokens
+        ):
+            dropped = self.turns.popleft()
+            logger.info(f"dropped turn with {len(dropped.chunk_keys)} chunks")
+
+    def messages(self, turn: Turn) -> list[dict[str, Any]]:
+        prompt = [{"role": "system", "content": SYSTEM_PROMPT}]
+
+        for past in self.turns:
+            prompt.append({"role": "user", "content": past.user})
+            prompt.append({"role": "assistant", "content": past.answer})
+
+        prompt.append({"role": "user", "content": turn.user})
+
+        return prompt
+
+    def _record(self, turn: Turn, answer: Iterator[str]) -> Iterator[str]:
+        parts: list[str] = []
+        try :
+            for part in answer:
+                parts.append(part)
+                yield part
+        finally :
+            turn.answer = "".join(parts)
+            self.turns.append(turn)
+
+    @deco_time_block
+    def ask(
+        self,
+        query: str,
+        *,
+        hits: list[dict],
+        stream: bool = False,
+    ) -> dict[str, Any]:
+        settings = get_settings()
+
+        with time_block("prompt_build"):
+            hits = hits[: settings.llm.max_chunks]
+            citations = get_citations(hits)
+
+            # room for a full context, then send only the unseen chunks
+            self._trim(estimate_tokens(query) + settings.llm.context_tokens)
+            known = self.known_keys
+            new_hits = [h for h in hits if not _hit_keys(h) <= known]
+
+            context = build_context(query, new_hits)
+            if not context.strip() and self.turns:
+                context = NO_NEW_CONTEXT
+
+            turn = Turn(
+                user=format_user_prompt(context, query),
+                chunk_keys=set().union(*(_hit_keys(h) for h in new_hits)),
+            )
+            prompt = self.messages(turn)
+
+        logger.info(
+            f"turn {len(self.turns) + 1}: reused {len(hits) - len(new_hits)} "
+            f"of {len(hits)} hits, {len(prompt)} messages"
+        )
+
+        llm = get_llm()
+
+        if stream:
+            answer = self._record(
+                turn,
+                llm.stream(prompt, line_width=settings.line_width),
+            )
+        else :
+            turn.answer = llm.generate(prompt, line_width=settings.line_width)
+            self.turns.append(turn)
+            answer = turn.answer
+
+        return {
+            "answer": answer,
+            "citations": citations,
+        }
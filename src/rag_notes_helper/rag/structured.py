@@ -0,0 +1,95 @@
+import sys
+import time
+from collections.abc import Callable
+
+from rag_notes_helper.rag.answer import rag_answer
+from rag_notes_helper.rag.index import RagIndex
+from rag_notes_helper.rag.meta_store import MetaStore
+from rag_notes_helper.rag.retrieval import retrieve
+from rag_notes_helper.utils.events import EventWriter
+from rag_notes_helper.utils.logger import get_logger
+from rag_notes_helper.utils.timer import time_block
+
+
+logger = get_logger("cli")
+
+
+def _hit_event(hit: dict) -> dict:
+    event = {
+        "source": hit["source"],
+        "doc_id": hit["doc_id"],
+        "chunk_id": hit["chunk_id"],
+        "score": hit["score"],
+        "text": hit["text"],
+        "duplicates": [
+            {"source": d["source"], "chunk_id": d["chunk_id"]}
+            for d in hit.get("duplicates", [])
+        ],
+    }
+
+    if "profiles" in hit:
+        event["profiles"] = hit["profiles"]
+        event["rrf"] = hit["rrf"]
+
+    return event
+
+
+def run_structured(
+    rag: RagIndex | None,
+    meta_store: MetaStore | None,
+    events: EventWriter,
+    *,
+    query: str,
+    search: Callable[[str], list[dict]] | None = None,
+) -> bool:
+    """
+    one query as events: retrieval, token deltas, answer, timings;
+    search replaces retrieval from rag, e.g. fused profiles
+    """
+    start = time.perf_counter()
+    timings: dict[str, float] = {}
+
+    def elapsed_ms() -> float:
+        return round((time.perf_counter() - start) * 1000, 2)
+
+    try :
+        with time_block("total"):
+            hits = (
+                search(query) if search
+                else retrieve(rag, meta_store, query=query) # type: ignore
+            )
+            timings["retrieve_ms"] = elapsed_ms()
+            events.emit("retrieval", query=query, hits=[_hit_event(h) for h in hits])
+
+            # unwrapped text, line breaks are left to the consumer
+            result = rag_answer(
+                query,
+                hits=hits,
+                stream=events.ndjson,
+                line_width=sys.maxsize,
+            )
+
+            if events.ndjson:
+                parts = []
+                for delta in result["answer"]:
+                    if not parts:
+                        timings["first_token_ms"] = elapsed_ms()
+                    parts.append(delta)
+                    events.emit("token", text=delta)
+                answer = "".join(parts)
+            else :
+                answer = result["answer"]
+
+            events.emit("answer", answer=answer, citations=result["citations"])
+
+    except Exception as e:
+        logger.warning(f"[structured] failed: {e}")
+        events.emit("error", error=f"{type(e).__name__}: {e}")
+        return False
+
+    finally :
+        timings["total_ms"] = elapsed_ms()
+        events.emit("timings", timings=timings)
+        events.close()
+
+    return True
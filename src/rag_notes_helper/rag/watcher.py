@@ -0,0 +1,281 @@
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import stat
+import struct
+import sys
+import contextvars
+import threading
+import time
+from collections.abc import Callable
+from pathlib import Path
+from typing import Literal
+
+from rag_notes_helper.core.config import get_settings
+from rag_notes_helper.rag.generations import current_generation
+from rag_notes_helper.rag.index import RagIndex, update_index
+from rag_notes_helper.rag.ingest import is_supported_file
+from rag_notes_helper.utils.logger import get_logger
+from rag_notes_helper.utils.timer import time_block
+
+
+logger = get_logger("watcher")
+
+# inotify(7) event bits
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+# close-write instead of modify: one event per save, not per write()
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+_EVENT = struct.Struct("iIII")
+
+# longest a backend blocks before the loop checks for close()
+_TICK = 0.5
+
+
+class _Inotify:
+    """ recursive inotify watch of a directory tree through libc """
+
+    def __init__(self, root: Path) -> None:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        self.root = root
+        self.dirs: dict[int, Path] = {}
+        self.watch_tree(root)
+
+    def watch_tree(self, root: Path) -> None:
+        for path in [root, *(p for p in root.rglob("*") if p.is_dir())]:
+            wd = self._add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+
+            if wd < 0:
+                err = ctypes.get_errno()
+                # removed again before it could be watched
+                if err == errno.ENOENT:
+                    continue
+                # ENOSPC: fs.inotify.max_user_watches is exhausted
+                raise OSError(err, f"cannot watch {path}: {os.strerror(err)}")
+
+            # a directory moved inside the tree keeps its wd, re-key its path
+            self.dirs[wd] = path
+
+    def read(self, timeout: float) -> set[Path]:
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+
+        data = os.read(self.fd, 64 * 1024)
+        paths: set[Path] = set()
+        offset = 0
+
+        while offset < len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, offset)
+            name = data[offset + _EVENT.size : offset + _EVENT.size + length]
+            offset += _EVENT.size + length
+
+            if mask & IN_Q_OVERFLOW:
+                # the kernel dropped events, check the whole tree
+                paths.add(self.root)
+                continue
+
+            if mask & IN_IGNORED:
+                self.dirs.pop(wd, None)
+                continue
+
+            parent = self.dirs.get(wd)
+            name = name.rstrip(b"\0")
+            if parent is None or not name:
+                continue
+
+            path = parent / os.fsdecode(name)
+
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    self.watch_tree(path)
+                paths.add(path)
+
+            elif is_supported_file(path):
+                paths.add(path)
+
+        return paths
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class _Polling:
+    """ stat-only rescan of the tree every interval, no file is read or hashed """
+
+    def __init__(self, root: Path, interval: float) -> None:
+        self.root = root
+        self.interval = interval
+        self.snapshot = self._scan()
+        self.next_scan = time.monotonic() + interval
+
+    def _scan(self) -> dict[Path, tuple[int, int]]:
+        snapshot = {}
+
+        for path in self.root.rglob("*"):
+            if not is_supported_file(path):
+                continue
+
+            try :
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+
+            if stat.S_ISREG(st.st_mode):
+                snapshot[path] = (st.st_mtime_ns, st.st_size)
+
+        return snapshot
+
+    def read(self, timeout: float) -> set[Path]:
+        time.sleep(max(min(timeout, self.next_scan - time.monotonic()), 0))
+        if time.monotonic() < self.next_scan:
+            return set()
+
+        old, self.snapshot = self.snapshot, self._scan()
+        self.next_scan = time.monotonic() + self.interval
+
+        changed = {p for p, sig in self.snapshot.items() if old.get(p) != sig}
+        return changed | (old.keys() - self.snapshot.keys())
+
+    def close(self) -> None:
+        pass
+
+
+class NoteWatcher:
+    """
+    watch notes_dir on a daemon thread and hand each burst of changed paths
+    to on_change once no new event arrived for debounce seconds
+    """
+
+    def __init__(
+        self,
+        on_change: Callable[[list[Path]], None],
+        notes_dir: Path | None = None,
+        *,
+        debounce: float | None = None,
+        poll_interval: float | None = None,
+        backend: Literal["auto", "inotify", "polling"] = "auto",
+    ) -> None:
+        settings = get_settings()
+        self.notes_dir = notes_dir or settings.notes_dir
+        self.debounce = settings.watch_debounce if debounce is None else debounce
+        self.on_change = on_change
+
+        poll_interval = poll_interval or settings.watch_poll_interval
+        self._backend = self._open_backend(backend, poll_interval)
+        logger.info(f"watching {self.notes_dir} with {self.backend}")
+
+        self._stop = threading.Event()
+        # updates go to the index profile the watcher was started in
+        self._thread = threading.Thread(
+            target=contextvars.copy_context().run,
+            args=(self._loop,),
+            name="note-watcher",
+            daemon=True,
+        )
+        self._thread.start()
+
+    @property
+    def backend(self) -> str:
+        return "inotify" if isinstance(self._backend, _Inotify) else "polling"
+
+    def _open_backend(self, backend: str, poll_interval: float):
+        if backend != "polling" and sys.platform.startswith("linux"):
+            try :
+                return _Inotify(self.notes_dir)
+            except (OSError, AttributeError) as e:
+                if backend == "inotify":
+                    raise
+                logger.warning(f"inotify unavailable ({e}), polling instead")
+
+        elif backend == "inotify":
+            raise OSError(f"inotify is not available on {sys.platform}")
+
+        return _Polling(self.notes_dir, poll_interval)
+
+    def _loop(self) -> None:
+        pending: set[Path] = set()
+        last_event = 0.0
+
+        while not self._stop.is_set():
+            quiet_left = last_event + self.debounce - time.monotonic()
+            paths = self._backend.read(
+                min(max(quiet_left, 0), _TICK) if pending else _TICK
+            )
+
+            if paths:
+                # a burst of saves keeps pushing the update back
+                pending |= paths
+                last_event = time.monotonic()
+                continue
+
+            if pending and time.monotonic() - last_event >= self.debounce:
+                batch = sorted(pending)
+                pending.clear()
+
+                try :
+                    self.on_change(batch)
+                except Exception as e:
+                    logger.warning(f"watch update failed: {e}")
+
+    def close(self) -> None:
+        self._stop.set()
+        self._thread.join()
+        self._backend.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class IndexWatcher:
+    """ keeps the index fresh in the background, take() hands out new builds """
+
+    def __init__(self, **kws) -> None:
+        self._latest: RagIndex | None = None
+        self._lock = threading.Lock()
+        self.watcher = NoteWatcher(self._update, **kws)
+
+    def _update(self, paths: list[Path]) -> None:
+        with time_block("watch_update"):
+            rag = update_index(paths)
+
+        if rag is None:
+            return
+
+        logger.info(f"{len(paths)} changed paths applied, generation {rag.path.name}")
+        with self._lock:
+            self._latest = rag
+
+    def take(self) -> RagIndex | None:
+        """ the newest background build, unless another build replaced it since """
+        with self._lock:
+            rag, self._latest = self._latest, None
+
+        if rag is None or rag.path != current_generation():
+            return None
+
+        return rag
+
+    def close(self) -> None:
+        self.watcher.close()
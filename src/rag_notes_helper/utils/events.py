@@ -0,0 +1,32 @@
+import json
+import sys
+from typing import Any, TextIO
+
+
+class EventWriter:
+    """
+    machine readable output: ndjson writes one flushed line per event as it
+    happens, otherwise the events are merged into one json document on close
+    """
+
+    def __init__(self, stream: TextIO | None = None, *, ndjson: bool = True) -> None:
+        # bound now, callers may redirect sys.stdout for human output
+        self.stream = stream or sys.stdout
+        self.ndjson = ndjson
+        self.document: dict[str, Any] = {}
+
+    def emit(self, event: str, **fields: Any) -> None:
+        if self.ndjson:
+            self.stream.write(
+                json.dumps({"event": event, **fields}, ensure_ascii=False) + "\n"
+            )
+            self.stream.flush()
+
+        # deltas are folded into the final answer of the document
+        elif event != "token":
+            self.document.update(fields)
+
+    def close(self) -> None:
+        if not self.ndjson:
+            self.stream.write(json.dumps(self.document, ensure_ascii=False) + "\n")
+            self.stream.flush()
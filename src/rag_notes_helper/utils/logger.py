@@ -1,4 +1,5 @@
 import logging
+import tempfile
 from logging.handlers import RotatingFileHandler
 from pathlib import Path
 from pydantic import ValidationError
@@ -10,31 +11,58 @@ def _safe_logs_dir() -> Path:
     try :
         return get_settings().logs_dir
     except ValidationError:
-        fallback_log_path = Path.cwd() / "logs"
+        # invalid settings never write into whatever directory we run from
+        fallback_log_path = Path(tempfile.gettempdir()) / "rag_notes_helper" / "logs"
         fallback_log_path.mkdir(parents=True, exist_ok=True)
         return fallback_log_path
 
-def get_logger(name: str) -> logging.Logger:
-    logger = logging.getLogger(name)
-    logger.setLevel(logging.INFO)
 
-    if logger.handlers:
-        return logger
+class _LogsDirHandler(logging.Handler):
+    """
+    rag.log of the logs_dir configured when a record is emitted, modules
+    create their loggers at import time, before settings are final
+    """
 
-    log_path = _safe_logs_dir() / "rag.log"
+    def __init__(self) -> None:
+        super().__init__()
+        self._path: Path | None = None
+        self._file: RotatingFileHandler | None = None
 
-    handler = RotatingFileHandler(
-        log_path,
-        maxBytes=5_000_000,
-        backupCount=2,
-    )
+    def emit(self, record: logging.LogRecord) -> None:
+        path = _safe_logs_dir() / "rag.log"
 
-    formatter = logging.Formatter(
-        "%(asctime)s | %(levelname)s | %(name)s | %(message)s"
-    )
+        if path != self._path:
+            if self._file is not None:
+                self._file.close()
 
-    handler.setFormatter(formatter)
-    logger.addHandler(handler)
+            self._file = RotatingFileHandler(
+                path,
+                maxBytes=5_000_000,
+                backupCount=2,
+            )
+            self._file.setFormatter(self.formatter)
+            self._path = path
 
-    return logger
+        self._file.emit(record) # type: ignore
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+        super().close()
+
+
+# one file handle shared by every logger
+_handler = _LogsDirHandler()
+_handler.setFormatter(logging.Formatter(
+    "%(asctime)s | %(levelname)s | %(name)s | %(message)s"
+))
 
+
+def get_logger(name: str) -> logging.Logger:
+    logger = logging.getLogger(name)
+    logger.setLevel(logging.INFO)
+
+    if _handler not in logger.handlers:
+        logger.addHandler(_handler)
+
+    return logger
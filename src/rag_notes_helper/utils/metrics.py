@@ -0,0 +1,137 @@
+import bisect
+import math
+import threading
+
+from rag_notes_helper.utils.logger import _safe_logs_dir, get_logger
+
+
+LATENCY_BUCKETS_MS = (
+    1, 2.5, 5, 10, 25, 50, 100, 250, 500,
+    1_000, 2_500, 5_000, 10_000, 30_000, 60_000, 120_000,
+)
+RATE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1_000)
+
+
+class Histogram:
+    """ cumulative-bucket histogram, quantiles interpolated within buckets """
+
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS_MS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        if self.count == 0:
+            return math.nan
+
+        rank = q * self.count
+        seen = 0
+
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                lower = self.buckets[i - 1] if i > 0 else self.min
+                upper = self.buckets[i] if i < len(self.buckets) else self.max
+                lower, upper = max(lower, self.min), min(upper, self.max)
+                return lower + (upper - lower) * (rank - seen) / n
+
+            seen += n
+
+        return self.max
+
+
+class MetricsRegistry:
+    """ in-process histograms keyed by stage name """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.histograms: dict[str, Histogram] = {}
+        self.units: dict[str, str] = {}
+
+    def observe(self, name: str, value: float, unit: str = "ms") -> None:
+        with self._lock:
+            if name not in self.histograms:
+                buckets = LATENCY_BUCKETS_MS if unit == "ms" else RATE_BUCKETS
+                self.histograms[name] = Histogram(buckets)
+                self.units[name] = unit
+
+            self.histograms[name].observe(value)
+
+    def summary(self) -> str:
+        with self._lock:
+            lines = [
+                f"{'stage':<28}{'n':>6}{'mean':>11}{'p50':>11}"
+                f"{'p90':>11}{'p99':>11}  unit"
+            ]
+            for name, h in sorted(self.histograms.items()):
+                lines.append(
+                    f"{name:<28}{h.count:>6}{h.sum / h.count:>11.2f}"
+                    f"{h.quantile(0.5):>11.2f}{h.quantile(0.9):>11.2f}"
+                    f"{h.quantile(0.99):>11.2f}  {self.units[name]}"
+                )
+
+        return "\n".join(lines)
+
+    def to_prometheus(self, prefix: str = "rag") -> str:
+        """ Prometheus text exposition format """
+        out = []
+
+        with self._lock:
+            for unit in sorted(set(self.units.values())):
+                metric = (
+                    f"{prefix}_stage_latency_ms" if unit == "ms"
+                    else f"{prefix}_stage_{unit.replace('/', '_per_')}"
+                )
+                out.append(f"# TYPE {metric} histogram")
+
+                for name, h in sorted(self.histograms.items()):
+                    if self.units[name] != unit:
+                        continue
+
+                    cumulative = 0
+                    for bound, n in zip(h.buckets, h.counts):
+                        cumulative += n
+                        out.append(
+                            f'{metric}_bucket{{stage="{name}",le="{bound}"}} '
+                            f"{cumulative}"
+                        )
+                    out.append(
+                        f'{metric}_bucket{{stage="{name}",le="+Inf"}} {h.count}'
+                    )
+                    out.append(f'{metric}_sum{{stage="{name}"}} {h.sum}')
+                    out.append(f'{metric}_count{{stage="{name}"}} {h.count}')
+
+        return "\n".join(out) + "\n"
+
+    def reset(self) -> None:
+        with self._lock:
+            self.histograms.clear()
+            self.units.clear()
+
+
+_registry = MetricsRegistry()
+
+
+def get_metrics() -> MetricsRegistry:
+    return _registry
+
+
+def dump_metrics() -> None:
+    """ log the summary and export logs/metrics.prom, registered by the CLI """
+    if not _registry.histograms:
+        return
+
+    get_logger("metrics").info("latency summary\n" + _registry.summary())
+    (_safe_logs_dir() / "metrics.prom").write_text(
+        _registry.to_prometheus(),
+        encoding="utf-8",
+    )
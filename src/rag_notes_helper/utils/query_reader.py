@@ -0,0 +1,71 @@
+import contextvars
+import os
+import queue
+import select
+import sys
+import threading
+from collections.abc import Callable
+
+
+def read_query(prompt: str = "> ") -> str:
+    """ one query, lines pasted along with the first are joined to it """
+    lines = [input(prompt)]
+
+    if os.name == "posix" and sys.stdin.isatty():
+        while select.select([sys.stdin], [], [], 0)[0]:
+            line = sys.stdin.readline()
+            if not line:
+                break
+            lines.append(line.rstrip("\n"))
+
+    return "\n".join(lines).strip()
+
+
+class QueryReader:
+    """
+    reads queries on a thread, a query typed while the previous answer
+    still streams is handed to on_query right away
+    """
+
+    def __init__(self, on_query: Callable[[str], None] | None = None) -> None:
+        self.on_query = on_query
+        self._queries: queue.Queue = queue.Queue()
+
+        # the thread sees the caller's context, e.g. its index profile
+        self._thread = threading.Thread(
+            target=contextvars.copy_context().run,
+            args=(self._run,),
+            name="query-reader",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            try :
+                query = read_query(prompt="")
+            except BaseException as e:
+                # EOF or a closed stdin ends the reader, get() raises it
+                self._queries.put(e)
+                return
+
+            if self.on_query is not None:
+                self.on_query(query)
+
+            self._queries.put(query)
+
+    def get(self, prompt: str = "> ") -> str:
+        """ next query, the prompt is shown even if it was typed ahead """
+        print(prompt, end="", flush=True)
+
+        while True:
+            # short waits keep the main thread responsive to ctrl-c
+            try :
+                item = self._queries.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+            if isinstance(item, BaseException):
+                raise item
+
+            return item
@@ -0,0 +1,27 @@
+import contextvars
+import threading
+from concurrent.futures import Future
+
+
+def run_in_background(func, *args, name: str | None = None) -> Future:
+    """ run func on a daemon thread, its result or error lands in the future """
+    future: Future = Future()
+
+    def target():
+        if not future.set_running_or_notify_cancel():
+            return
+
+        try :
+            future.set_result(func(*args))
+        except BaseException as e:
+            future.set_exception(e)
+
+    # the thread sees the caller's context, e.g. its index profile
+    threading.Thread(
+        target=contextvars.copy_context().run,
+        args=(target,),
+        name=name,
+        daemon=True,
+    ).start()
+
+    return future
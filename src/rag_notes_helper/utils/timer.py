@@ -1,26 +1,45 @@
+import functools
+import threading
 import time
 from contextlib import contextmanager
 from rag_notes_helper.utils.logger import get_logger
+from rag_notes_helper.utils.metrics import get_metrics
+
+
+_spans = threading.local()
 
 
 def _get_logger():
     return get_logger("latency")
 
+def _span_stack() -> list[str]:
+    if not hasattr(_spans, "stack"):
+        _spans.stack = []
+
+    return _spans.stack
+
 @contextmanager
 def time_block(name: str):
+    stack = _span_stack()
+    stack.append(name)
     start = time.perf_counter()
 
     try :
         yield
     finally :
         end = time.perf_counter()
-        _get_logger().info(f"{name} latency={(end - start) * 1000:.2f} ms")
+        elapsed_ms = (end - start) * 1000
+        # nested spans are logged with their parents, e.g. retrieve > faiss_search
+        path = " > ".join(stack)
+        stack.pop()
+
+        get_metrics().observe(name, elapsed_ms)
+        _get_logger().info(f"{path} latency={elapsed_ms:.2f} ms")
 
 def deco_time_block(func):
+    @functools.wraps(func)
     def wrapper(*args, **kws):
         with time_block(func.__name__):
             return func(*args, **kws)
 
     return wrapper
-
-
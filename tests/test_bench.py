@@ -0,0 +1,66 @@
+import os
+
+import numpy as np
+
+from rag_notes_helper.bench.bench_runner import run_benchmarks
+from rag_notes_helper.bench.corpus import generate_corpus, modify_fraction
+from rag_notes_helper.bench.fakes import FakeEmbedder
+from rag_notes_helper.core.config import get_settings
+from rag_notes_helper.rag.index import RagIndex
+
+
+def test_generate_corpus_is_reproducible(tmp_path):
+    paths = generate_corpus(tmp_path / "a", n_files=12, file_size=1_000, seed=1)
+    again = generate_corpus(tmp_path / "b", n_files=12, file_size=1_000, seed=1)
+
+    assert len(paths) == 12
+    assert {p.suffix for p in paths} <= {".md", ".py", ".pdf"}
+    assert [p.name for p in paths] == [p.name for p in again]
+
+    text_paths = [p for p in paths if p.suffix != ".pdf"]
+    assert [p.read_bytes() for p in text_paths] == [
+        p.read_bytes() for p in again if p.suffix != ".pdf"
+    ]
+
+    before = {p: p.read_text() for p in text_paths}
+    changed = modify_fraction(paths, 0.5, seed=1)
+
+    assert changed
+    assert all(before[p] != p.read_text() for p in changed)
+
+
+def test_fake_embedder_is_deterministic():
+    model = FakeEmbedder(dim=32)
+
+    a = model.encode(["faiss index search", "other"], normalize_embeddings=True)
+    b = model.encode(["faiss index search", "other"], normalize_embeddings=True)
+
+    assert a.shape == (2, 32)
+    assert np.array_equal(a, b)
+    assert np.allclose(np.linalg.norm(a, axis=1), 1.0)
+
+
+def test_run_benchmarks_smoke(monkeypatch):
+    monkeypatch.setenv("LLM_MODEL", "mine")
+    monkeypatch.delenv("OLLAMA_BASE_URL", raising=False)
+    notes_dir = get_settings().notes_dir
+
+    results = run_benchmarks(
+        n_files=6,
+        file_size=800,
+        n_queries=5,
+        change_fractions=(0.5,),
+    )
+
+    assert {
+        "build", "ingest", "update", "query", "meta_get", "commit", "stream",
+        "peak_rss_mb", "params",
+    } <= set(results)
+    assert results["query"]["n"] == 5
+    assert results["stream"]["ttft"]["n"] > 0
+    # the fake embedder is removed once the run ends
+    assert not any(isinstance(m, FakeEmbedder) for m in RagIndex._models.values())
+    # and the caller's settings are back
+    assert os.environ["LLM_MODEL"] == "mine"
+    assert "OLLAMA_BASE_URL" not in os.environ
+    assert get_settings().notes_dir == notes_dir
@@ -1,6 +1,8 @@
+from unittest.mock import MagicMock, PropertyMock
 import pytest
 
-from rag_notes_helper.rag.chunking import chunk_lines
+from rag_notes_helper.rag.chunking import chunk_document, chunk_lines
+from rag_notes_helper.rag.index import RagIndex
 
 def mock_iter():
     for _ in range(10):
@@ -28,3 +30,219 @@ def test_chunk_ids():
     prev = chunks[0].text
     curr = chunks[1].text
     assert curr.startswith(prev.split(", ")[-1])
+
+
+def test_char_chunks_keep_overlap_before_long_line():
+    chunks = list(chunk_lines(
+        lines=iter(["a" * 8, "b" * 8, "c" * 18]),
+        doc_id="doc_id1",
+        source="note.md",
+        chunk_size=20,
+        overlap=5,
+    ))
+
+    # a chunk may exceed chunk_size in chars, the overlap line is kept
+    assert [c.text for c in chunks] == [
+        f"{'a' * 8}, {'b' * 8}",
+        f"{'b' * 8}, {'c' * 18}",
+    ]
+
+
+class WhitespaceTokenizer:
+    """ fast-tokenizer stand-in: one token per word """
+
+    def __call__(self, texts, add_special_tokens=False, return_offsets_mapping=False):
+        single = isinstance(texts, str)
+        texts = [texts] if single else texts
+
+        input_ids, offset_mapping = [], []
+        for text in texts:
+            offsets, pos = [], 0
+            for word in text.split():
+                start = text.index(word, pos)
+                pos = start + len(word)
+                offsets.append((start, pos))
+
+            input_ids.append(list(range(len(offsets))))
+            offset_mapping.append(offsets)
+
+        if single:
+            return {"input_ids": input_ids[0], "offset_mapping": offset_mapping[0]}
+
+        return {"input_ids": input_ids, "offset_mapping": offset_mapping}
+
+    def num_special_tokens_to_add(self):
+        return 2
+
+
+@pytest.fixture
+def mock_tokenizer(monkeypatch):
+    mock_model = MagicMock()
+    mock_model.tokenizer = WhitespaceTokenizer()
+    mock_model.max_seq_length = 12
+
+    monkeypatch.setattr(
+        RagIndex,
+        "embed_model",
+        PropertyMock(return_value=mock_model),
+    )
+
+
+def test_token_chunks_fit_model_window(mock_tokenizer):
+    lines = ["a b c", "d e f g", "h i", " ".join(["w"] * 25)]
+
+    chunks = list(chunk_lines(
+        lines=iter(lines),
+        doc_id="doc_id1",
+        source="note.md",
+        chunk_size=1000,
+        overlap=2,
+        unit="tokens",
+    ))
+
+    # window = 12 - 2 special tokens, ", " costs one token
+    assert all(len(c.text.replace(",", " ,").split()) <= 10 for c in chunks)
+    assert [c.chunk_id for c in chunks] == list(range(len(chunks)))
+
+    # long line is split, not truncated
+    assert sum(c.text.count("w") for c in chunks) >= 25
+
+
+def test_token_chunks_overlap(mock_tokenizer):
+    chunks = list(chunk_lines(
+        lines=iter(["a b", "c d", "e f", "g h", "i j"]),
+        doc_id="doc_id1",
+        source="note.md",
+        chunk_size=7,
+        overlap=2,
+        unit="tokens",
+    ))
+
+    assert len(chunks) > 1
+    for prev, curr in zip(chunks, chunks[1:]):
+        assert curr.text.startswith(prev.text.split(", ")[-1])
+
+
+def test_chunk_markdown_heading_path():
+    lines = [
+        "# Title",
+        "intro",
+        "## Part A",
+        "a text",
+        "```",
+        "# not a heading",
+        "```",
+        "## Part B",
+        "### Detail",
+        "b text",
+    ]
+
+    chunks = list(chunk_document(
+        lines=iter(lines),
+        doc_id="doc_id1",
+        source="note.md",
+        chunk_size=50,
+    ))
+
+    assert [c.text.splitlines()[0] for c in chunks] == [
+        "Title",
+        "Title > Part A",
+        "Title > Part B > Detail",
+    ]
+    assert "# not a heading" in chunks[1].text
+    assert [c.chunk_id for c in chunks] == list(range(len(chunks)))
+
+
+def test_chunk_markdown_packs_small_sections():
+    lines = ["# Title", "intro", "## Part A", "a text", "## Part B", "b text"]
+
+    chunks = list(chunk_document(
+        lines=iter(lines),
+        doc_id="doc_id1",
+        source="note.md",
+        chunk_size=200,
+    ))
+
+    assert [c.text for c in chunks] == [
+        "Title\nintro\nTitle > Part A\na text\nTitle > Part B\nb text",
+    ]
+
+
+def test_chunk_python_top_level_defs():
+    lines = [
+        "import os",
+        "@decorator",
+        "def foo():",
+        "    return 1",
+        "class Bar:",
+        "    def baz(self):",
+        "        pass",
+    ]
+
+    chunks = list(chunk_document(
+        lines=iter(lines),
+        doc_id="doc_id1",
+        source="code.py",
+        chunk_size=60,
+    ))
+
+    # small sections share a chunk, each keeps its own header
+    assert [c.text for c in chunks] == [
+        "import os\ndef foo\n@decorator\ndef foo():\n    return 1",
+        "class Bar\nclass Bar:\n    def baz(self):\n        pass",
+    ]
+
+
+def test_chunk_python_keeps_comments():
+    lines = [
+        "# module header",
+        "import os",
+        "# helper for foo",
+        "@decorator",
+        "def foo():",
+        "    return 1",
+        "# end of file",
+    ]
+
+    chunks = list(chunk_document(
+        lines=iter(lines),
+        doc_id="doc_id1",
+        source="code.py",
+        chunk_size=60,
+    ))
+
+    assert [c.text for c in chunks] == [
+        "# module header\nimport os",
+        "def foo\n# helper for foo\n@decorator\ndef foo():\n    return 1",
+        "# end of file",
+    ]
+
+
+def test_chunk_python_syntax_error_falls_back():
+    chunks = list(chunk_document(
+        lines=iter(["def broken(:", "x = 1"]),
+        doc_id="doc_id1",
+        source="code.py",
+        chunk_size=200,
+    ))
+
+    assert chunks[0].text == "def broken(:, x = 1"
+
+
+def test_token_overlap_scales_with_capped_size(mock_tokenizer):
+    lines = [f"w{i}" for i in range(100)]
+
+    chunks = list(chunk_lines(
+        lines=iter(lines),
+        doc_id="doc_id1",
+        source="note.md",
+        chunk_size=100,
+        overlap=20,
+        unit="tokens",
+    ))
+
+    # window 10 keeps the 20% overlap: 2 tokens, not 20 (every line repeated)
+    words = sum(len(c.text.split(", ")) for c in chunks)
+    assert words < 2 * len(lines)
+    for prev, curr in zip(chunks, chunks[1:]):
+        assert curr.text.split(", ")[0] in prev.text.split(", ")
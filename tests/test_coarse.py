@@ -0,0 +1,95 @@
+from unittest.mock import MagicMock, PropertyMock
+
+import faiss
+import numpy as np
+import pytest
+
+from rag_notes_helper.core.config import get_settings
+from rag_notes_helper.rag.chunking import Chunk
+from rag_notes_helper.rag.coarse import (
+    COARSE_FILE,
+    PROJECTION_FILE,
+    build_coarse,
+    search_two_stage,
+)
+from rag_notes_helper.rag.index import RagIndex, build_index, load_index
+from rag_notes_helper.rag.meta_store import MetaStore
+from rag_notes_helper.rag.retrieval import retrieve
+
+
+def _vectors(n: int, d: int, seed: int = 0) -> np.ndarray:
+    vectors = np.random.default_rng(seed).standard_normal((n, d)).astype("float32")
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def _flat(vectors: np.ndarray) -> faiss.IndexFlatIP:
+    index = faiss.IndexFlatIP(vectors.shape[1])
+    index.add(vectors) # type: ignore
+    return index
+
+
+@pytest.mark.parametrize("method", ["pca", "prefix"])
+def test_two_stage_matches_flat_search(method):
+    vectors = _vectors(500, 32)
+    index = _flat(vectors)
+    coarse = build_coarse(index, 8, method)
+    query = _vectors(1, 32, seed=1)
+
+    scores, ids = search_two_stage(coarse, index, query, k=5, candidates=500)
+    flat_scores, flat_ids = index.search(query, 5) # type: ignore
+
+    # the whole corpus shortlisted, re-scoring gives the exact ranking
+    assert ids.tolist() == flat_ids.tolist()
+    np.testing.assert_allclose(scores, flat_scores, rtol=1e-5)
+
+
+def test_pca_keeps_dominant_directions():
+    # vectors living in a 4-dim subspace of 32 dims
+    basis = np.linalg.qr(np.random.default_rng(2).standard_normal((32, 4)))[0]
+    vectors = _vectors(300, 4) @ basis.T.astype("float32")
+    index = _flat(vectors)
+    coarse = build_coarse(index, 4, "pca")
+
+    scores, ids = search_two_stage(coarse, index, vectors[:1], k=3, candidates=3)
+
+    assert ids[0][0] == 0
+    assert scores[0][0] == pytest.approx(1.0, abs=1e-5)
+
+
+def test_coarse_skipped_when_not_narrower():
+    assert build_coarse(_flat(_vectors(10, 8)), 8) is None
+
+
+def test_build_persists_coarse_index_used_by_retrieve(monkeypatch):
+    monkeypatch.setenv("COARSE_DIM", "8")
+    monkeypatch.setenv("COARSE_CANDIDATES", "20")
+    get_settings.cache_clear()
+
+    texts = [f"chunk {i}" for i in range(100)]
+    vectors = dict(zip(texts, _vectors(100, 32)))
+    mock_model = MagicMock()
+    mock_model.encode.side_effect = lambda batch, **kws: np.stack(
+        [vectors.get(t, vectors["chunk 7"]) for t in batch]
+    )
+    monkeypatch.setattr(
+        RagIndex,
+        "embed_model",
+        PropertyMock(return_value=mock_model),
+    )
+
+    build_index([
+        Chunk(doc_id="d1", chunk_id=i, source="note.md", text=text)
+        for i, text in enumerate(texts)
+    ])
+
+    rag = load_index()
+    assert (rag.path / COARSE_FILE).exists()
+    assert (rag.path / PROJECTION_FILE).exists()
+    assert rag.coarse.ntotal == 100
+    assert rag.coarse.projection.shape == (8, 32)
+
+    with MetaStore(rag.path) as meta_store:
+        hits = retrieve(rag, meta_store, query="chunk 7", top_k=3)
+
+    assert hits[0]["text"] == "chunk 7"
+    assert hits[0]["score"] == pytest.approx(1.0, abs=1e-5)
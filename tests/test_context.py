@@ -0,0 +1,47 @@
+from rag_notes_helper.rag.context import build_context, merge_texts, overlap_len
+
+
+def test_overlap_len():
+    assert overlap_len("aaa, bbb, ccc", "bbb, ccc, ddd") == len("bbb, ccc")
+    assert overlap_len("abc", "xyz") == 0
+    assert overlap_len("", "xyz") == 0
+
+
+def test_merge_texts_strips_overlap():
+    assert merge_texts("line 1, line 2, line 3", "line 2, line 3, line 4") == (
+        "line 1, line 2, line 3, line 4"
+    )
+    assert merge_texts("first section", "second section") == (
+        "first section\nsecond section"
+    )
+
+
+def test_build_context_merges_adjacent_chunks():
+    hits = [
+        {"doc_id": "d1", "chunk_id": 1, "source": "a.md", "score": 0.9,
+         "text": "line 2, line 3, line 4"},
+        {"doc_id": "d2", "chunk_id": 0, "source": "b.md", "score": 0.8,
+         "text": "other note"},
+        {"doc_id": "d1", "chunk_id": 0, "source": "a.md", "score": 0.7,
+         "text": "line 1, line 2, line 3"},
+    ]
+
+    context = build_context("q", hits, token_budget=1000, trim_sentences=False)
+
+    assert context == (
+        "file:a.md\nline 1, line 2, line 3, line 4\n\n"
+        "file:b.md\nother note"
+    )
+
+
+def test_build_context_respects_budget():
+    hits = [
+        {"doc_id": f"d{i}", "chunk_id": 0, "source": f"{i}.md",
+         "score": 1 - i / 10, "text": "x" * 400}
+        for i in range(5)
+    ]
+
+    context = build_context("q", hits, token_budget=250, trim_sentences=False)
+
+    assert len(context) <= 250 * 4
+    assert context.startswith("file:0.md")
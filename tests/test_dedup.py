@@ -0,0 +1,33 @@
+from rag_notes_helper.rag.dedup import Deduplicator, simhash
+
+
+TEXT = " ".join(f"word{i * 7 % 101}" for i in range(150))
+
+
+def test_exact_duplicate_ignores_case_and_spacing():
+    dedup = Deduplicator()
+
+    assert dedup.find_or_add("Hello   World", 0) is None
+    assert dedup.find_or_add("hello world", 1) == 0
+
+
+def test_near_duplicate():
+    dedup = Deduplicator(max_distance=5)
+
+    assert dedup.find_or_add(TEXT, 0) is None
+    assert dedup.find_or_add(TEXT + " appended", 1) == 0
+    assert dedup.find_or_add(TEXT.replace("word", "term"), 2) is None
+
+
+def test_short_text_only_exact():
+    dedup = Deduplicator()
+
+    assert dedup.find_or_add("note one", 0) is None
+    assert dedup.find_or_add("note two", 1) is None
+
+
+def test_simhash_is_stable():
+    words = TEXT.split()
+
+    assert simhash(words) == simhash(list(words))
+    assert 0 <= simhash(words) < 1 << 64
@@ -0,0 +1,109 @@
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
+import sys
+import types
+
+import numpy as np
+
+from rag_notes_helper.rag import embedder as embedder_module
+from rag_notes_helper.rag.embedder import BATCH_CANDIDATES, ChunkEmbedder
+from rag_notes_helper.utils.metrics import get_metrics
+
+
+def _length_model():
+    """ mock model whose vector is [len(text)], to check the output order """
+    model = MagicMock()
+    model.encode.side_effect = lambda texts, **kws: (
+        np.array([[len(t)] for t in texts], dtype="float32")
+    )
+    return model
+
+
+def test_encode_sorts_by_length_and_restores_order(monkeypatch):
+    monkeypatch.setattr(ChunkEmbedder, "_tuned", {})
+    model = _length_model()
+    texts = ["aa", "aaaaa", "a", "aaaa"]
+
+    with ChunkEmbedder(model, workers=1) as embedder:
+        embeddings = embedder.encode(texts)
+
+    assert embeddings[:, 0].tolist() == [2, 5, 1, 4]
+
+    sent = model.encode.call_args.args[0]
+    assert sent == ["aaaaa", "aaaa", "aa", "a"]
+    # too few texts to tune, sentence-transformers' default is kept
+    assert model.encode.call_args.kwargs["batch_size"] == 32
+
+
+def test_batch_size_is_tuned_once(monkeypatch):
+    monkeypatch.setattr(ChunkEmbedder, "_tuned", {})
+    model = _length_model()
+    texts = [f"text {i}" for i in range(600)]
+
+    with ChunkEmbedder(model, workers=1) as embedder:
+        embedder.encode(texts)
+        embedder.encode(texts)
+
+    batch_sizes = [call.kwargs["batch_size"] for call in model.encode.call_args_list]
+    tuned = batch_sizes[len(BATCH_CANDIDATES)]
+
+    assert batch_sizes[: len(BATCH_CANDIDATES)] == list(BATCH_CANDIDATES)
+    assert batch_sizes[len(BATCH_CANDIDATES) :] == [tuned, tuned]
+    assert list(ChunkEmbedder._tuned.values()) == [tuned]
+
+
+def test_explicit_batch_size_skips_tuning(monkeypatch):
+    monkeypatch.setattr(ChunkEmbedder, "_tuned", {})
+    model = _length_model()
+
+    with ChunkEmbedder(model, workers=1, batch_size=8) as embedder:
+        embedder.encode([f"text {i}" for i in range(600)])
+
+    assert model.encode.call_count == 1
+    assert model.encode.call_args.kwargs["batch_size"] == 8
+
+
+def test_workers_get_contiguous_length_slices(monkeypatch):
+    model = _length_model()
+    monkeypatch.setattr(embedder_module, "_worker_model", model)
+
+    embedder = ChunkEmbedder(MagicMock(), workers=3, batch_size=4)
+    pool = ThreadPoolExecutor(max_workers=3)
+    monkeypatch.setattr(embedder, "_get_pool", lambda: pool)
+
+    texts = ["a" * n for n in [3, 7, 1, 5, 2, 6, 4]]
+    embeddings = embedder.encode(texts)
+    embedder.close()
+    pool.shutdown()
+
+    assert embeddings[:, 0].tolist() == [3, 7, 1, 5, 2, 6, 4]
+    blocks = sorted(
+        [len(t) for t in call.args[0]] for call in model.encode.call_args_list
+    )
+    assert blocks == [[1], [4, 3, 2], [7, 6, 5]]
+
+
+def test_close_reports_throughput(monkeypatch):
+    monkeypatch.setattr(ChunkEmbedder, "_tuned", {})
+    get_metrics().reset()
+
+    with ChunkEmbedder(_length_model(), workers=1) as embedder:
+        embedder.encode(["some text", "more text"])
+
+    assert "embed_chunks_per_sec" in get_metrics().summary()
+
+
+def test_single_worker_pins_threads(monkeypatch):
+    monkeypatch.setattr(ChunkEmbedder, "_tuned", {})
+    threads = []
+    fake_torch = types.ModuleType("torch")
+    fake_torch.get_num_threads = lambda: 8 # type: ignore
+    fake_torch.set_num_threads = threads.append # type: ignore
+    monkeypatch.setitem(sys.modules, "torch", fake_torch)
+
+    with ChunkEmbedder(_length_model(), workers=1, threads=2) as embedder:
+        embedder.encode(["a", "bb"])
+        embedder.encode(["ccc"])
+
+    # pinned once for the build, restored on close
+    assert threads == [2, 8]
@@ -0,0 +1,73 @@
+import io
+import json
+
+from rag_notes_helper.rag import structured
+from rag_notes_helper.utils.events import EventWriter
+
+
+HITS = [
+    {
+        "doc_id": "d1",
+        "chunk_id": 0,
+        "source": "note.md",
+        "text": "RAG retrieves notes",
+        "score": 0.9,
+    },
+]
+
+
+def _fake_answer(monkeypatch, answer):
+    monkeypatch.setattr(structured, "retrieve", lambda *args, **kws: HITS)
+
+    def rag_answer(query, *, hits, stream=False, line_width=None):
+        return {
+            "answer": iter(answer) if stream else "".join(answer),
+            "citations": [{"source": "note.md", "chunk_id": 0, "score": 0.9}],
+        }
+
+    monkeypatch.setattr(structured, "rag_answer", rag_answer)
+
+
+def test_ndjson_streams_events_in_order(monkeypatch):
+    _fake_answer(monkeypatch, ["RAG ", "is ", "retrieval."])
+    out = io.StringIO()
+
+    ok = structured.run_structured(None, None, EventWriter(out), query="what is RAG?") # type: ignore
+
+    events = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert ok
+    assert [e["event"] for e in events] == [
+        "retrieval", "token", "token", "token", "answer", "timings",
+    ]
+    assert events[0]["hits"][0]["score"] == 0.9
+    assert events[4]["answer"] == "RAG is retrieval."
+    assert set(events[5]["timings"]) == {"retrieve_ms", "first_token_ms", "total_ms"}
+
+
+def test_json_prints_one_document(monkeypatch):
+    _fake_answer(monkeypatch, ["RAG ", "is ", "retrieval."])
+    out = io.StringIO()
+
+    structured.run_structured(None, None, EventWriter(out, ndjson=False), query="q") # type: ignore
+
+    document = json.loads(out.getvalue())
+    assert document["answer"] == "RAG is retrieval."
+    assert document["query"] == "q"
+    assert document["citations"][0]["source"] == "note.md"
+    assert "total_ms" in document["timings"]
+
+
+def test_failure_is_reported_as_event(monkeypatch):
+    def broken(*args, **kws):
+        raise ConnectionError("LLM unreachable")
+
+    _fake_answer(monkeypatch, [])
+    monkeypatch.setattr(structured, "rag_answer", broken)
+    out = io.StringIO()
+
+    ok = structured.run_structured(None, None, EventWriter(out), query="q") # type: ignore
+
+    events = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert not ok
+    assert events[-2] == {"event": "error", "error": "ConnectionError: LLM unreachable"}
+    assert events[-1]["event"] == "timings"
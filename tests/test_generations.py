@@ -0,0 +1,110 @@
+from unittest.mock import MagicMock, PropertyMock
+import shutil
+
+import numpy as np
+
+from rag_notes_helper.rag.generations import (
+    GENERATIONS_DIR,
+    POINTER,
+    current_generation,
+    prune_generations,
+)
+from rag_notes_helper.rag.index import (
+    RagIndex,
+    build_and_save_rag,
+    load_index,
+    rebuild_index,
+)
+from rag_notes_helper.rag.meta_store import MetaStore
+from rag_notes_helper.core.config import get_settings
+
+
+def _mock_model(monkeypatch):
+    mock_model = MagicMock()
+    mock_model.encode.side_effect = lambda texts, **kws: (
+        np.random.rand(len(texts), 3).astype("float32")
+    )
+
+    monkeypatch.setattr(
+        RagIndex,
+        "embed_model",
+        PropertyMock(return_value=mock_model)
+    )
+
+
+def test_build_publishes_generation(monkeypatch):
+    _mock_model(monkeypatch)
+    settings = get_settings()
+    (settings.notes_dir / "note.txt").write_text("first note\n", encoding="utf-8")
+
+    rag = build_and_save_rag()
+
+    assert current_generation() == rag.path
+    assert (settings.storage_dir / POINTER).read_text() == rag.path.name
+    assert load_index().path == rag.path
+
+
+def test_pinned_reader_survives_rebuild(monkeypatch):
+    _mock_model(monkeypatch)
+    settings = get_settings()
+    note = settings.notes_dir / "note.txt"
+    note.write_text("old text\n", encoding="utf-8")
+
+    old_rag = build_and_save_rag()
+    meta_store = MetaStore(old_rag.path)
+
+    note.write_text("new text\n", encoding="utf-8")
+    new_rag = rebuild_index(force=True)
+
+    assert new_rag.path != old_rag.path
+    assert current_generation() == new_rag.path
+
+    # the open store still answers from the generation it was pinned to
+    assert meta_store.get(0)["text"] == "old text"
+    meta_store.close()
+
+    with MetaStore() as meta_store:
+        assert meta_store.get(0)["text"] == "new text"
+
+
+def test_prune_keeps_recent_generations(monkeypatch):
+    _mock_model(monkeypatch)
+    settings = get_settings()
+    (settings.notes_dir / "note.txt").write_text("some text\n", encoding="utf-8")
+
+    paths = [build_and_save_rag().path for _ in range(4)]
+    root = settings.storage_dir / GENERATIONS_DIR
+
+    assert sorted(p.name for p in root.iterdir()) == [p.name for p in paths[-2:]]
+
+    prune_generations(keep=1)
+
+    assert [p.name for p in root.iterdir()] == [paths[-1].name]
+
+
+def test_legacy_flat_layout_is_readable(monkeypatch):
+    _mock_model(monkeypatch)
+    settings = get_settings()
+    storage = settings.storage_dir
+    (settings.notes_dir / "note.txt").write_text("legacy text\n", encoding="utf-8")
+
+    rag = build_and_save_rag()
+
+    # move the build back to the layout used before generations
+    for path in rag.path.iterdir():
+        shutil.move(path, storage / path.name)
+    shutil.rmtree(storage / GENERATIONS_DIR)
+    (storage / POINTER).unlink()
+
+    assert current_generation() == storage
+    assert load_index().index.ntotal == 1
+
+    with MetaStore() as meta_store:
+        assert meta_store.get(0)["text"] == "legacy text"
+
+    # the first generated build supersedes the flat files
+    rag = rebuild_index(force=True)
+
+    assert current_generation() == rag.path
+    assert not (storage / "faiss.index").exists()
+    assert not (storage / "meta.jsonl").exists()
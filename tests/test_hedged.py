@@ -0,0 +1,92 @@
+import threading
+import time
+
+import pytest
+
+from rag_notes_helper.rag.llm import get_llm
+from rag_notes_helper.rag.llm.base import BaseLLM
+from rag_notes_helper.rag.llm.hedged import HedgedLLM
+
+
+class ScriptedLLM(BaseLLM):
+    def __init__(self, text: str, *, delay: float = 0.0, fail: bool = False):
+        super().__init__(model="scripted", api_key=None)
+        self.text = text
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+        self.closed = threading.Event()
+
+    def _generate(self, prompt, **kws) -> str:
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.fail:
+            raise ConnectionError("provider down")
+        return self.text
+
+    def _stream(self, prompt, **kws):
+        self.calls += 1
+        try :
+            time.sleep(self.delay)
+            if self.fail:
+                raise ConnectionError("provider down")
+            for char in self.text:
+                yield char
+                time.sleep(0.001)
+        finally :
+            self.closed.set()
+
+
+PROMPT = [{"role": "user", "content": "q"}]
+
+
+def test_fast_primary_is_not_hedged():
+    primary, secondary = ScriptedLLM("primary"), ScriptedLLM("secondary")
+    llm = HedgedLLM(primary, secondary, hedge_after=1.0)
+
+    assert "".join(llm._stream(PROMPT)) == "primary"
+    assert secondary.calls == 0
+
+
+def test_slow_primary_is_hedged_and_cancelled():
+    primary = ScriptedLLM("primary " * 20, delay=0.3)
+    secondary = ScriptedLLM("secondary")
+    llm = HedgedLLM(primary, secondary, hedge_after=0.05)
+
+    start = time.perf_counter()
+    assert "".join(llm._stream(PROMPT)) == "secondary"
+    assert time.perf_counter() - start < 0.3
+
+    # the loser stops at its first token and closes its stream
+    assert primary.closed.wait(1.0)
+
+
+def test_failed_primary_falls_back_before_deadline():
+    primary = ScriptedLLM("", fail=True)
+    secondary = ScriptedLLM("secondary")
+    llm = HedgedLLM(primary, secondary, hedge_after=10.0)
+
+    assert llm.generate(PROMPT) == "secondary"
+
+
+def test_both_failing_raises():
+    llm = HedgedLLM(
+        ScriptedLLM("", fail=True),
+        ScriptedLLM("", fail=True),
+        hedge_after=0.01,
+    )
+
+    with pytest.raises(ConnectionError):
+        "".join(llm._stream(PROMPT))
+
+
+def test_get_llm_wraps_hedge_provider(monkeypatch):
+    monkeypatch.setenv("LLM_HEDGE_PROVIDER", "ollama")
+    monkeypatch.setenv("LLM_HEDGE_MODEL", "llama3.2")
+    monkeypatch.setenv("LLM_TIMEOUT", "30")
+
+    llm = get_llm()
+
+    assert isinstance(llm, HedgedLLM)
+    assert [b.model for b in llm.backends] == ["llama3.1", "llama3.2"]
+    assert llm.backends[1].timeout == 30
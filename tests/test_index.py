@@ -1,10 +1,22 @@
 from unittest.mock import MagicMock, PropertyMock
+import sys
+import types
 import pytest
 
 import numpy as np
 
-from rag_notes_helper.rag.index import build_index, RagIndex
+from rag_notes_helper.rag.index import (
+    RagIndex,
+    build_and_save_rag,
+    build_index,
+    preload_index,
+    rebuild_index,
+    rechunk_rebuild,
+    smart_rebuild,
+)
 from rag_notes_helper.rag.chunking import Chunk
+from rag_notes_helper.rag.ingest import get_changed_doc_ids
+from rag_notes_helper.rag.meta_store import MetaStore
 from rag_notes_helper.core.config import get_settings
 
 
@@ -33,3 +45,278 @@ def test_build_index_creates_faiss_index(monkeypatch, tmp_path):
     rag = build_index(chunks)
 
     assert rag.index.ntotal == 2
+
+
+def test_rechunk_embeds_only_new_texts(monkeypatch):
+    settings = get_settings()
+    (settings.notes_dir / "note.md").write_text(
+        "\n".join(f"line {i}" for i in range(20)),
+        encoding="utf-8",
+    )
+
+    mock_model = MagicMock()
+    mock_model.encode.side_effect = lambda texts, **kws: (
+        np.random.rand(len(texts), 3).astype("float32")
+    )
+
+    monkeypatch.setattr(
+        RagIndex,
+        "embed_model",
+        PropertyMock(return_value=mock_model)
+    )
+
+    rag = build_and_save_rag()
+    n_chunks = rag.index.ntotal
+    assert mock_model.encode.call_count == 1
+
+    # same settings: every chunk text is already embedded
+    rag = rechunk_rebuild()
+
+    assert rag.index.ntotal == n_chunks
+    assert mock_model.encode.call_count == 1
+
+    # smaller chunks: only the new texts are embedded
+    monkeypatch.setenv("CHUNK_SIZE", "30")
+    monkeypatch.setenv("CHUNK_OVERLAP", "5")
+    get_settings.cache_clear()
+
+    rag = rechunk_rebuild()
+
+    assert rag.index.ntotal > n_chunks
+    assert mock_model.encode.call_count == 2
+
+
+def test_build_index_deduplicates_chunks(monkeypatch):
+    mock_model = MagicMock()
+    mock_model.encode.side_effect = lambda texts, **kws: (
+        np.random.rand(len(texts), 3).astype("float32")
+    )
+
+    monkeypatch.setattr(
+        RagIndex,
+        "embed_model",
+        PropertyMock(return_value=mock_model)
+    )
+
+    chunks = [
+        Chunk(doc_id="d1", chunk_id=0, source="note1.md", text="shared text"),
+        Chunk(doc_id="d1", chunk_id=1, source="note1.md", text="unique text"),
+        Chunk(doc_id="d2", chunk_id=0, source="note2.md", text="Shared  text"),
+    ]
+
+    rag = build_index(chunks)
+
+    assert rag.index.ntotal == 2
+
+    with MetaStore() as meta_store:
+        duplicates = meta_store.get(0)["duplicates"]
+
+        assert [(d["doc_id"], d["chunk_id"]) for d in duplicates] == [("d2", 0)]
+        assert meta_store.get_all_doc_id() == {"d1", "d2"}
+        assert meta_store.list_indexed_sources() == ["note1.md", "note2.md"]
+
+
+def test_smart_rebuild_keeps_duplicates_of_changed_notes(monkeypatch):
+    settings = get_settings()
+    note1 = settings.notes_dir / "note1.txt"
+    note2 = settings.notes_dir / "note2.txt"
+    note1.write_text("shared text\n", encoding="utf-8")
+    note2.write_text("shared text\n", encoding="utf-8")
+
+    mock_model = MagicMock()
+    mock_model.encode.side_effect = lambda texts, **kws: (
+        np.random.rand(len(texts), 3).astype("float32")
+    )
+
+    monkeypatch.setattr(
+        RagIndex,
+        "embed_model",
+        PropertyMock(return_value=mock_model)
+    )
+
+    assert build_and_save_rag().index.ntotal == 1
+
+    note1.write_text("changed text\n", encoding="utf-8")
+
+    with MetaStore() as meta_store:
+        old_doc_ids = meta_store.get_all_doc_id()
+
+    rag = smart_rebuild(*get_changed_doc_ids(old_doc_ids))
+
+    assert rag.index.ntotal == 2
+
+    with MetaStore() as meta_store:
+        texts = {meta_store.get(i)["source"]: meta_store.get(i)["text"] for i in range(2)}
+
+    assert texts == {"note1.txt": "changed text", "note2.txt": "shared text"}
+
+
+def test_preload_warms_up_model_and_loads_index(monkeypatch):
+    mock_model = MagicMock()
+    mock_model.encode.side_effect = lambda texts, **kws: (
+        np.eye(3, dtype="float32")[: len(texts)]
+    )
+
+    fake_st = types.ModuleType("sentence_transformers")
+    fake_st.SentenceTransformer = MagicMock(return_value=mock_model) # type: ignore
+    monkeypatch.setitem(sys.modules, "sentence_transformers", fake_st)
+    monkeypatch.setattr(RagIndex, "_models", {})
+    monkeypatch.setattr(RagIndex, "_model_futures", {})
+
+    chunks = [
+        Chunk(doc_id="d1", chunk_id=i, source="note.md", text=f"text {i}")
+        for i in range(3)
+    ]
+    # commit publishes the generation, nothing is saved afterwards
+    build_index(chunks)
+
+    # the build loaded the model through preload, once, with a warm-up encode
+    assert fake_st.SentenceTransformer.call_count == 1 # type: ignore
+    warmup_texts = mock_model.encode.call_args_list[0].args[0]
+    assert warmup_texts == ["warm up the embedding model"]
+
+    rag = preload_index()
+
+    assert rag.embed_model is mock_model
+    assert rag.index.ntotal == 3
+    assert fake_st.SentenceTransformer.call_count == 1 # type: ignore
+
+
+def _text_vectors(texts, **kws):
+    """ deterministic vector per text, so migrated rows can be compared """
+    vectors = np.stack([
+        np.random.default_rng(sum(map(ord, t))).random(4) for t in texts
+    ])
+    return vectors.astype("float32")
+
+
+@pytest.mark.parametrize(
+    "drop_side_files, old_compression, new_compression",
+    [
+        (False, "none", "none"),
+        (True, "none", "none"),
+        (False, "zlib", "zlib"),
+        (False, "none", "zlib"),
+        (False, "zlib", "none"),
+    ],
+)
+def test_smart_rebuild_migrates_rows_in_bulk(
+    monkeypatch,
+    drop_side_files,
+    old_compression,
+    new_compression,
+):
+    import rag_notes_helper.rag.index as index_module
+    monkeypatch.setattr(index_module, "MIGRATE_BLOCK", 3)
+
+    settings = get_settings()
+    notes = [settings.notes_dir / f"note{i}.txt" for i in range(4)]
+    for i, note in enumerate(notes):
+        note.write_text(
+            "\n".join(f"note {i} line {j}" for j in range(3)) + "\n",
+            encoding="utf-8",
+        )
+    monkeypatch.setenv("CHUNK_SIZE", "12")
+    monkeypatch.setenv("CHUNK_OVERLAP", "1")
+    monkeypatch.setenv("META_COMPRESSION", old_compression)
+    monkeypatch.setenv("META_BLOCK_RECORDS", "4")
+    get_settings.cache_clear()
+
+    mock_model = MagicMock()
+    mock_model.encode.side_effect = _text_vectors
+    monkeypatch.setattr(
+        RagIndex,
+        "embed_model",
+        PropertyMock(return_value=mock_model)
+    )
+
+    old_rag = build_and_save_rag()
+    with MetaStore(old_rag.path) as meta_store:
+        old_rows = {
+            (r["source"], r["chunk_id"]): (r, old_rag.index.reconstruct(i))
+            for i, r in enumerate(meta_store.iter_records())
+        }
+
+    # side files of older generations are rebuilt by a scan
+    if drop_side_files:
+        (old_rag.path / "meta.chunks.json").unlink()
+        (old_rag.path / "meta.dedup.npz").unlink()
+
+    notes[1].write_text("note 1 was rewritten\n", encoding="utf-8")
+    notes[2].unlink()
+    # a new copy of an unchanged chunk joins the migrated cluster
+    (settings.notes_dir / "copy.txt").write_text("note 3 line 0\n", encoding="utf-8")
+
+    with MetaStore() as meta_store:
+        old_doc_ids = meta_store.get_all_doc_id()
+    n_encoded = mock_model.encode.call_count
+
+    monkeypatch.setenv("META_COMPRESSION", new_compression)
+    get_settings.cache_clear()
+
+    rag = smart_rebuild(*get_changed_doc_ids(old_doc_ids))
+
+    with MetaStore(rag.path) as meta_store:
+        records = list(meta_store.iter_records())
+        sources = [r["source"] for r in records]
+
+        migrated = [
+            (i, r) for i, r in enumerate(records)
+            if r["source"] in {"note0.txt", "note3.txt"}
+        ]
+        assert len(migrated) == sum(
+            1 for source, _ in old_rows if source in {"note0.txt", "note3.txt"}
+        )
+        for faiss_id, record in migrated:
+            old_record, old_vector = old_rows[(record["source"], record["chunk_id"])]
+            assert record == old_record
+            assert np.array_equal(rag.index.reconstruct(faiss_id), old_vector)
+            assert meta_store.get_chunk(record["doc_id"], record["chunk_id"]) == record
+
+        assert "note2.txt" not in sources
+        assert "copy.txt" not in sources
+        assert "copy.txt" in meta_store.list_indexed_sources()
+
+    # only the rewritten note was embedded
+    texts = [t for c in mock_model.encode.call_args_list[n_encoded:] for t in c.args[0]]
+    assert texts == ["note 1 was rewritten"]
+
+
+def test_catalog_serves_sources_without_scanning(monkeypatch):
+    settings = get_settings()
+    (settings.notes_dir / "a.txt").write_text("note a\n", encoding="utf-8")
+    (settings.notes_dir / "b.txt").write_text("note b\n", encoding="utf-8")
+
+    mock_model = MagicMock()
+    mock_model.encode.side_effect = _text_vectors
+    monkeypatch.setattr(
+        RagIndex,
+        "embed_model",
+        PropertyMock(return_value=mock_model)
+    )
+
+    old_rag = build_and_save_rag()
+    with MetaStore(old_rag.path) as meta_store:
+        old_catalog = meta_store.catalog
+
+    assert old_catalog["a.txt"]["chunks"] == 1
+    assert old_catalog["a.txt"]["size"] == len("note a\n")
+    assert old_catalog["a.txt"]["indexed_at"] is not None
+
+    (settings.notes_dir / "b.txt").write_text("note b, edited\n", encoding="utf-8")
+    rag = rebuild_index()
+
+    monkeypatch.setattr(
+        MetaStore,
+        "iter_records",
+        MagicMock(side_effect=AssertionError("records scanned")),
+    )
+    with MetaStore(rag.path) as meta_store:
+        assert meta_store.list_indexed_sources() == ["a.txt", "b.txt"]
+        assert meta_store.get_all_doc_id() == {
+            entry["doc_id"] for entry in meta_store.catalog.values()
+        }
+        # unchanged notes keep their entry, edited ones get a new one
+        assert meta_store.catalog["a.txt"] == old_catalog["a.txt"]
+        assert meta_store.catalog["b.txt"]["doc_id"] != old_catalog["b.txt"]["doc_id"]
+        assert meta_store.catalog["b.txt"]["size"] == len("note b, edited\n")
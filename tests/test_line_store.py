@@ -0,0 +1,37 @@
+from rag_notes_helper.rag.line_store import LineStore
+
+
+def test_tee_persists_lines(tmp_path):
+    line_store = LineStore(tmp_path / "lines")
+
+    lines = list(line_store.tee("d1", "note.md", iter(["line 1", "line 2"])))
+
+    assert lines == ["line 1", "line 2"]
+    assert line_store.doc_ids() == {"d1"}
+
+    source, stored = line_store.read("d1")
+
+    assert source == "note.md"
+    assert list(stored) == ["line 1", "line 2"]
+
+
+def test_tee_incomplete_stream_not_saved(tmp_path):
+    line_store = LineStore(tmp_path / "lines")
+
+    lines = line_store.tee("d1", "note.md", iter(["line 1", "line 2"]))
+    next(lines)
+    lines.close()
+
+    assert not line_store.has("d1")
+    assert not list((tmp_path / "lines").iterdir())
+
+
+def test_prune(tmp_path):
+    line_store = LineStore(tmp_path / "lines")
+
+    for doc_id in ["d1", "d2"]:
+        list(line_store.tee(doc_id, f"{doc_id}.md", iter(["text"])))
+
+    line_store.prune({"d2"})
+
+    assert line_store.doc_ids() == {"d2"}
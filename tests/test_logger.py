@@ -0,0 +1,16 @@
+from rag_notes_helper.core.config import get_settings
+from rag_notes_helper.utils.logger import get_logger
+
+
+def test_log_path_follows_settings(monkeypatch, tmp_path):
+    # created before LOGS_DIR changes, like module-level loggers
+    logger = get_logger("test")
+
+    for name in ["first", "second"]:
+        monkeypatch.setenv("LOGS_DIR", str(tmp_path / name))
+        get_settings.cache_clear()
+        logger.info(f"to {name}")
+
+    assert "to first" in (tmp_path / "first" / "rag.log").read_text()
+    assert "to second" in (tmp_path / "second" / "rag.log").read_text()
+    assert "to first" not in (tmp_path / "second" / "rag.log").read_text()
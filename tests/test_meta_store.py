@@ -1,8 +1,10 @@
 import json
 import struct
+import sys
 import pytest
 
 from rag_notes_helper.rag.meta_store import MetaStore
+from rag_notes_helper.rag.records import BlockRecordWriter
 
 
 @pytest.fixture
@@ -48,3 +50,39 @@ def test_list_sources_from_cache(create_mock_meta_files):
 def test_get_all_doc_ids(create_mock_meta_files):
     with MetaStore(create_mock_meta_files) as meta_store:
         assert meta_store.get_all_doc_id() == {"d1", "d2"}
+
+
+def _write_records(storage, records, **kws):
+    writer = BlockRecordWriter(storage, **kws)
+    for record in records:
+        writer.append(json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n")
+    writer.close()
+
+
+def test_block_compressed_records(tmp_path):
+    records = [
+        {"doc_id": "d1", "chunk_id": i, "source": "note.md", "text": f"línea {i}\r"}
+        for i in range(10)
+    ]
+    _write_records(tmp_path, records, codec="zlib", block_records=3)
+
+    with MetaStore(tmp_path) as meta_store:
+        assert meta_store.get(7) == records[7]
+        assert meta_store.get(0) == records[0]
+        assert list(meta_store.iter_records()) == records
+
+        with pytest.raises(IndexError):
+            meta_store.get(10)
+
+    assert not (tmp_path / "meta.jsonl").exists()
+
+
+def test_zstd_falls_back_to_zlib_without_zstandard(tmp_path, monkeypatch):
+    monkeypatch.setitem(sys.modules, "zstandard", None)
+    records = [{"doc_id": "d1", "chunk_id": 0, "source": "a.md", "text": "x"}]
+
+    _write_records(tmp_path, records, codec="zstd")
+
+    assert json.loads((tmp_path / "meta.blocks.json").read_text())["codec"] == "zlib"
+    with MetaStore(tmp_path) as meta_store:
+        assert meta_store.get(0) == records[0]
@@ -0,0 +1,49 @@
+import math
+
+from rag_notes_helper.utils.metrics import Histogram, MetricsRegistry
+from rag_notes_helper.utils.timer import deco_time_block, time_block
+
+
+def test_histogram_quantiles():
+    h = Histogram()
+    for v in range(1, 101):
+        h.observe(float(v))
+
+    assert h.count == 100
+    assert math.isclose(h.sum, 5050)
+    assert 25 <= h.quantile(0.5) <= 100
+    assert h.quantile(0.99) <= h.max == 100
+    assert math.isnan(Histogram().quantile(0.5))
+
+
+def test_prometheus_export():
+    registry = MetricsRegistry()
+    registry.observe("faiss_search", 3.0)
+    registry.observe("faiss_search", 30.0)
+    registry.observe("llm_tokens_per_sec", 42.0, unit="tokens/s")
+
+    text = registry.to_prometheus()
+
+    assert "# TYPE rag_stage_latency_ms histogram" in text
+    assert 'rag_stage_latency_ms_bucket{stage="faiss_search",le="5"} 1' in text
+    assert 'rag_stage_latency_ms_count{stage="faiss_search"} 2' in text
+    assert 'rag_stage_tokens_per_s_count{stage="llm_tokens_per_sec"} 1' in text
+
+
+def test_nested_time_blocks_record_metrics():
+    from rag_notes_helper.utils.metrics import get_metrics
+
+    get_metrics().reset()
+
+    @deco_time_block
+    def outer():
+        """ outer docstring """
+        with time_block("inner"):
+            pass
+
+    outer()
+
+    assert outer.__name__ == "outer"
+    assert outer.__doc__ == " outer docstring "
+    assert get_metrics().histograms["outer"].count == 1
+    assert get_metrics().histograms["inner"].count == 1
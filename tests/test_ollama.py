@@ -0,0 +1,54 @@
+from unittest.mock import MagicMock
+import json
+
+from rag_notes_helper.rag.llm import get_llm
+from rag_notes_helper.rag.llm import ollama_api
+from rag_notes_helper.utils.metrics import get_metrics
+
+
+def test_payload_pins_model_and_sets_options(monkeypatch):
+    monkeypatch.setenv("LLM_KEEP_ALIVE", "-1")
+    monkeypatch.setenv("LLM_NUM_CTX", "8192")
+    monkeypatch.setenv("LLM_NUM_THREAD", "6")
+
+    llm = get_llm()
+    prompt = [{"role": "system", "content": "static"}, {"role": "user", "content": "q"}]
+    payload = llm._get_payload(prompt, stream=True) # type: ignore
+
+    assert payload["keep_alive"] == -1
+    assert payload["options"]["num_ctx"] == 8192
+    assert payload["options"]["num_thread"] == 6
+    assert payload["messages"][0]["content"] == "static"
+
+
+def test_stream_records_ollama_timings(monkeypatch):
+    get_metrics().reset()
+
+    lines = [
+        {"message": {"content": "hi "}, "done": False},
+        {"message": {"content": "there"}, "done": False},
+        {
+            "message": {"content": ""},
+            "done": True,
+            "load_duration": 5_000_000,
+            "prompt_eval_count": 120,
+            "prompt_eval_duration": 40_000_000,
+            "eval_count": 20,
+            "eval_duration": 400_000_000,
+        },
+    ]
+    response = MagicMock()
+    response.iter_lines.return_value = [json.dumps(l).encode() for l in lines]
+    post = MagicMock(return_value=response)
+    monkeypatch.setattr(ollama_api._session, "post", post)
+
+    answer = "".join(get_llm().stream([{"role": "user", "content": "q"}]))
+    histograms = get_metrics().histograms
+
+    assert answer == "hi there"
+    assert post.call_args.kwargs["json"]["keep_alive"] == "30m"
+    assert histograms["ollama_prompt_eval"].sum == 40.0
+    assert histograms["ollama_load"].sum == 5.0
+    assert histograms["ollama_eval_tokens_per_sec"].sum == 50.0
+
+    get_metrics().reset()
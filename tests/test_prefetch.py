@@ -0,0 +1,114 @@
+import threading
+from unittest.mock import MagicMock, PropertyMock
+
+import numpy as np
+
+from rag_notes_helper.rag.chunking import Chunk
+from rag_notes_helper.rag.index import RagIndex, build_index
+from rag_notes_helper.rag.meta_store import MetaStore
+from rag_notes_helper.rag.prefetch import Prefetcher
+from rag_notes_helper.rag.retrieval import retrieve
+from rag_notes_helper.utils.query_reader import QueryReader
+
+
+def _build(monkeypatch, n_chunks: int = 6):
+    mock_model = MagicMock()
+    mock_model.encode.side_effect = lambda texts, **kws: (
+        np.eye(8, dtype="float32")[[int(t.split()[-1]) for t in texts]]
+    )
+    monkeypatch.setattr(
+        RagIndex,
+        "embed_model",
+        PropertyMock(return_value=mock_model),
+    )
+
+    chunks = [
+        Chunk(doc_id="d1", chunk_id=i, source="note.md", text=f"distinct text {i}")
+        for i in range(n_chunks)
+    ]
+    return build_index(chunks), mock_model
+
+
+def test_warm_neighbors_fills_cache(monkeypatch):
+    rag, _ = _build(monkeypatch)
+
+    with MetaStore() as meta_store:
+        prefetcher = Prefetcher(rag, meta_store, radius=1)
+        hit = {"doc_id": "d1", "chunk_id": 2}
+
+        assert prefetcher.neighbor_ids([hit]) == {1, 2, 3}
+        assert prefetcher.warm_neighbors([hit]).result() == 3
+        assert prefetcher.warm_neighbors([hit]).result() == 0
+        prefetcher.close()
+
+        # cached records are copied out, annotations do not leak back
+        record = meta_store.get(1)
+        record["score"] = 1.0
+        assert "score" not in meta_store.get(1)
+        assert meta_store.get(3)["text"] == "distinct text 3"
+
+
+def test_embed_is_started_once_and_reused_by_retrieve(monkeypatch):
+    rag, mock_model = _build(monkeypatch)
+
+    with MetaStore() as meta_store:
+        prefetcher = Prefetcher(rag, meta_store)
+        calls_before = mock_model.encode.call_count
+
+        future = prefetcher.embed("distinct text 4")
+        assert prefetcher.embed("distinct text 4") is future
+
+        hits = retrieve(rag, meta_store, query="distinct text 4", q_emb=future.result())
+        prefetcher.close()
+
+    assert mock_model.encode.call_count == calls_before + 1
+    assert hits[0]["text"] == "distinct text 4"
+
+
+def test_embed_does_not_wait_behind_warming(monkeypatch):
+    rag, _ = _build(monkeypatch)
+
+    with MetaStore() as meta_store:
+        prefetcher = Prefetcher(rag, meta_store, radius=1)
+        release = threading.Event()
+        monkeypatch.setattr(
+            prefetcher,
+            "_warm",
+            lambda hits: release.wait(timeout=5),
+        )
+
+        warm = prefetcher.warm_neighbors([{"doc_id": "d1", "chunk_id": 2}])
+        embedding = prefetcher.embed("distinct text 3").result(timeout=1)
+
+        assert not warm.done()
+        assert embedding.argmax() == 3
+        release.set()
+        prefetcher.close()
+
+
+def test_typed_ahead_query_embeds_while_answer_streams(monkeypatch):
+    rag, _ = _build(monkeypatch)
+    typed = iter(["distinct text 1", "distinct text 2"])
+    monkeypatch.setattr("builtins.input", lambda prompt="": next(typed))
+
+    with MetaStore() as meta_store:
+        prefetcher = Prefetcher(rag, meta_store)
+        started = []
+        second_typed = threading.Event()
+
+        def on_query(query):
+            started.append(prefetcher.embed(query))
+            if len(started) == 2:
+                second_typed.set()
+
+        reader = QueryReader(on_query=on_query)
+        assert reader.get(prompt="") == "distinct text 1"
+
+        # the loop is busy with the first answer, the second query is
+        # typed meanwhile and its embedding starts without the loop
+        assert second_typed.wait(timeout=1)
+        assert started[1].result(timeout=1).argmax() == 2
+
+        assert reader.get(prompt="") == "distinct text 2"
+        assert prefetcher.embed("distinct text 2") is started[1]
+        prefetcher.close()
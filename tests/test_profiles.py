@@ -0,0 +1,138 @@
+import faiss
+import numpy as np
+import pytest
+
+from rag_notes_helper.core.config import (
+    active_profile,
+    get_settings,
+    use_profile,
+)
+from rag_notes_helper.rag import ingest
+from rag_notes_helper.rag.generations import current_generation
+from rag_notes_helper.rag.index import RagIndex, build_profiles, load_index
+from rag_notes_helper.rag.profiles import ProfileSet, fuse_hits, resolve_profiles
+
+
+PROFILES = (
+    '{"small": {"chunk_size": 20, "chunk_overlap": 5}, '
+    '"large": {"embed_model_name": "big-model", "index_type": "hnsw"}}'
+)
+
+
+class _HashModel:
+    """ deterministic vectors per text, dim differs per model """
+
+    def __init__(self, dim: int) -> None:
+        self.dim = dim
+        self.calls = 0
+
+    def encode(self, texts, **kws):
+        self.calls += 1
+        vectors = np.stack([
+            np.random.default_rng(abs(hash(t)) % 2**32).random(self.dim)
+            for t in texts
+        ]).astype("float32")
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+@pytest.fixture
+def profiles(monkeypatch):
+    monkeypatch.setenv("PROFILES", PROFILES)
+    get_settings.cache_clear()
+
+    models = {
+        get_settings().embed_model_name: _HashModel(4),
+        "big-model": _HashModel(8),
+    }
+    monkeypatch.setattr(
+        RagIndex,
+        "embed_model",
+        property(lambda self: models[self.model_name]),
+    )
+
+    notes_dir = get_settings().notes_dir
+    (notes_dir / "a.txt").write_text(
+        "faiss stores vectors\nsearch is by inner product\n", encoding="utf-8"
+    )
+    (notes_dir / "b.txt").write_text(
+        "profiles keep several indexes\n", encoding="utf-8"
+    )
+
+    yield models
+    get_settings.cache_clear()
+
+
+def test_profile_overrides_index_settings(profiles):
+    base = get_settings()
+
+    with use_profile("large") as settings:
+        assert active_profile() == "large"
+        assert get_settings() is settings
+        assert settings.embed_model_name == "big-model"
+        assert settings.storage_dir == base.storage_dir / "profiles" / "large"
+        # notes are read once for every profile
+        assert settings.lines_dir == base.storage_dir / "lines"
+
+    assert active_profile() == "default"
+    assert get_settings() is base
+
+
+def test_profile_cannot_override_shared_settings(monkeypatch):
+    monkeypatch.setenv("PROFILES", '{"x": {"notes_dir": "/tmp"}}')
+    get_settings.cache_clear()
+
+    with pytest.raises(ValueError, match="cannot override notes_dir"):
+        get_settings()
+
+
+def test_build_profiles_reads_notes_once(monkeypatch, profiles):
+    reads = []
+    read_lines = ingest.iter_file_lines
+    monkeypatch.setattr(
+        ingest,
+        "iter_file_lines",
+        lambda path: reads.append(path.name) or read_lines(path),
+    )
+
+    rags = build_profiles(resolve_profiles(["all"]))
+
+    assert sorted(reads) == ["a.txt", "b.txt"]
+    assert set(rags) == {"default", "small", "large"}
+
+    for name, rag in rags.items():
+        with use_profile(name):
+            assert current_generation() == rag.path
+            assert load_index().index.ntotal == rag.index.ntotal
+
+    assert rags["small"].index.ntotal > rags["default"].index.ntotal
+    assert rags["large"].index.d == 8
+    assert isinstance(rags["large"].index, faiss.IndexHNSWFlat)
+
+
+def test_profile_set_fuses_results(profiles):
+    build_profiles(["default", "large"])
+
+    with ProfileSet(["default", "large"]) as profile_set:
+        hits = profile_set.retrieve("profiles keep several indexes", top_k=3)
+
+    assert hits
+    assert all(set(h["profiles"]) <= {"default", "large"} for h in hits)
+    # exact text match, found first by both profiles
+    assert hits[0]["text"] == "profiles keep several indexes"
+    assert hits[0]["profiles"] == ["default", "large"]
+
+
+def test_fuse_hits_ranks_by_reciprocal_rank():
+    def hit(text):
+        return {"source": "n.md", "text": text, "score": 0.5}
+
+    ranked = {
+        "a": [hit("x"), hit("y"), hit("z")],
+        "b": [hit("y"), hit("w")],
+    }
+
+    fused = fuse_hits(ranked, top_k=3, k=60)
+
+    assert [h["text"] for h in fused] == ["y", "x", "w"]
+    assert fused[0]["rrf"] == pytest.approx(1 / 62 + 1 / 61)
+    assert fused[0]["profiles"] == ["a", "b"]
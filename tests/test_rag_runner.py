@@ -0,0 +1,92 @@
+from unittest.mock import MagicMock
+import threading
+
+import pytest
+
+from rag_notes_helper.core.config import get_settings
+from rag_notes_helper.rag.generations import INDEX_FILE
+from rag_notes_helper.eval import rag_runner
+from rag_notes_helper.eval.rag_runner import (
+    QAResult,
+    checkpoint_path,
+    config_hash,
+    load_checkpoint,
+    run_queries,
+)
+
+
+def _fake_query(calls, fail=()):
+    lock = threading.Lock()
+
+    def run_single_query(rag, meta_store, query):
+        with lock:
+            calls.append(query)
+        if query in fail:
+            raise TimeoutError("eval llm timed out")
+
+        return QAResult(query, f"answer {query}", [f"ctx {query}"], ["a.md"], [0.9])
+
+    return run_single_query
+
+
+def test_run_queries_checkpoints_and_resumes(monkeypatch, tmp_path):
+    checkpoint = tmp_path / "answers.jsonl"
+    questions = [f"q{i}" for i in range(8)]
+    calls: list[str] = []
+
+    monkeypatch.setattr(rag_runner, "run_single_query", _fake_query(calls, fail={"q3"}))
+
+    with pytest.raises(RuntimeError, match="1 of 8 questions failed"):
+        run_queries(MagicMock(), None, questions, workers=4, checkpoint=checkpoint)
+
+    assert set(load_checkpoint(checkpoint)) == set(questions) - {"q3"}
+
+    # resume: only the failed question is answered again
+    calls.clear()
+    monkeypatch.setattr(rag_runner, "run_single_query", _fake_query(calls))
+    results = run_queries(MagicMock(), None, questions, workers=4, checkpoint=checkpoint)
+
+    assert calls == ["q3"]
+    assert results["q5"].answer == "answer q5"
+    assert len(load_checkpoint(checkpoint)) == 8
+
+
+def test_load_checkpoint_skips_torn_line(tmp_path):
+    checkpoint = tmp_path / "answers.jsonl"
+    checkpoint.write_text(
+        '{"question": "a", "answer": "x", "contexts": [], "sources": [], "scores": []}\n'
+        '{"question": "b", "ans',
+        encoding="utf-8",
+    )
+
+    assert list(load_checkpoint(checkpoint)) == ["a"]
+
+
+def test_config_hash_tracks_answer_settings(monkeypatch):
+    base = config_hash()
+
+    monkeypatch.setenv("LINE_WIDTH", "120")
+    get_settings.cache_clear()
+    assert config_hash() == base
+
+    monkeypatch.setenv("TOP_K", "3")
+    get_settings.cache_clear()
+    assert config_hash() != base
+
+
+def test_config_hash_tracks_coarse_search(monkeypatch):
+    base = config_hash()
+
+    monkeypatch.setenv("COARSE_CANDIDATES", "50")
+    get_settings.cache_clear()
+    assert config_hash() != base
+
+
+def test_config_hash_uses_pinned_generation(tmp_path):
+    old, new = tmp_path / "old", tmp_path / "new"
+    for generation in [old, new]:
+        generation.mkdir()
+        (generation / INDEX_FILE).write_bytes(b"index")
+
+    assert config_hash(old) != config_hash(new)
+    assert checkpoint_path(old).name == f"{config_hash(old)}.jsonl"
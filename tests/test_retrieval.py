@@ -4,8 +4,10 @@ import pytest
 import numpy as np
 import faiss
 
-from rag_notes_helper.rag.retrieval import retrieve
-from rag_notes_helper.rag.index import RagIndex
+from rag_notes_helper.rag.retrieval import mmr_select, retrieve
+from rag_notes_helper.rag.chunking import Chunk
+from rag_notes_helper.rag.index import RagIndex, build_index
+from rag_notes_helper.rag.meta_store import MetaStore
 from rag_notes_helper.core.config import get_settings
 
 @pytest.fixture
@@ -51,3 +53,90 @@ def test_retrieve_filters_by_score(monkeypatch, mock_meta_store):
     assert results[0]["text"] == "high"
     assert results[0]["score"] > 0.5
 
+
+
+def test_mmr_select_prefers_diverse_candidates():
+    query = np.array([1.0, 0.0, 0.0], dtype="float32")
+    candidates = np.array([
+        [0.95, 0.31, 0.0],
+        [0.95, 0.30, 0.0],  # near copy of the first candidate
+        [0.80, -0.6, 0.0],
+    ], dtype="float32")
+
+    assert mmr_select(query, candidates, k=2, lambda_=1.0) == [0, 1]
+    assert mmr_select(query, candidates, k=2, lambda_=0.5) == [0, 2]
+
+
+def test_retrieve_mmr(monkeypatch):
+    index = faiss.IndexFlatIP(3)
+    index.add(np.array([  # type: ignore
+        [0.96, 0.28, 0.0],
+        [0.95, 0.30, 0.0],
+        [0.80, -0.6, 0.0],
+    ], dtype="float32"))
+
+    mock_model = MagicMock()
+    mock_model.encode.return_value = np.array([[1.0, 0.0, 0.0]], dtype="float32")
+
+    monkeypatch.setattr(
+        RagIndex,
+        "embed_model",
+        PropertyMock(return_value=mock_model),
+    )
+
+    class DummyMetaStore:
+        def get(self, faiss_id: int) -> dict:
+            return {"text": f"chunk{faiss_id}"}
+
+    results = retrieve(
+        RagIndex(index=index),
+        DummyMetaStore(), # type: ignore
+        query="q",
+        top_k=2,
+        mmr=True,
+    )
+
+    assert [r["text"] for r in results] == ["chunk0", "chunk2"]
+
+
+def test_retrieve_expands_neighbors(monkeypatch):
+    vectors = np.array([
+        [0.0, 1.0, 0.0],
+        [1.0, 0.0, 0.0],
+        [0.0, 0.0, 1.0],
+    ], dtype="float32")
+
+    mock_model = MagicMock()
+    mock_model.encode.side_effect = [
+        vectors,
+        np.array([[1.0, 0.0, 0.0]], dtype="float32"),
+    ]
+
+    monkeypatch.setattr(
+        RagIndex,
+        "embed_model",
+        PropertyMock(return_value=mock_model),
+    )
+
+    rag = build_index([
+        Chunk(doc_id="d1", chunk_id=0, source="a.md", text="line 1, line 2, line 3"),
+        Chunk(doc_id="d1", chunk_id=1, source="a.md", text="line 2, line 3, line 4"),
+        Chunk(doc_id="d1", chunk_id=2, source="a.md", text="line 3, line 4, line 5"),
+    ])
+
+    with MetaStore() as meta_store:
+        assert meta_store.get_chunk("d1", 2)["text"] == "line 3, line 4, line 5"
+        assert meta_store.get_chunk("d1", 3) is None
+
+        results = retrieve(
+            rag,
+            meta_store,
+            query="q",
+            top_k=1,
+            neighbors=1,
+        )
+
+    assert len(results) == 1
+    assert results[0]["chunk_id"] == 1
+    assert results[0]["neighbors"] == [0, 2]
+    assert results[0]["text"] == "line 1, line 2, line 3, line 4, line 5"
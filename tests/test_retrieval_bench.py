@@ -0,0 +1,84 @@
+from unittest.mock import PropertyMock
+import json
+import math
+
+import numpy as np
+import pytest
+
+from rag_notes_helper.bench.fakes import FakeEmbedder
+from rag_notes_helper.core.config import get_settings
+from rag_notes_helper.eval.retrieval_bench import (
+    make_index,
+    ndcg_at_k,
+    recall_at_k,
+    reciprocal_rank,
+    run_retrieval_benchmark,
+)
+from rag_notes_helper.rag.index import RagIndex
+
+
+def test_ranking_metrics():
+    hits = [set(), {"a"}, set(), {"a", "b"}]
+    relevant = [bool(h) for h in hits]
+
+    assert recall_at_k(hits, 2, 2) == 0.5
+    assert recall_at_k(hits, 2, 4) == 1.0
+    assert reciprocal_rank(relevant, 4) == 0.5
+    assert reciprocal_rank(relevant, 1) == 0.0
+
+    dcg = 1 / math.log2(3) + 1 / math.log2(5)
+    idcg = 1 + 1 / math.log2(3)
+    assert ndcg_at_k(relevant, 2, 4) == pytest.approx(dcg / idcg)
+    assert ndcg_at_k([True, True], 2, 2) == pytest.approx(1.0)
+
+
+@pytest.mark.parametrize("kind", ["flat", "hnsw", "ivf"])
+def test_make_index_finds_exact_match(kind):
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(200, 16)).astype("float32")
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    index = make_index(kind, vectors)
+    _, indices = index.search(vectors[:1], 1) # type: ignore
+
+    assert index.ntotal == 200
+    assert indices[0][0] == 0
+
+
+def test_run_retrieval_benchmark_grid(monkeypatch, tmp_path):
+    notes_dir = get_settings().notes_dir
+    (notes_dir / "faiss.md").write_text(
+        "# Faiss\n\nfaiss index search uses inner product vectors\n",
+        encoding="utf-8",
+    )
+    (notes_dir / "cooking.md").write_text(
+        "# Cooking\n\npasta needs salted boiling water\n",
+        encoding="utf-8",
+    )
+
+    testset = tmp_path / "retrieval.json"
+    testset.write_text(json.dumps([
+        {"question": "faiss index search", "relevant_sources": ["faiss.md"]},
+        {"question": "boiling pasta water", "relevant_text": ["salted boiling"]},
+        {"question": "unlabeled question"},
+    ]), encoding="utf-8")
+
+    monkeypatch.setattr(
+        RagIndex,
+        "embed_model",
+        PropertyMock(return_value=FakeEmbedder(dim=64)),
+    )
+
+    rows = run_retrieval_benchmark(
+        testset,
+        index_types=("flat",),
+        top_ks=(1, 2),
+        mmr_options=(False, True),
+    )
+
+    assert len(rows) == 4
+    assert {(r["mmr"], r["top_k"]) for r in rows} == {
+        (False, 1), (False, 2), (True, 1), (True, 2),
+    }
+    assert all(r["recall@k"] == 1.0 and r["mrr"] == 1.0 for r in rows)
+    assert all(r["chunks"] == 2 and r["index_bytes"] > 0 for r in rows)
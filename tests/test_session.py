@@ -0,0 +1,85 @@
+import pytest
+
+from rag_notes_helper.rag.session import NO_NEW_CONTEXT, ChatSession
+
+
+@pytest.fixture
+def prompts(monkeypatch):
+    sent: list[list[dict]] = []
+
+    class DummyLLM:
+        def generate(self, prompt, line_width):
+            sent.append(prompt)
+            return f"answer {len(sent)}"
+
+        def stream(self, prompt, line_width):
+            sent.append(prompt)
+            yield "streamed "
+            yield "answer"
+
+    monkeypatch.setattr(
+        "rag_notes_helper.rag.session.get_llm",
+        lambda: DummyLLM(),
+    )
+    return sent
+
+
+def _hit(chunk_id: int, text: str) -> dict:
+    return {
+        "doc_id": "d1",
+        "chunk_id": chunk_id,
+        "source": "note.md",
+        "text": text,
+        "score": 0.9,
+    }
+
+
+def test_follow_up_reuses_chunks_and_keeps_prefix(prompts):
+    session = ChatSession()
+
+    session.ask("what is faiss", hits=[_hit(0, "faiss is a vector index")])
+    session.ask("and the second one", hits=[_hit(0, "faiss is a vector index")])
+    session.ask(
+        "what about hnsw",
+        hits=[_hit(0, "faiss is a vector index"), _hit(3, "hnsw is a graph index")],
+    )
+
+    first, second, third = prompts
+
+    # the earlier prompt is an exact prefix of the next one
+    assert second[: len(first)] == first
+    assert third[: len(second) - 1] == second[:-1]
+    assert second[len(first)] == {"role": "assistant", "content": "answer 1"}
+
+    # chunks already in the transcript are not sent again
+    assert NO_NEW_CONTEXT in second[-1]["content"]
+    assert "hnsw is a graph index" in third[-1]["content"]
+    assert "faiss is a vector index" not in third[-1]["content"]
+
+
+def test_history_is_bounded(prompts):
+    session = ChatSession(max_turns=2)
+
+    for i in range(4):
+        session.ask(f"question {i}", hits=[_hit(i, f"chunk text {i}")])
+
+    assert len(session.turns) == 2
+    assert len(prompts[-1]) == 1 + 2 * 1 + 1
+    assert "question 2" in prompts[-1][1]["content"]
+
+    # chunks of dropped turns are sent again when retrieved
+    session.ask("question 0", hits=[_hit(0, "chunk text 0")])
+    assert "chunk text 0" in prompts[-1][-1]["content"]
+
+    session.reset()
+    assert not session.turns
+
+
+def test_streamed_answer_is_recorded(prompts):
+    session = ChatSession()
+
+    result = session.ask("q", hits=[_hit(0, "text")], stream=True)
+    assert "".join(result["answer"]) == "streamed answer"
+
+    session.ask("q2", hits=[])
+    assert prompts[-1][2] == {"role": "assistant", "content": "streamed answer"}
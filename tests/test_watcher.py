@@ -0,0 +1,141 @@
+from unittest.mock import MagicMock, PropertyMock
+import sys
+import threading
+
+import numpy as np
+import pytest
+
+from rag_notes_helper.rag.index import RagIndex, build_and_save_rag, update_index
+from rag_notes_helper.rag.ingest import get_stable_doc_id, get_touched_doc_ids
+from rag_notes_helper.rag.meta_store import MetaStore
+from rag_notes_helper.rag.watcher import IndexWatcher, NoteWatcher
+from rag_notes_helper.core.config import get_settings
+
+
+def _mock_model(monkeypatch):
+    mock_model = MagicMock()
+    mock_model.encode.side_effect = lambda texts, **kws: (
+        np.random.rand(len(texts), 3).astype("float32")
+    )
+
+    monkeypatch.setattr(
+        RagIndex,
+        "embed_model",
+        PropertyMock(return_value=mock_model)
+    )
+
+
+def test_touched_doc_ids_only_look_at_given_paths():
+    notes_dir = get_settings().notes_dir
+    (notes_dir / "sub").mkdir()
+    kept = notes_dir / "kept.txt"
+    edited = notes_dir / "edited.txt"
+    added = notes_dir / "added.md"
+    for path in [kept, edited]:
+        path.write_text(f"{path.name}\n", encoding="utf-8")
+
+    indexed = {
+        "kept.txt": get_stable_doc_id(kept),
+        "edited.txt": get_stable_doc_id(edited),
+        "sub/gone.txt": "gone-id",
+    }
+
+    edited.write_text("edited again\n", encoding="utf-8")
+    added.write_text("# new note\n", encoding="utf-8")
+
+    changed_ids, unchanged_ids = get_touched_doc_ids(
+        indexed,
+        [edited, added, notes_dir / "sub", kept],
+    )
+
+    assert sorted(path.name for _, path in changed_ids) == ["added.md", "edited.txt"]
+    assert unchanged_ids == {indexed["kept.txt"]}
+
+
+def test_update_index_applies_changed_paths(monkeypatch):
+    _mock_model(monkeypatch)
+    notes_dir = get_settings().notes_dir
+    note1 = notes_dir / "note1.txt"
+    note2 = notes_dir / "note2.txt"
+    note1.write_text("first note\n", encoding="utf-8")
+    note2.write_text("second note\n", encoding="utf-8")
+
+    old_rag = build_and_save_rag()
+
+    assert update_index([note1]) is None
+
+    note1.write_text("first note, edited\n", encoding="utf-8")
+    note2.unlink()
+    rag = update_index([note1, note2])
+
+    assert rag is not None and rag.path != old_rag.path
+    with MetaStore(rag.path) as meta_store:
+        assert [r["text"] for r in meta_store.iter_records()] == ["first note, edited"]
+
+
+def _wait_for_batch(watcher_kws, change):
+    batches = []
+    done = threading.Event()
+
+    def on_change(paths):
+        batches.append(paths)
+        done.set()
+
+    with NoteWatcher(on_change, debounce=0.2, **watcher_kws):
+        change()
+        assert done.wait(5)
+
+    return batches
+
+
+def test_polling_watcher_debounces_saves():
+    notes_dir = get_settings().notes_dir
+    note = notes_dir / "note.md"
+
+    def change():
+        for i in range(3):
+            note.write_text(f"save {i}\n", encoding="utf-8")
+        (notes_dir / "ignored.bin").write_bytes(b"\0")
+
+    batches = _wait_for_batch({"backend": "polling", "poll_interval": 0.05}, change)
+
+    assert batches == [[note]]
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="inotify is linux only")
+def test_inotify_watcher_follows_new_directories():
+    notes_dir = get_settings().notes_dir
+    sub = notes_dir / "sub"
+
+    def change():
+        sub.mkdir()
+        (sub / "note.txt").write_text("hello\n", encoding="utf-8")
+
+    batches = _wait_for_batch({"backend": "inotify"}, change)
+
+    assert sub in batches[0]
+
+
+def test_index_watcher_drops_superseded_builds(monkeypatch):
+    _mock_model(monkeypatch)
+    note = get_settings().notes_dir / "note.txt"
+    note.write_text("some note\n", encoding="utf-8")
+    build_and_save_rag()
+
+    watcher = IndexWatcher(backend="polling")
+    try :
+        note.write_text("edited note\n", encoding="utf-8")
+        watcher._update([note])
+
+        # a later build (e.g. :reindex) was published in between
+        build_and_save_rag()
+        assert watcher.take() is None
+
+        note.write_text("edited twice\n", encoding="utf-8")
+        watcher._update([note])
+        rag = watcher.take()
+
+        assert rag is not None
+        assert watcher.take() is None
+    finally :
+        watcher.close()